@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Item, WebhookSettings, ActivityLog, UploadHistory
+from .models import Item, WebhookSettings, WebhookDelivery, WebhookRateLimit, ActivityLog, UploadHistory, ImportJob
 
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
@@ -19,6 +19,24 @@ class ActivityLogAdmin(admin.ModelAdmin):
 
 @admin.register(UploadHistory)
 class UploadHistoryAdmin(admin.ModelAdmin):
-    list_display = ('filename', 'user', 'upload_date', 'success_count', 'error_count')
+    list_display = ('filename', 'user', 'upload_date', 'success_count', 'error_count', 'duration_seconds', 'rows_per_second')
     list_filter = ('upload_date', 'user')
     search_fields = ('filename',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'mode', 'status', 'rows_done', 'total_rows', 'error_count', 'created_at')
+    list_filter = ('status', 'mode', 'created_at')
+    search_fields = ('filename',)
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('description', 'channel', 'user', 'status', 'attempts', 'response_status', 'created_at', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel', 'created_at')
+    search_fields = ('description', 'error')
+
+@admin.register(WebhookRateLimit)
+class WebhookRateLimitAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'tokens', 'updated_at')
@@ -13,6 +13,15 @@ class InventoryConfig(AppConfig):
         and clean up existing files in uploads and backups folders
         """
         from django.conf import settings
+        from django.db.models.signals import post_migrate
+        from .search import ensure_search_index
+        from .dashboard_stats import ensure_cache_table
+        
+        # Keep the item search index in place after every migrate
+        post_migrate.connect(ensure_search_index, sender=self)
+        
+        # The database cache backend needs its table before the first request
+        post_migrate.connect(ensure_cache_table, sender=self)
         
         # Create media directory if it doesn't exist
         os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
@@ -0,0 +1,213 @@
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+import numpy as np
+import pandas as pd
+import gc
+import logging
+import os
+import tempfile
+from .models import Item, UserProfile
+from .readers import open_batch_reader, ImportMetrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Catalog sizes the suite knows about; 1M is opt-in because generating the
+# XLSX alone takes minutes
+BENCHMARK_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_BENCHMARK_SIZES = [1000, 10000, 100000]
+
+CATEGORIES = ['detick', 'vitamin', 'makanan', 'pasir', 'grooming', 'mainan', 'kandang', 'obat']
+PRODUCTS = ['Obat Kutu', 'Vitamin', 'Makanan', 'Pasir', 'Sisir', 'Shampoo', 'Mainan', 'Kandang', 'Susu', 'Snack']
+ANIMALS = ['Kucing', 'Anjing', 'Kucing dan Anjing', 'Kelinci', 'Hamster']
+SIZES = ['60ml', '200ml', '250gr', '1kg', '10L', '3ml', 'Portable', 'Anakan']
+
+
+def generate_stock_frame(rows, seed=0):
+    """
+    Synthetic stock catalog in the column layout of
+    sample_data/sample_inventory.xlsx, the same for the same seed
+    """
+    rng = np.random.default_rng(seed)
+    names = (
+        pd.Series(np.array(PRODUCTS)[rng.integers(0, len(PRODUCTS), rows)]) + ' '
+        + pd.Series(np.array(ANIMALS)[rng.integers(0, len(ANIMALS), rows)]) + ' '
+        + pd.Series(np.array(SIZES)[rng.integers(0, len(SIZES), rows)]) + ' #'
+        + pd.Series(np.arange(rows)).astype(str)
+    )
+    return pd.DataFrame({
+        'Kode': pd.Series(np.arange(1, rows + 1)).map('{:013d}'.format),
+        'Nama Barang': names,
+        'Kategori': np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), rows)],
+        'Total Stok': rng.integers(0, 500, rows),
+        'Harga Jual': rng.integers(10, 2000, rows) * 500,
+    })
+
+
+def generate_exp_frame(rows, seed=0):
+    """
+    Synthetic Data Exp Produk sheet: half date cells, half text dates in
+    the two accepted formats
+    """
+    rng = np.random.default_rng(seed + 1)
+    stock = generate_stock_frame(rows, seed)
+    offsets = rng.integers(30, 900, rows)
+    expiry = []
+    start = datetime(2026, 1, 1)
+    for i, days in enumerate(offsets.tolist()):
+        value = start + timedelta(days=days)
+        if i % 4 == 1:
+            value = value.strftime('%Y-%m-%d')
+        elif i % 4 == 3:
+            value = value.strftime('%d/%m/%Y')
+        expiry.append(value)
+    return pd.DataFrame({
+        'Kode Barang': stock['Kode'].radd('EXP'),
+        'Nama Barang': stock['Nama Barang'],
+        'Total Stok': stock['Total Stok'],
+        'Tanggal Expired': expiry,
+    })
+
+
+def write_frame(df, path):
+    """
+    Write a generated frame as .xlsx (streamed with a write-only workbook)
+    or .csv, chosen by the path's suffix
+    """
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+        return path
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Inventory')
+    worksheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        worksheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+    workbook.save(path)
+    return path
+
+
+def ensure_file(data_dir, kind, rows, file_format, seed=0):
+    """
+    Path of a generated file, created on first use and reused afterwards
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'{kind}_{rows}_seed{seed}.{file_format}')
+    if not os.path.exists(path):
+        logger.info(f"Generating {path}")
+        frame = generate_stock_frame(rows, seed) if kind == 'stock' else generate_exp_frame(rows, seed)
+        write_frame(frame, path + '.tmp')
+        os.replace(path + '.tmp', path)
+    return path
+
+
+class QueryCounter:
+    """
+    Counts queries through a connection execute wrapper, without keeping
+    the SQL like CaptureQueriesContext does
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+def measure(scenario, file_format, rows, func):
+    """
+    Run `func` once and return its wall time, query count, rows per second
+    and peak memory
+    """
+    gc.collect()
+    metrics = ImportMetrics()
+    with QueryCounter() as queries:
+        func()
+    metrics.add_rows(rows)
+    metrics.finish()
+    result = {
+        'scenario': scenario,
+        'format': file_format,
+        'rows': rows,
+        'seconds': round(metrics.seconds, 3),
+        'queries': queries.count,
+        'rows_per_second': round(metrics.rows_per_second, 1),
+        'peak_rss_mb': round(metrics.peak_rss_kb / 1024, 1),
+    }
+    logger.info(f"Benchmark {scenario} {file_format} {rows}: {metrics.summary()}, {queries.count} queries")
+    return result
+
+
+def clear_items():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(Item._meta.db_table)}')
+
+
+def benchmark_user():
+    user, _ = User.objects.get_or_create(username='benchmark', defaults={'is_superuser': True})
+    UserProfile.objects.get_or_create(user=user, defaults={'full_name': 'Benchmark', 'role': 'admin'})
+    return user
+
+
+def run_stock_benchmarks(path, file_format, rows, user):
+    """
+    process_excel_data on an empty table (all creates), then again with the
+    same file (all unchanged)
+    """
+    from .views_upload_file import process_excel_data
+
+    clear_items()
+    results = [
+        measure('stock_create', file_format, rows, lambda: process_excel_data(open_batch_reader(path), user)),
+        measure('stock_unchanged', file_format, rows, lambda: process_excel_data(open_batch_reader(path), user)),
+    ]
+    clear_items()
+    return results
+
+
+def run_exp_benchmark(path, rows, user):
+    """
+    upload_exp_produk_file end to end, through the view with a posted file:
+    once on an empty table (all creates) and once more (all updates). The
+    view keeps a copy of the file under MEDIA_ROOT, so that points to a
+    temporary directory for the run.
+    """
+    from .views_upload_exp_produk import upload_exp_produk_file
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    def upload():
+        request = RequestFactory().post('/', {'exp_produk_file': SimpleUploadedFile(os.path.basename(path), content)})
+        request.user = user
+        request._messages = CookieStorage(request)
+        upload_exp_produk_file(request)
+
+    clear_items()
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        results = [
+            measure('exp_create', 'xlsx', rows, upload),
+            measure('exp_update', 'xlsx', rows, upload),
+        ]
+    clear_items()
+    return results
+
+
+def environment_info():
+    return {
+        'database': connection.vendor,
+        'pandas': pd.__version__,
+    }
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from functools import lru_cache, partial, wraps
+from pathlib import Path
+import hashlib
+import logging
+from .utils import user_role
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Safety net for writes that bypass the invalidation hooks (raw SQL, shell)
+LIST_VALIDATOR_TIMEOUT = 60 * 60
+
+
+def conditional_list(*models):
+    """
+    Decorator for GET views listing rows of `models`: answers
+    If-None-Match / If-Modified-Since with 304 before the view runs its
+    queries, from a validator made of each model's row count and latest
+    updated_at (cached, bumped on writes), the full path, the user, the
+    date and the deployed code.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Pending messages are shown once, so that page is never reused
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = _list_validators(request, models)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                logger.info(f"Not modified: {request.get_full_path()} for {request.user.username}")
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not getattr(get_messages(request), 'used', False):
+                    response.headers.setdefault('ETag', etag)
+                    if last_modified:
+                        response.headers.setdefault('Last-Modified', http_date(last_modified))
+            # Let the browser keep the page, but only for this user and
+            # asking again every time
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_list_validator(model, using='default'):
+    """
+    Bump the validator of `model` once the current transaction commits
+    """
+    transaction.on_commit(partial(_bump_validator, model._meta.label_lower), using=using)
+
+
+def list_changed_at(model):
+    """
+    Commit time of the last write to `model`'s rows, or None. Unlike
+    updated_at it never goes back: rows stamped before a slow transaction
+    committed still move it.
+    """
+    return cache.get(_changed_key(model._meta.label_lower))
+
+
+def _list_validators(request, models):
+    labels = [model._meta.label_lower for model in models]
+    keys = [_validator_key(label) for label in labels] + [_changed_key(label) for label in labels]
+    cached = cache.get_many(keys)
+
+    parts = [
+        request.get_full_path(),
+        request.user.pk,
+        user_role(request.user),
+        # The CSRF secret in the page changes on login
+        request.META.get('CSRF_COOKIE', ''),
+        timezone.localdate(),
+        _code_version(),
+    ]
+    last_modified = 0
+    for model, label in zip(models, labels):
+        validator = cached.get(_validator_key(label))
+        if validator is None:
+            validator = model._default_manager.aggregate(count=Count('pk'), latest=Max('updated_at'))
+            cache.set(_validator_key(label), validator, LIST_VALIDATOR_TIMEOUT)
+        # A delete leaves the latest updated_at as it was, the time of the
+        # last write does not
+        changed = cached.get(_changed_key(label))
+        parts += [label, validator['count'], validator['latest'], changed]
+        for moment in (validator['latest'], changed):
+            if moment is not None:
+                last_modified = max(last_modified, int(moment.timestamp()))
+
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest), last_modified
+
+
+def _bump_validator(label):
+    try:
+        cache.delete(_validator_key(label))
+        cache.set(_changed_key(label), timezone.now(), None)
+    except Exception as e:
+        logger.error(f"Error bumping list validator of {label}: {str(e)}")
+
+
+def _validator_key(label):
+    return f'inventory:list_validator:{label}'
+
+
+def _changed_key(label):
+    return f'inventory:list_changed:{label}'
+
+
+@lru_cache(maxsize=None)
+def _code_version():
+    """
+    Changes with each deploy of templates or code, so pages rendered by an
+    older release are not reused
+    """
+    digest = hashlib.md5()
+    for root in (Path(settings.BASE_DIR) / 'templates', Path(__file__).resolve().parent):
+        for path in sorted(root.rglob('*')):
+            if path.suffix in ('.py', '.html'):
+                digest.update(f'{path}:{path.stat().st_mtime_ns}'.encode())
+    return digest.hexdigest()[:8]
@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DASHBOARD_STATS_KEY = 'inventory:dashboard_stats'
+
+# Safety net for writes that bypass the invalidation hooks (raw SQL, shell)
+DASHBOARD_STATS_TIMEOUT = 60 * 60
+
+# Same bands as the expiry colors of Data Exp Produk (~6 and ~12 months)
+EXPIRY_SOON_DAYS = 180
+EXPIRY_LATER_DAYS = 365
+
+
+def get_dashboard_stats():
+    """
+    Dashboard numbers from the cache, computed again when they were
+    invalidated, timed out or computed on an earlier day (the expiry
+    counts depend on the date)
+    """
+    stats = cache.get(DASHBOARD_STATS_KEY)
+    if stats is None or stats['date'] != timezone.localdate():
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_KEY, stats, DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+def compute_dashboard_stats():
+    """
+    All dashboard numbers from one grouped aggregate over items (the totals
+    are the sum of the category rows) and one over packing items
+    """
+    from .models import Item, PackingItem, BELOW_MINIMUM
+
+    today = timezone.localdate()
+    soon = today + timedelta(days=EXPIRY_SOON_DAYS)
+    later = today + timedelta(days=EXPIRY_LATER_DAYS)
+    value = ExpressionWrapper(F('current_stock') * F('selling_price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+    rows = (
+        Item.objects.order_by('category').values('category').annotate(
+            items=Count('id'),
+            below_minimum=Count('id', filter=BELOW_MINIMUM),
+            expired=Count('id', filter=Q(expiry_date__lt=today)),
+            expiring_soon=Count('id', filter=Q(expiry_date__gte=today, expiry_date__lte=soon)),
+            expiring_later=Count('id', filter=Q(expiry_date__gt=soon, expiry_date__lte=later)),
+            stock=Sum('current_stock'),
+            value=Sum(value),
+        )
+    )
+
+    stats = {
+        'date': today,
+        'computed_at': timezone.now(),
+        'total_items': 0,
+        'below_minimum': 0,
+        'expired': 0,
+        'expiring_soon': 0,
+        'expiring_later': 0,
+        'total_stock': 0,
+        'total_stock_value': 0,
+        'categories': [],
+    }
+    for row in rows:
+        row['stock'] = row['stock'] or 0
+        row['value'] = row['value'] or 0
+        stats['categories'].append(row)
+        stats['total_items'] += row['items']
+        stats['below_minimum'] += row['below_minimum']
+        stats['expired'] += row['expired']
+        stats['expiring_soon'] += row['expiring_soon']
+        stats['expiring_later'] += row['expiring_later']
+        stats['total_stock'] += row['stock']
+        stats['total_stock_value'] += row['value']
+
+    packing = PackingItem.objects.aggregate(
+        items=Count('id'),
+        below_minimum=Count('id', filter=BELOW_MINIMUM),
+    )
+    stats['packing_items'] = packing['items']
+    stats['packing_below_minimum'] = packing['below_minimum']
+    return stats
+
+
+def invalidate_dashboard_stats(using='default'):
+    """
+    Drop the cached numbers once the current transaction commits, so a
+    dashboard hit in between cannot cache the old values again
+    """
+    transaction.on_commit(_delete_stats, using=using)
+
+
+def _delete_stats():
+    try:
+        cache.delete(DASHBOARD_STATS_KEY)
+    except Exception as e:
+        logger.error(f"Error invalidating dashboard stats: {str(e)}")
+
+
+def ensure_cache_table(sender, using, **kwargs):
+    """
+    post_migrate handler: creates the table of the database cache backend
+    """
+    call_command('createcachetable', database=using, verbosity=0)
@@ -0,0 +1,119 @@
+from django.http import StreamingHttpResponse
+from functools import partial
+from openpyxl import Workbook
+import csv
+import io
+import logging
+import tempfile
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows fetched per query while exporting, and written per CSV chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# Bytes per chunk when sending a finished XLSX file
+XLSX_SEND_SIZE = 64 * 1024
+
+# Nothing of an XLSX file can be sent before its last row is written (about
+# 6000 rows a second), so a larger one would outlast gunicorn's 30 second
+# worker timeout. Bigger exports are only offered as CSV, which is sent as
+# it is read.
+XLSX_MAX_ROWS = 100000
+
+# Columns of an export. The first five are those of the stock upload, so an
+# export can be uploaded again as it is.
+EXPORT_COLUMNS = [
+    ('Kode', 'code'),
+    ('Nama Barang', 'name'),
+    ('Kategori', 'category'),
+    ('Harga Jual', 'selling_price'),
+    ('Total Stok', 'current_stock'),
+    ('Stok Minimum', 'minimum_stock'),
+    ('Harga Terbaru', 'latest_price'),
+    ('Stok Transfer', 'transfer_stock'),
+    ('Tanggal Expired', 'expiry_date'),
+]
+
+# Fields left out of the export for roles that cannot open Kelola Harga
+PRICE_FIELDS = ('selling_price', 'latest_price')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_response(items, file_format, filename, columns=EXPORT_COLUMNS):
+    """
+    Streaming download of `items` (a queryset, in its own order) as CSV or
+    XLSX with `columns`. Rows are read `EXPORT_CHUNK_SIZE` at a time, so the
+    size of the export does not change the memory used.
+    """
+    rows = export_rows(items, columns)
+    if file_format == 'xlsx':
+        content = stream_xlsx(rows)
+    else:
+        file_format = 'csv'
+        content = stream_csv(rows)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def xlsx_too_large(items):
+    """
+    Whether `items` has more rows than an XLSX export may hold
+    """
+    return items[:XLSX_MAX_ROWS + 1].count() > XLSX_MAX_ROWS
+
+
+def export_rows(items, columns=EXPORT_COLUMNS):
+    """
+    Header row followed by one tuple per item
+    """
+    yield [header for header, _ in columns]
+    fields = [field for _, field in columns]
+    yield from items.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(rows):
+    """
+    CSV as UTF-8 with a BOM (so Excel reads it as UTF-8), one chunk per
+    `EXPORT_CHUNK_SIZE` rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+    logger.info(f"Exported {count - 1} rows as CSV")
+
+
+def stream_xlsx(rows):
+    """
+    XLSX from a write-only workbook, which writes rows to a temporary file
+    as they are appended. The file is a zip whose sheet is only complete
+    after the last row, so it is sent once written; an empty first chunk
+    sends the response headers, and with them the download, right away.
+    """
+    yield b''
+    with tempfile.TemporaryFile() as output:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Data Barang')
+        count = 0
+        for row in rows:
+            sheet.append(row)
+            count += 1
+        workbook.save(output)
+        logger.info(f"Exported {count - 1} rows as XLSX")
+
+        output.seek(0)
+        yield from iter(partial(output.read, XLSX_SEND_SIZE), b'')
@@ -0,0 +1,37 @@
+from decimal import Decimal
+from pandas.util import hash_array
+import numpy as np
+
+# Separator between the hashed fields; never typed in names or categories
+FIELD_SEPARATOR = '\x1f'
+
+# Item fields covered by the fingerprint
+FINGERPRINT_FIELDS = ('name', 'category', 'current_stock', 'selling_price')
+
+
+def item_fingerprint(name, category, current_stock, selling_price):
+    """
+    Fingerprint of the imported fields of one item, as a signed 64-bit int.
+
+    Gives the same value as stock_fingerprints() for the same row, so items
+    saved outside the stock upload stay comparable with the next upload.
+    """
+    cents = int((Decimal(str(selling_price)) * 100).quantize(Decimal('1')))
+    key = FIELD_SEPARATOR.join([str(name), str(category), str(int(current_stock)), str(cents)])
+    return int(hash_array(np.array([key], dtype=object)).view('int64')[0])
+
+
+def stock_fingerprints(frame):
+    """
+    Fingerprints for a normalized stock frame (see validate_stock_frame) in
+    one vectorized pass
+    """
+    cents = (frame['selling_price'] * 100).round().astype('int64')
+    keys = (
+        frame['name'] + FIELD_SEPARATOR
+        + frame['category'] + FIELD_SEPARATOR
+        + frame['current_stock'].astype(str) + FIELD_SEPARATOR
+        + cents.astype(str)
+    )
+    return hash_array(keys.to_numpy(dtype=object)).view('int64')
+
@@ -16,9 +16,14 @@ class LoginForm(forms.Form):
 
 class ExcelUploadForm(forms.Form):
     excel_file = forms.FileField(
-        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx'}),
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx,.csv,.tsv,.txt,.parquet'}),
         label="File Excel"
     )
+    preview = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label="Pratinjau dulu (belum menyimpan data)"
+    )
 
 class WebhookSettingsForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,485 @@
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from datetime import timedelta
+import hashlib
+import logging
+import os
+import secrets
+import shutil
+import traceback
+import uuid
+from .models import ImportJob, ActivityLog, Item, UploadHistory
+from .importer import StockImporter, STOCK_COLUMNS, IMPORT_CHUNK_SIZE, IMPORT_BATCH_SIZE
+from .readers import open_batch_reader, ImportMetrics
+from .validation import RejectWriter
+from .preview import StockDiff, WRITE_COLUMNS, iter_diff_chunks, count_drifted_rows
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Uploaded files waiting for the worker. Not under MEDIA_ROOT/uploads,
+# which is emptied on every start-up.
+IMPORT_JOBS_DIR = os.path.join(settings.MEDIA_ROOT, 'imports')
+
+# Rejected rows of each job, kept for download after the upload file is removed
+REJECTS_DIR = os.path.join(IMPORT_JOBS_DIR, 'rejects')
+
+# New and changed rows of each preview, applied without reading the upload again
+PREVIEWS_DIR = os.path.join(IMPORT_JOBS_DIR, 'previews')
+
+# How long a preview can still be applied
+PREVIEW_TTL = timedelta(hours=24)
+
+# A running job without a heartbeat for this long belongs to a dead worker
+# and is picked up again
+JOB_STALE_SECONDS = 300
+
+
+def enqueue_import(uploaded_file, user, mode='import'):
+    """
+    Store an uploaded stock file and queue it for the import worker, as an
+    import or, with mode='preview', as a dry run
+    """
+    os.makedirs(IMPORT_JOBS_DIR, exist_ok=True)
+    file_path = os.path.join(IMPORT_JOBS_DIR, f"{uuid.uuid4().hex}_{os.path.basename(uploaded_file.name)}")
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+            digest.update(chunk)
+
+    return ImportJob.objects.create(
+        user=user,
+        mode=mode,
+        filename=uploaded_file.name,
+        file_path=file_path,
+        file_size=uploaded_file.size,
+        file_digest=digest.hexdigest(),
+    )
+
+
+def hash_file(file_path):
+    """
+    SHA-256 hex digest of a file on disk, read in 1 MB blocks
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_identical_upload(file_digest):
+    """
+    The last stock upload, if it had the same file digest and no item was
+    edited, added or deleted since. Returns None otherwise.
+    """
+    if not file_digest:
+        return None
+    # Only stock uploads record a digest
+    latest = UploadHistory.objects.exclude(file_digest='').order_by('-upload_date').first()
+    if latest is None or latest.file_digest != file_digest:
+        return None
+
+    stats = Item.objects.aggregate(count=Count('id'), last_change=Max('updated_at'))
+    if stats['count'] != latest.success_count:
+        return None
+    if stats['last_change'] is not None and stats['last_change'] > latest.upload_date:
+        return None
+    return latest
+
+
+def claim_next_job():
+    """
+    Atomically take the oldest pending job, or a running job whose worker
+    stopped sending heartbeats. Returns None when the queue is empty.
+    """
+    stale_before = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    candidates = ImportJob.objects.filter(
+        Q(status='pending') | Q(status='running', heartbeat_at__lt=stale_before)
+    ).exclude(mode='command').order_by('created_at')
+
+    for job in candidates[:10]:
+        now = timezone.now()
+        # Compare-and-set on the values we read, so two workers never claim
+        # the same job
+        claimed = ImportJob.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(
+            status='running',
+            started_at=now,
+            started_rows=job.rows_done,
+            heartbeat_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def release_job(job):
+    """
+    Put a job back in the queue, e.g. when the worker is shutting down
+    """
+    ImportJob.objects.filter(pk=job.pk, status='running').update(status='pending', heartbeat_at=None)
+
+
+class JobProgress:
+    """
+    StockImporter on_chunk callback that saves a job's progress.
+
+    Runs inside the chunk's transaction: the data and the progress are
+    committed together, so a restart resumes exactly after that chunk.
+    `on_progress`, if given, is called with the job after each save.
+    """
+
+    def __init__(self, job, on_progress=None):
+        self.job = job
+        self.on_progress = on_progress
+        self.importer = None
+        self.base = {
+            field: getattr(job, field)
+            for field in ['success_count', 'error_count', 'created_count', 'changed_count', 'unchanged_count']
+        }
+
+    def __call__(self, row_count):
+        job = self.job
+        job.rows_done += row_count
+        for field, base in self.base.items():
+            setattr(job, field, base + getattr(self.importer, field))
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['rows_done', 'heartbeat_at'] + list(self.base))
+        if self.on_progress:
+            self.on_progress(job)
+
+
+def run_import_job(job, chunk_size=IMPORT_CHUNK_SIZE, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Process a claimed job from its last committed chunk to the end
+    """
+    if job.mode == 'preview':
+        return run_preview_job(job)
+    if job.mode == 'apply':
+        return run_apply_job(job)
+
+    resumed = job.rows_done > 0
+    _prepare_reject_file(job)
+    if resumed and os.path.exists(job.reject_file):
+        # Rebuilt from the committed rows below: the chunk in flight when
+        # the earlier run stopped may already have appended its rejects
+        _remove_file(job.reject_file)
+    progress = JobProgress(job, on_progress=on_progress)
+    importer = progress.importer = StockImporter(
+        user=job.user, chunk_size=chunk_size, batch_size=batch_size,
+        on_chunk=progress, reject_writer=RejectWriter(job.reject_file),
+    )
+    metrics = ImportMetrics()
+
+    try:
+        identical = None if resumed else find_identical_upload(job.file_digest)
+        if identical is not None:
+            _finish_identical(job, identical)
+            return job
+
+        reader = open_batch_reader(job.file_path, batch_size=chunk_size)
+        missing_columns = [col for col in STOCK_COLUMNS if col not in reader.columns]
+        if missing_columns:
+            reader.close()
+            raise ValueError(f'Kolom yang diperlukan tidak ditemukan: {", ".join(missing_columns)}')
+
+        if job.total_rows is None and reader.estimated_rows:
+            job.total_rows = reader.estimated_rows
+            job.save(update_fields=['total_rows'])
+
+        if resumed:
+            logger.info(f"Resuming import job {job.pk} after {job.rows_done} rows")
+        importer.import_batches(_skip_rows(reader, job.rows_done, on_skip=importer.replay_chunk), metrics=metrics)
+        metrics.finish()
+
+        job.status = 'done'
+        job.total_rows = job.rows_done
+        job.finished_at = timezone.now()
+        job.message = f'{_count_summary(job)}, {job.error_count} item gagal. {metrics.summary()}'
+        if importer.reject_reasons:
+            job.message += f' Baris ditolak: {importer.reject_summary()}.'
+        job.save(update_fields=['status', 'total_rows', 'finished_at', 'message'])
+
+        _record_upload(job, metrics)
+        ActivityLog.objects.create(
+            user=job.user,
+            action='upload_file',
+            status='success',
+            notes=f'File {job.filename} berhasil diupload. {_count_summary(job)}, {job.error_count} item gagal. {metrics.summary()}'
+        )
+        _remove_file_of(job)
+
+    except Exception as e:
+        logger.error(f"Error in import job {job.pk}: {str(e)}")
+        logger.error(traceback.format_exc())
+
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+        job.message = f'Gagal mengupload file: {str(e)}'
+        job.save(update_fields=['status', 'finished_at', 'message'])
+
+        ActivityLog.objects.create(
+            user=job.user,
+            action='upload_file',
+            status='failed',
+            notes=f'Gagal mengupload file {job.filename}: {str(e)}'
+        )
+
+    return job
+
+
+def run_preview_job(job):
+    """
+    Parse, validate and diff a job's file against the items without
+    writing any item. The new and changed rows are kept for apply_preview().
+    """
+    # A preview is cheap to redo, so an interrupted one starts over
+    diff_dir = os.path.join(PREVIEWS_DIR, str(job.pk))
+    shutil.rmtree(diff_dir, ignore_errors=True)
+    if job.reject_file and os.path.exists(job.reject_file):
+        _remove_file(job.reject_file)
+    job.rows_done = 0
+    _prepare_reject_file(job)
+    importer = StockImporter(user=job.user, reject_writer=RejectWriter(job.reject_file))
+
+    try:
+        reader = open_batch_reader(job.file_path)
+        missing_columns = [col for col in STOCK_COLUMNS if col not in reader.columns]
+        if missing_columns:
+            reader.close()
+            raise ValueError(f'Kolom yang diperlukan tidak ditemukan: {", ".join(missing_columns)}')
+        job.total_rows = reader.estimated_rows
+
+        diff = StockDiff(diff_dir)
+        for df in reader:
+            diff.add(importer.validate_chunk(df))
+            job.rows_done += len(df)
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['rows_done', 'total_rows', 'heartbeat_at'])
+
+        summary = diff.summary()
+        summary['counts']['rejected'] = importer.error_count
+        counts = summary['counts']
+        job.preview = summary
+        job.preview_token = secrets.token_urlsafe(32)
+        job.status = 'done'
+        job.total_rows = job.rows_done
+        job.error_count = importer.error_count
+        job.finished_at = timezone.now()
+        job.message = (
+            f"Pratinjau: {counts['new']} item baru, {counts['changed']} item berubah "
+            f"(stok {counts['stock']}, harga {counts['price']}, lainnya {counts['other']}), "
+            f"{counts['unchanged']} item tidak berubah, {counts['rejected']} baris ditolak. Belum ada data yang disimpan."
+        )
+        job.save(update_fields=['preview', 'preview_token', 'status', 'total_rows', 'error_count', 'finished_at', 'message'])
+
+        ActivityLog.objects.create(
+            user=job.user,
+            action='preview_upload_file',
+            status='success',
+            notes=f'Pratinjau file {job.filename}. {job.message}'
+        )
+        # Applying reads the saved diff, not the upload
+        _remove_file(job.file_path)
+
+    except Exception as e:
+        logger.error(f"Error in preview job {job.pk}: {str(e)}")
+        logger.error(traceback.format_exc())
+        shutil.rmtree(diff_dir, ignore_errors=True)
+
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+        job.message = f'Gagal membuat pratinjau: {str(e)}'
+        job.save(update_fields=['status', 'finished_at', 'message'])
+
+    return job
+
+
+def apply_preview(job, token):
+    """
+    Queue the previewed diff of a job to be written. Returns an error
+    message, or None when the job was queued.
+    """
+    if job.mode != 'preview' or job.status != 'done' or not job.preview_token:
+        return 'Pratinjau tidak tersedia atau sudah diterapkan'
+    if not secrets.compare_digest(job.preview_token, token or ''):
+        return 'Token pratinjau tidak valid'
+    if job.finished_at < timezone.now() - PREVIEW_TTL:
+        return 'Pratinjau sudah kedaluwarsa, silakan upload ulang'
+
+    # Compare-and-set so the same token cannot queue the diff twice
+    queued = ImportJob.objects.filter(pk=job.pk, mode='preview', preview_token=job.preview_token).update(
+        mode='apply',
+        status='pending',
+        preview_token='',
+        total_rows=job.preview['diff_rows'],
+        rows_done=0,
+        success_count=0,
+        created_count=0,
+        changed_count=0,
+        heartbeat_at=None,
+        finished_at=None,
+    )
+    if not queued:
+        return 'Pratinjau sudah diterapkan'
+    return None
+
+
+def run_apply_job(job):
+    """
+    Write the new and changed rows saved by a preview, refusing to start if
+    any of those items changed since the preview was made
+    """
+    diff_dir = os.path.join(PREVIEWS_DIR, str(job.pk))
+    progress = JobProgress(job)
+    importer = progress.importer = StockImporter(user=job.user, on_chunk=progress)
+    metrics = ImportMetrics()
+
+    try:
+        if not os.path.isdir(diff_dir):
+            raise ValueError('Data pratinjau tidak ditemukan, silakan upload ulang')
+        if job.rows_done == 0:
+            drifted = count_drifted_rows(diff_dir)
+            if drifted:
+                raise ValueError(f'{drifted} item berubah sejak pratinjau dibuat, silakan upload dan pratinjau ulang')
+
+        chunks = (diff[WRITE_COLUMNS] for diff in iter_diff_chunks(diff_dir))
+        for diff in _skip_rows(chunks, job.rows_done):
+            importer.write_chunk(diff, len(diff))
+            metrics.add_rows(len(diff))
+        metrics.finish()
+
+        job.unchanged_count = job.preview['counts']['unchanged']
+        job.success_count += job.unchanged_count
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.message = f'Pratinjau diterapkan. {_count_summary(job)}, {job.error_count} baris ditolak. {metrics.summary()}'
+        job.save(update_fields=['unchanged_count', 'success_count', 'status', 'finished_at', 'message'])
+
+        _record_upload(job, metrics)
+        ActivityLog.objects.create(
+            user=job.user,
+            action='upload_file',
+            status='success',
+            notes=f'File {job.filename} diterapkan dari pratinjau. {_count_summary(job)}, {job.error_count} baris ditolak. {metrics.summary()}'
+        )
+        shutil.rmtree(diff_dir, ignore_errors=True)
+
+    except Exception as e:
+        logger.error(f"Error in apply job {job.pk}: {str(e)}")
+        logger.error(traceback.format_exc())
+
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+        job.message = f'Gagal menerapkan pratinjau: {str(e)}'
+        job.save(update_fields=['status', 'finished_at', 'message'])
+
+        ActivityLog.objects.create(
+            user=job.user,
+            action='upload_file',
+            status='failed',
+            notes=f'Gagal menerapkan pratinjau {job.filename}: {str(e)}'
+        )
+
+    return job
+
+
+def purge_expired_previews():
+    """
+    Remove the saved diffs of previews that were never applied
+    """
+    expired = ImportJob.objects.filter(
+        mode='preview', status='done', finished_at__lt=timezone.now() - PREVIEW_TTL
+    ).exclude(preview_token='')
+    for job in expired:
+        shutil.rmtree(os.path.join(PREVIEWS_DIR, str(job.pk)), ignore_errors=True)
+        job.preview_token = ''
+        job.save(update_fields=['preview_token'])
+
+
+def _prepare_reject_file(job):
+    if not job.reject_file:
+        os.makedirs(REJECTS_DIR, exist_ok=True)
+        job.reject_file = os.path.join(REJECTS_DIR, f'import_{job.pk}_ditolak.csv')
+        job.save(update_fields=['reject_file'])
+
+
+def _finish_identical(job, identical):
+    """
+    Complete a job whose file is byte-for-byte the last imported one
+    """
+    logger.info(f"Import job {job.pk} matches upload {identical.pk}, skipping rows")
+    job.status = 'done'
+    job.success_count = identical.success_count
+    job.error_count = identical.error_count
+    job.unchanged_count = identical.success_count
+    job.finished_at = timezone.now()
+    job.message = f'File sama dengan upload terakhir ({identical.filename}), tidak ada item yang berubah.'
+    job.save(update_fields=['status', 'success_count', 'error_count', 'unchanged_count', 'finished_at', 'message'])
+
+    _record_upload(job)
+    ActivityLog.objects.create(
+        user=job.user,
+        action='upload_file',
+        status='success',
+        notes=f'File {job.filename} sama dengan upload terakhir, tidak ada item yang berubah.'
+    )
+    _remove_file_of(job)
+
+
+def _record_upload(job, metrics=None):
+    UploadHistory.objects.create(
+        user=job.user,
+        filename=job.filename,
+        file_path=job.file_path,
+        file_size=job.file_size,
+        success_count=job.success_count,
+        error_count=job.error_count,
+        file_digest=job.file_digest,
+        duration_seconds=round(metrics.seconds, 3) if metrics else None,
+        rows_per_second=round(metrics.rows_per_second, 1) if metrics else None,
+    )
+
+
+def _count_summary(job):
+    return f'{job.created_count} item baru, {job.changed_count} item berubah, {job.unchanged_count} item tidak berubah'
+
+
+def _skip_rows(batches, count, on_skip=None):
+    """
+    Drop the first `count` rows (already committed by an earlier run),
+    passing them to `on_skip` when given
+    """
+    for df in batches:
+        if count >= len(df):
+            count -= len(df)
+            if on_skip is not None:
+                on_skip(df)
+            continue
+        if count:
+            if on_skip is not None:
+                on_skip(df.iloc[:count])
+            df = df.iloc[count:]
+            count = 0
+        yield df
+
+
+def _remove_file_of(job):
+    """
+    Remove a finished job's stored upload. Files given to the import_stock
+    command belong to the user and are left in place.
+    """
+    if job.mode != 'command':
+        _remove_file(job.file_path)
+
+
+def _remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove import file {file_path}: {str(e)}")
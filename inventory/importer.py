@@ -0,0 +1,311 @@
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from collections import Counter
+from decimal import Decimal
+import numpy as np
+import logging
+import sqlite3
+from .models import Item, rows_changed
+from .fingerprints import stock_fingerprints
+from .validation import validate_stock_frame, REASON_COLUMN
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Columns expected in the stock upload file
+STOCK_COLUMNS = ['Kode', 'Nama Barang', 'Kategori', 'Harga Jual', 'Total Stok']
+
+# Fields written by the stock upload. Manual fields (minimum_stock,
+# expiry_date, latest_price, transfer_stock) are never touched on update.
+IMPORT_UPDATE_FIELDS = ['name', 'category', 'current_stock', 'selling_price', 'import_fingerprint', 'updated_at']
+
+# Rows written per transaction
+IMPORT_CHUNK_SIZE = 5000
+
+# Rows per INSERT/UPDATE statement inside a chunk
+IMPORT_BATCH_SIZE = 500
+
+
+class StockImporter:
+    """
+    Bulk upsert engine for the stock upload.
+
+    Each chunk is validated first (see validate_stock_frame) and only clean
+    rows reach the database. Existing item codes are loaded once with a
+    single query, each chunk is split into creates and updates with set
+    operations and written with bulk_create/bulk_update inside one
+    transaction per chunk. Rows whose fingerprint matches the stored one
+    are not written at all.
+    """
+
+    def __init__(self, user=None, chunk_size=IMPORT_CHUNK_SIZE, batch_size=IMPORT_BATCH_SIZE, on_chunk=None,
+                 reject_writer=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        # Called with the raw row count of each chunk inside its
+        # transaction, so progress is committed together with the data
+        self.on_chunk = on_chunk
+        # Receives the rejected rows of each chunk (see RejectWriter)
+        self.reject_writer = reject_writer
+        self.created_count = 0
+        self.changed_count = 0
+        self.unchanged_count = 0
+        self.error_count = 0
+        self.reject_reasons = Counter()
+        self.seen_codes = set()
+        self._existing = None
+        self._fingerprints = None
+
+    @property
+    def success_count(self):
+        return self.created_count + self.changed_count + self.unchanged_count
+
+    @property
+    def existing(self):
+        """
+        Map of item code -> id for every item in the database, loaded once
+        """
+        if self._existing is None:
+            self._load_existing()
+        return self._existing
+
+    @property
+    def fingerprints(self):
+        """
+        Map of item code -> stored fingerprint, loaded with `existing`
+        """
+        if self._fingerprints is None:
+            self._load_existing()
+        return self._fingerprints
+
+    def _load_existing(self):
+        self._existing = {}
+        self._fingerprints = {}
+        for code, pk, fingerprint in Item.objects.values_list('code', 'id', 'import_fingerprint').iterator(chunk_size=10000):
+            self._existing[code] = pk
+            if fingerprint is not None:
+                self._fingerprints[code] = fingerprint
+
+    def reject_summary(self):
+        """
+        Rejected rows per reason, e.g. 'Kode duplikat: 3, Harga Jual negatif: 1'
+        """
+        return ', '.join(f'{reason}: {count}' for reason, count in self.reject_reasons.most_common())
+
+    def import_frame(self, df):
+        """
+        Import a whole DataFrame, committing one transaction per chunk
+        """
+        for start in range(0, len(df), self.chunk_size):
+            self.import_chunk(df.iloc[start:start + self.chunk_size])
+        return self.success_count, self.error_count
+
+    def import_batches(self, batches, metrics=None):
+        """
+        Import DataFrames as they are yielded by a streaming reader
+        """
+        for df in batches:
+            self.import_frame(df)
+            if metrics is not None:
+                metrics.add_rows(len(df))
+        return self.success_count, self.error_count
+
+    def import_chunk(self, df):
+        """
+        Validate, split and write one chunk of rows in a single transaction
+        """
+        self.write_chunk(self.validate_chunk(df), len(df))
+
+    def validate_chunk(self, df):
+        """
+        Validate one chunk of upload rows, record the rejects and return the
+        clean rows with their fingerprint
+        """
+        frame, rejects = validate_stock_frame(df, self.seen_codes)
+        if not rejects.empty:
+            self.error_count += len(rejects)
+            logger.warning(f"Rejected {len(rejects)} rows in stock upload")
+        self._record_rejects(rejects)
+        self.seen_codes.update(frame['Kode'].tolist())
+        return frame.assign(fingerprint=stock_fingerprints(frame))
+
+    def replay_chunk(self, df):
+        """
+        Validate rows committed by an earlier run of the same upload without
+        writing or counting them, so a resumed import still rejects codes
+        duplicated across the restart and the reject file is rebuilt with
+        each reject once
+        """
+        frame, rejects = validate_stock_frame(df, self.seen_codes)
+        self._record_rejects(rejects)
+        self.seen_codes.update(frame['Kode'].tolist())
+
+    def _record_rejects(self, rejects):
+        if rejects.empty:
+            return
+        self.reject_reasons.update(rejects[REASON_COLUMN].str.split('; ').explode().value_counts().to_dict())
+        if self.reject_writer is not None:
+            self.reject_writer.write(rejects)
+
+    def write_chunk(self, frame, row_count):
+        """
+        Split validated rows into creates and updates and write them in a
+        single transaction. `row_count` is the number of upload rows the
+        frame came from, reported to `on_chunk`.
+        """
+        existing = self.existing
+        fingerprints = self.fingerprints
+
+        # Rows identical to what is stored are skipped entirely
+        stored = np.array([fingerprints.get(code) for code in frame['Kode']], dtype=object)
+        unchanged = stored == frame['fingerprint'].to_numpy()
+        frame = frame[~unchanged]
+
+        # Set lookups per row; isin() would copy every known code per chunk
+        is_update = np.array([code in existing for code in frame['Kode']], dtype=bool)
+        now = timezone.now()
+
+        to_update = [
+            (existing[row.Kode], row.name, row.category, row.current_stock, row.selling_price, row.fingerprint, now)
+            for row in _iter_rows(frame[is_update])
+        ]
+        to_create = [
+            Item(
+                code=row.Kode,
+                name=row.name,
+                category=row.category,
+                current_stock=row.current_stock,
+                selling_price=row.selling_price,
+                import_fingerprint=row.fingerprint,
+                # Initialize manual fields with defaults
+                minimum_stock=0,
+                latest_price=None,
+                expiry_date=None,
+            )
+            for row in _iter_rows(frame[~is_update])
+        ]
+
+        with transaction.atomic():
+            if to_update:
+                bulk_update_rows(to_update, IMPORT_UPDATE_FIELDS, batch_size=self.batch_size)
+            if to_create:
+                Item.objects.bulk_create(to_create, batch_size=self.batch_size)
+            self.created_count += len(to_create)
+            self.changed_count += len(to_update)
+            self.unchanged_count += int(unchanged.sum())
+            if self.on_chunk is not None:
+                self.on_chunk(row_count)
+
+        # bulk_create only sets primary keys on backends that can return
+        # them, otherwise refresh the code map for just the new codes
+        missing_codes = []
+        for item in to_create:
+            if item.pk is not None:
+                existing[item.code] = item.pk
+            else:
+                missing_codes.append(item.code)
+        for start in range(0, len(missing_codes), self.batch_size):
+            existing.update(
+                Item.objects.filter(code__in=missing_codes[start:start + self.batch_size]).values_list('code', 'id')
+            )
+
+
+def bulk_update_rows(rows, fields, batch_size=IMPORT_BATCH_SIZE, model=Item):
+    """
+    Write `fields` for existing rows given as (pk, value, ...) tuples.
+
+    Django's bulk_update builds a CASE WHEN expression per row and field,
+    which costs about a millisecond per row in Python. On PostgreSQL and
+    SQLite >= 3.33 the rows are sent as a VALUES list joined with
+    UPDATE ... FROM instead, falling back to bulk_update elsewhere.
+    """
+    if not rows:
+        return
+    connection = connections[DEFAULT_DB_ALIAS]
+    model_fields = [model._meta.get_field(name) for name in fields]
+
+    if not _supports_update_from(connection):
+        objs = []
+        for row in rows:
+            obj = model(pk=row[0])
+            for field, value in zip(model_fields, row[1:]):
+                setattr(obj, field.attname, value)
+            objs.append(obj)
+        model.objects.bulk_update(objs, fields, batch_size=batch_size)
+        return
+
+    # The raw UPDATE below bypasses the queryset hooks
+    rows_changed(model, connection.alias)
+
+    quote = connection.ops.quote_name
+    pk_field = model._meta.pk
+    table = quote(model._meta.db_table)
+    pk_column = quote(pk_field.column)
+    columns = [quote(field.column) for field in model_fields]
+    assignments = ', '.join(
+        f'{column} = {_cast_value(connection, f"v.{column}", field)}'
+        for column, field in zip(columns, model_fields)
+    )
+
+    # Keep each statement under the backend's parameter limit
+    max_batch = connection.ops.bulk_batch_size([pk_field] + model_fields, rows)
+    if max_batch:
+        batch_size = min(batch_size, max_batch)
+    row_sql = '(' + ', '.join(['%s'] * (len(columns) + 1)) + ')'
+
+    # Values repeat a lot (categories, the update timestamp), so adapt each
+    # distinct value once per field
+    prepared = [{} for _ in model_fields]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = []
+            for row in batch:
+                params.append(row[0])
+                for i, value in enumerate(row[1:]):
+                    try:
+                        params.append(prepared[i][value])
+                    except KeyError:
+                        db_value = model_fields[i].get_db_prep_save(value, connection)
+                        prepared[i][value] = db_value
+                        params.append(db_value)
+            cursor.execute(
+                f'WITH v ({pk_column}, {", ".join(columns)}) AS (VALUES {", ".join([row_sql] * len(batch))}) '
+                f'UPDATE {table} SET {assignments} FROM v WHERE {table}.{pk_column} = v.{pk_column}',
+                params,
+            )
+
+
+def _cast_value(connection, sql, field):
+    """
+    PostgreSQL types VALUES columns from their literals (an all-NULL column
+    becomes text), so cast back to the column type there
+    """
+    if connection.vendor == 'postgresql':
+        return f'CAST({sql} AS {field.cast_db_type(connection)})'
+    return sql
+
+
+def _supports_update_from(connection):
+    """
+    Whether the database understands UPDATE ... FROM
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 33, 0)
+    return False
+
+
+def _iter_rows(frame):
+    """
+    Iterate over normalized rows with the price converted to Decimal
+    """
+    for row in frame.itertuples(index=False):
+        yield row._replace(
+            current_stock=int(row.current_stock),
+            fingerprint=int(row.fingerprint),
+            selling_price=Decimal(str(row.selling_price)).quantize(Decimal('0.01')),
+        )
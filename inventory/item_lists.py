@@ -0,0 +1,133 @@
+from django.urls import reverse
+from .models import Item
+from .pagination import AFTER_PARAM, BEFORE_PARAM
+from .search import search_items, SEARCH_FIELDS
+
+# ?view= value showing a whole list in the virtual scroller instead of pages
+SCROLL_VIEW = 'scroll'
+
+# Item list pages: the `sort` values each one offers (name ascending is the
+# default), the columns searched, whether ?filter=low_stock applies, the
+# fields its rows need and whether Staff Gudang may open it
+ITEM_LISTS = {
+    'kelola_stok_barang': {
+        'sorts': {
+            'name_desc': '-name',
+            'category': 'category',
+            'category_desc': '-category',
+            'stock_asc': 'current_stock',
+            'stock_desc': '-current_stock',
+        },
+        'search_fields': SEARCH_FIELDS,
+        'low_stock_filter': True,
+        'fields': ['id', 'code', 'name', 'category', 'current_stock', 'minimum_stock'],
+        'staff_gudang': False,
+    },
+    'data_exp_produk': {
+        'sorts': {
+            'exp_asc': 'expiry_date',
+            'exp_desc': '-expiry_date',
+            'name_desc': '-name',
+            'stock_asc': 'current_stock',
+            'stock_desc': '-current_stock',
+        },
+        'search_fields': ('code', 'name'),
+        'low_stock_filter': False,
+        'fields': ['id', 'code', 'name', 'current_stock', 'expiry_date'],
+        'staff_gudang': True,
+    },
+    'kelola_harga': {
+        'sorts': {
+            'name_desc': '-name',
+            'category': 'category',
+            'category_desc': '-category',
+            'price_asc': 'selling_price',
+            'price_desc': '-selling_price',
+        },
+        'search_fields': SEARCH_FIELDS,
+        'low_stock_filter': False,
+        'fields': ['id', 'code', 'name', 'category', 'selling_price', 'latest_price'],
+        'staff_gudang': False,
+    },
+    'transfer_stok': {
+        'sorts': {
+            'name_desc': '-name',
+            'category': 'category',
+            'category_desc': '-category',
+            'stock_asc': 'current_stock',
+            'stock_desc': '-current_stock',
+        },
+        'search_fields': SEARCH_FIELDS,
+        'low_stock_filter': True,
+        'fields': ['id', 'code', 'name', 'current_stock', 'transfer_stock'],
+        'staff_gudang': True,
+    },
+}
+
+
+def item_list(request, name):
+    """
+    Items of list page `name` for the query, filter and sort in the request,
+    with the order to paginate them by
+    """
+    config = ITEM_LISTS[name]
+    query = request.GET.get("query", "")
+    sort = request.GET.get("sort", "")
+
+    items = Item.objects.all()
+
+    # Default sort by name ascending
+    order = "name"
+
+    # Search functionality
+    if query:
+        items = search_items(items, query, fields=config['search_fields'])
+        # Best matches first unless another sort was chosen
+        if not sort:
+            order = "search_rank"
+
+    # Filter functionality
+    if config['low_stock_filter'] and request.GET.get("filter", "") == "low_stock":
+        items = items.below_minimum()
+
+    # Specific sorting functionality (overrides default)
+    order = config['sorts'].get(sort, order)
+    return items, order
+
+
+def item_rows(items, name, order, extra=()):
+    """
+    `items` reduced to the row fields of list page `name` (plus `extra` and
+    the sort field, which the page cursor reads) as light row tuples
+    """
+    fields = [*ITEM_LISTS[name]['fields'], *extra]
+    if order.lstrip('-') not in fields:
+        fields.append(order.lstrip('-'))
+    return items.rows(*fields)
+
+
+def item_table_url(request, name):
+    """
+    URL of the columnar rows of list page `name`, for the query, filter and
+    sort of the current request
+    """
+    params = _list_params(request)
+    url = reverse('inventory:item_table_api', args=[name])
+    return f'{url}?{params.urlencode()}' if params else url
+
+
+def view_queries(request):
+    """
+    Query strings showing the current list in pages or in the scroller
+    """
+    params = _list_params(request)
+    paged = params.urlencode()
+    params['view'] = SCROLL_VIEW
+    return {'paged': paged, 'scroll': params.urlencode()}
+
+
+def _list_params(request):
+    params = request.GET.copy()
+    for key in ('view', AFTER_PARAM, BEFORE_PARAM):
+        params.pop(key, None)
+    return params
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from inventory.benchmark import (
+    BENCHMARK_SIZES, DEFAULT_BENCHMARK_SIZES, ensure_file, benchmark_user,
+    run_stock_benchmarks, run_exp_benchmark, environment_info,
+)
+import json
+import os
+import platform
+import subprocess
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the stock and Data Exp Produk uploads on generated catalogs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=DEFAULT_BENCHMARK_SIZES,
+            help=f'Catalog sizes in rows (known sizes: {", ".join(map(str, BENCHMARK_SIZES))})',
+        )
+        parser.add_argument(
+            '--formats',
+            nargs='+',
+            choices=['xlsx', 'csv'],
+            default=['xlsx', 'csv'],
+            help='Stock upload file formats to benchmark',
+        )
+        parser.add_argument(
+            '--skip-exp',
+            action='store_true',
+            help='Do not benchmark the Data Exp Produk upload',
+        )
+        parser.add_argument(
+            '--data-dir',
+            default=os.path.join(settings.BASE_DIR, 'benchmark_results', 'data'),
+            help='Directory for the generated files, reused between runs',
+        )
+        parser.add_argument(
+            '--output',
+            help='JSON file for the results (default: benchmark_results/import_<commit>_<time>.json)',
+        )
+        parser.add_argument(
+            '--generate-only',
+            action='store_true',
+            help='Only generate the files',
+        )
+
+    def handle(self, *args, **options):
+        if any(size <= 0 for size in options['sizes']):
+            raise CommandError('Sizes must be positive')
+
+        files = []
+        for rows in options['sizes']:
+            for file_format in options['formats']:
+                files.append(('stock', rows, file_format, ensure_file(options['data_dir'], 'stock', rows, file_format)))
+            if not options['skip_exp']:
+                files.append(('exp', rows, 'xlsx', ensure_file(options['data_dir'], 'exp', rows, 'xlsx')))
+        self.stdout.write(f'{len(files)} files ready in {options["data_dir"]}')
+        if options['generate_only']:
+            return
+
+        commit = current_commit()
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmark_results',
+            f'import_{commit}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.json',
+        )
+
+        # Run against a throwaway test database so the real items are never
+        # touched; on SQLite use a file instead of the in-memory default, so
+        # the database does not count towards the process memory
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(options['data_dir'], 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        results = []
+        try:
+            user = benchmark_user()
+            for kind, rows, file_format, path in files:
+                self.stdout.write(f'Running {kind} {file_format} {rows} rows...')
+                if kind == 'stock':
+                    batch = run_stock_benchmarks(path, file_format, rows, user)
+                else:
+                    batch = run_exp_benchmark(path, rows, user)
+                for result in batch:
+                    self.stdout.write(
+                        f'  {result["scenario"]:<16} {result["seconds"]:>9.2f} s {result["queries"]:>7} queries '
+                        f'{result["rows_per_second"]:>10.0f} rows/s {result["peak_rss_mb"]:>8.0f} MB'
+                    )
+                results.extend(batch)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            **environment_info(),
+            'results': results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.models import ImportJob
+from inventory.importer import IMPORT_CHUNK_SIZE, IMPORT_BATCH_SIZE
+from inventory.import_jobs import hash_file, run_import_job
+import os
+import signal
+
+# Width of the progress bar in characters
+BAR_WIDTH = 30
+
+
+class Command(BaseCommand):
+    help = 'Import a stock file (XLSX, CSV, TSV or Parquet) directly, without the upload form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path to the stock file')
+        parser.add_argument(
+            '--user',
+            help='Username recorded in the upload history and activity log',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Rows committed per transaction; also the resume granularity',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Rows per INSERT/UPDATE statement',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last unfinished import of the same file after its last committed chunk',
+        )
+
+    def handle(self, *args, **options):
+        file_path = os.path.abspath(options['file'])
+        if not os.path.isfile(file_path):
+            raise CommandError(f'File not found: {file_path}')
+        if options['chunk_size'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--chunk-size and --batch-size must be positive')
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'User not found: {options["user"]}')
+
+        digest = hash_file(file_path)
+        now = timezone.now()
+        if options['resume']:
+            # The checkpoint is the job row: its rows_done is committed in the
+            # same transaction as each chunk
+            job = ImportJob.objects.filter(mode='command', file_digest=digest).exclude(status='done').first()
+            if job is None:
+                raise CommandError('No unfinished import of this file to resume')
+            job.file_path = file_path
+            job.status = 'running'
+            job.started_at = now
+            job.started_rows = job.rows_done
+            job.heartbeat_at = now
+            job.finished_at = None
+            job.save(update_fields=['file_path', 'status', 'started_at', 'started_rows', 'heartbeat_at', 'finished_at'])
+            self.stdout.write(f'Resuming import job {job.pk} after row {job.rows_done}')
+        else:
+            job = ImportJob.objects.create(
+                user=user,
+                mode='command',
+                filename=os.path.basename(file_path),
+                file_path=file_path,
+                file_size=os.path.getsize(file_path),
+                file_digest=digest,
+                status='running',
+                started_at=now,
+                heartbeat_at=now,
+            )
+            self.stdout.write(f'Importing {job.filename} as import job {job.pk}')
+
+        # Treat SIGTERM like Ctrl+C; committed chunks are kept either way
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            run_import_job(
+                job,
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                on_progress=self.show_progress,
+            )
+        except KeyboardInterrupt:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            job.message = f'Dihentikan setelah {job.rows_done} baris'
+            job.save(update_fields=['status', 'finished_at', 'message'])
+            self.stdout.write('')
+            raise CommandError(
+                f'Import stopped after row {job.rows_done}. Run the same command with --resume to continue.'
+            )
+
+        self.stdout.write('')
+        if job.status != 'done':
+            raise CommandError(f'{job.message} (rows committed: {job.rows_done}; --resume continues after them)')
+        self.stdout.write(self.style.SUCCESS(job.message))
+        if job.has_rejects:
+            self.stdout.write(self.style.WARNING(f'Rejected rows: {job.reject_file}'))
+
+    def show_progress(self, job):
+        percent = job.progress_percent
+        if percent is None:
+            self.stdout.write(f'\r{job.rows_done} rows', ending='')
+        else:
+            filled = BAR_WIDTH * percent // 100
+            eta = job.eta_seconds
+            self.stdout.write(
+                f'\r[{"#" * filled}{"." * (BAR_WIDTH - filled)}] {percent:3d}% '
+                f'{job.rows_done}/{job.total_rows} rows'
+                + (f', ETA {eta // 60}:{eta % 60:02d}' if eta is not None else ''),
+                ending='',
+            )
+        self.stdout.flush()
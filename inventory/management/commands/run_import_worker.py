@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from inventory.import_jobs import claim_next_job, release_job, run_import_job, purge_expired_previews
+import signal
+import time
+
+# Seconds between clean-ups of previews that were never applied
+PURGE_INTERVAL = 600
+
+class Command(BaseCommand):
+    help = 'Process queued stock upload jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently in the queue and exit',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        # Treat SIGTERM (deploys, restarts) like Ctrl+C so the current job is
+        # handed back to the queue; committed chunks are kept
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        self.stdout.write('Import worker started')
+        job = None
+        last_purge = 0
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if time.monotonic() - last_purge > PURGE_INTERVAL:
+                        purge_expired_previews()
+                        last_purge = time.monotonic()
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f'Processing import job {job.pk} ({job.filename}) from row {job.rows_done}')
+                run_import_job(job)
+                if job.status == 'done':
+                    self.stdout.write(self.style.SUCCESS(f'Import job {job.pk} finished: {job.message}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Import job {job.pk} failed: {job.message}'))
+                job = None
+        except KeyboardInterrupt:
+            if job is not None:
+                release_job(job)
+                self.stdout.write(self.style.WARNING(f'Import job {job.pk} returned to the queue at row {job.rows_done}'))
+            self.stdout.write('Import worker stopped')
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from concurrent.futures import ThreadPoolExecutor
+from inventory.webhooks import claim_deliveries, release_deliveries, deliver
+import logging
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Send queued Telegram webhook messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Messages sent at the same time',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the messages currently in the queue and exit',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        # Treat SIGTERM (deploys, restarts) like Ctrl+C so claimed messages
+        # that were not sent go back to the queue
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(f'Webhook worker started ({concurrency} at a time)')
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        claimed = []
+        try:
+            while True:
+                claimed = claim_deliveries(concurrency * 2)
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                results = list(pool.map(_deliver, claimed))
+                sent = sum(1 for delivery in results if delivery.status == 'sent')
+                self.stdout.write(f'Sent {sent} of {len(results)} webhook message(s)')
+                claimed = []
+        except KeyboardInterrupt:
+            pool.shutdown(wait=True, cancel_futures=True)
+            release_deliveries([delivery.pk for delivery in claimed])
+            self.stdout.write('Webhook worker stopped')
+        else:
+            pool.shutdown()
+
+
+def _deliver(delivery):
+    # Each pool thread keeps its own database connection
+    try:
+        return deliver(delivery)
+    except Exception as e:
+        logger.error(f"Error delivering webhook message {delivery.pk}: {str(e)}")
+        return delivery
+    finally:
+        close_old_connections()
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_webhooksettings_webhook_pesanan_dibatalkan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='Nama File')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Path File')),
+                ('file_size', models.IntegerField(default=0, verbose_name='Ukuran File (bytes)')),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('running', 'Diproses'), ('done', 'Selesai'), ('failed', 'Gagal')], db_index=True, default='pending', max_length=10, verbose_name='Status')),
+                ('total_rows', models.IntegerField(blank=True, null=True, verbose_name='Total Baris')),
+                ('rows_done', models.IntegerField(default=0, verbose_name='Baris Diproses')),
+                ('success_count', models.IntegerField(default=0, verbose_name='Jumlah Item Berhasil')),
+                ('error_count', models.IntegerField(default=0, verbose_name='Jumlah Item Gagal')),
+                ('message', models.TextField(blank=True, null=True, verbose_name='Pesan')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('started_rows', models.IntegerField(default=0)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Import Job',
+                'verbose_name_plural': 'Import Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='changed_count',
+            field=models.IntegerField(default=0, verbose_name='Item Berubah'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='created_count',
+            field=models.IntegerField(default=0, verbose_name='Item Baru'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='file_digest',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Digest File'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='unchanged_count',
+            field=models.IntegerField(default=0, verbose_name='Item Tidak Berubah'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='import_fingerprint',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='file_digest',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Digest File'),
+        ),
+    ]
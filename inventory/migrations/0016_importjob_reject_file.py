@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_item_fingerprint_upload_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='reject_file',
+            field=models.CharField(blank=True, default='', max_length=500, verbose_name='File Baris Ditolak'),
+        ),
+    ]
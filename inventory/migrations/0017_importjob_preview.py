@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_importjob_reject_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('import', 'Import'), ('preview', 'Pratinjau'), ('apply', 'Terapkan Pratinjau')], default='import', max_length=10, verbose_name='Mode'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='preview',
+            field=models.JSONField(blank=True, null=True, verbose_name='Pratinjau'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='preview_token',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Token Pratinjau'),
+        ),
+    ]
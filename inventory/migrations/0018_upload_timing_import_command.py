@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_importjob_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Durasi (detik)'),
+        ),
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='Baris per Detik'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('import', 'Import'), ('preview', 'Pratinjau'), ('apply', 'Terapkan Pratinjau'), ('command', 'Baris Perintah')], default='import', max_length=10, verbose_name='Mode'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0021_item_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('current_stock__lt', models.F('minimum_stock'))), fields=['name', 'id'], name='item_below_min_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='packingitem',
+            index=models.Index(condition=models.Q(('current_stock__lt', models.F('minimum_stock'))), fields=['name', 'id'], name='packing_below_min_idx'),
+        ),
+    ]
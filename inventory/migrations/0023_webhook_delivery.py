@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_below_minimum_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.UUIDField(db_index=True, default=uuid.uuid4, verbose_name='Batch')),
+                ('channel', models.CharField(choices=[('kelola_stok', 'Kelola Stok'), ('transfer_stok', 'Transfer Stok'), ('data_exp_produk', 'Data Exp Produk'), ('kelola_harga', 'Kelola Harga'), ('kelola_stok_packing', 'Kelola Stok Packing'), ('pesanan_dibatalkan', 'Pesanan Dibatalkan')], max_length=30, verbose_name='Kanal')),
+                ('url', models.URLField(max_length=500, verbose_name='URL Webhook')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('action', models.CharField(max_length=50, verbose_name='Aksi')),
+                ('description', models.CharField(max_length=255, verbose_name='Keterangan')),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('sending', 'Sedang Dikirim'), ('sent', 'Terkirim'), ('failed', 'Gagal')], db_index=True, default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Jumlah Percobaan')),
+                ('response_status', models.IntegerField(blank=True, null=True, verbose_name='Status HTTP')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Webhook Delivery',
+                'verbose_name_plural': 'Webhook Deliveries',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='webhook_delivery_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_webhook_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Percobaan Berikutnya'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0024_webhook_delivery_retry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookRateLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('kelola_stok', 'Kelola Stok'), ('transfer_stok', 'Transfer Stok'), ('data_exp_produk', 'Data Exp Produk'), ('kelola_harga', 'Kelola Harga'), ('kelola_stok_packing', 'Kelola Stok Packing'), ('pesanan_dibatalkan', 'Pesanan Dibatalkan')], max_length=30, unique=True, verbose_name='Kanal')),
+                ('tokens', models.FloatField(verbose_name='Token')),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='slot_reserved',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -2,6 +2,11 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import os
+import uuid
+from .fingerprints import FINGERPRINT_FIELDS, item_fingerprint
+from .dashboard_stats import invalidate_dashboard_stats
+from .conditional import invalidate_list_validator
+from .projections import RowIterable
 
 class UserProfile(models.Model):
     ROLE_CHOICES = (
@@ -33,6 +38,71 @@ class UserProfile(models.Model):
     def is_manajer(self):
         return self.role == 'manajer'
 
+class StockQuerySet(models.QuerySet):
+    """
+    Queryset of Item and PackingItem. Bulk writes, which skip save() and
+    delete(), drop the cached dashboard numbers and list validators too.
+    """
+
+    def below_minimum(self):
+        """
+        Items whose stock is under their own minimum stock, compared in the
+        database so the result can still be sorted and paginated
+        """
+        return self.filter(BELOW_MINIMUM)
+
+    def rows(self, *fields):
+        """
+        Just `fields` of each row (one of them 'id'), as light tuples with
+        attribute access instead of model instances. The result is still a
+        queryset, so it can be filtered, sorted and sliced.
+        """
+        clone = self.values_list(*fields)
+        clone._iterable_class = RowIterable
+        return clone
+
+    def update(self, **kwargs):
+        # updated_at keys the cached table rows and the typeahead refresh
+        kwargs.setdefault('updated_at', timezone.now())
+        rows_changed(self.model, self.db)
+        return super().update(**kwargs)
+
+    def delete(self):
+        rows_changed(self.model, self.db)
+        return super().delete()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        rows_changed(self.model, self.db)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows_changed(self.model, self.db)
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+def rows_changed(model, using='default'):
+    """
+    Drop what is cached about the rows of `model` once the write commits:
+    the dashboard numbers and the validator of its list pages
+    """
+    invalidate_dashboard_stats(using)
+    invalidate_list_validator(model, using)
+
+
+# Condition of below_minimum(), shared with the partial indexes that serve it
+BELOW_MINIMUM = models.Q(current_stock__lt=models.F('minimum_stock'))
+
+
+def _touch_updated_at(kwargs):
+    """
+    auto_now only applies to fields being saved, so partial saves include
+    updated_at to mark the row as changed
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'updated_at' not in update_fields:
+        kwargs['update_fields'] = list(update_fields) + ['updated_at']
+
+
 class Item(models.Model):
     code = models.CharField(max_length=50, unique=True, verbose_name="Kode Barang")
     name = models.CharField(max_length=255, verbose_name="Nama Barang")
@@ -44,15 +114,47 @@ class Item(models.Model):
     transfer_stock = models.IntegerField(default=0, null=True, blank=True, verbose_name="Stok Transfer")
     expiry_date = models.DateField(null=True, blank=True, verbose_name="Tanggal Expired")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Indexed for the typeahead index, which polls for changed items
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Hash of name/category/stock/price, used by the stock upload to skip
+    # rows that did not change
+    import_fingerprint = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    objects = StockQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        # Keep the fingerprint in line with edits made outside the stock
+        # upload (expiry upload, admin), so the next upload rewrites them
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(FINGERPRINT_FIELDS):
+            self.import_fingerprint = item_fingerprint(self.name, self.category, self.current_stock, self.selling_price)
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['import_fingerprint']
+        _touch_updated_at(kwargs)
+        super().save(*args, **kwargs)
+        rows_changed(type(self), self._state.db)
+
+    def delete(self, *args, **kwargs):
+        rows_changed(type(self), self._state.db)
+        return super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ['code']
         verbose_name = "Item"
         verbose_name_plural = "Items"
+        # Sort keys of the item list pages, with id as the keyset tiebreaker
+        indexes = [
+            models.Index(fields=['name', 'id'], name='item_name_id_idx'),
+            models.Index(fields=['category', 'id'], name='item_category_id_idx'),
+            models.Index(fields=['current_stock', 'id'], name='item_stock_id_idx'),
+            models.Index(fields=['selling_price', 'id'], name='item_price_id_idx'),
+            models.Index(fields=['expiry_date', 'id'], name='item_expiry_id_idx'),
+            # Only the items below their minimum, in the default name order
+            models.Index(fields=['name', 'id'], condition=BELOW_MINIMUM, name='item_below_min_idx'),
+        ]
 
 
 class PackingItem(models.Model):
@@ -67,13 +169,27 @@ class PackingItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = StockQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        _touch_updated_at(kwargs)
+        super().save(*args, **kwargs)
+        rows_changed(type(self), self._state.db)
+
+    def delete(self, *args, **kwargs):
+        rows_changed(type(self), self._state.db)
+        return super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ['code']
         verbose_name = "Packing Item"
         verbose_name_plural = "Packing Items"
+        indexes = [
+            models.Index(fields=['name', 'id'], condition=BELOW_MINIMUM, name='packing_below_min_idx'),
+        ]
 
 
 class WebhookSettings(models.Model):
@@ -95,6 +211,76 @@ class WebhookSettings(models.Model):
         verbose_name_plural = "Webhook Settings"
 
 
+class WebhookDelivery(models.Model):
+    """
+    Outbox of Telegram webhook messages. The senders queue one row per
+    message and answer at once; the run_webhook_worker command posts them.
+    Messages queued by one action share a batch, whose progress the page
+    polls.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Menunggu'),
+        ('sending', 'Sedang Dikirim'),
+        ('sent', 'Terkirim'),
+        ('failed', 'Gagal'),
+    )
+    # Pages with a Telegram webhook, named like the WebhookSettings fields
+    CHANNEL_CHOICES = (
+        ('kelola_stok', 'Kelola Stok'),
+        ('transfer_stok', 'Transfer Stok'),
+        ('data_exp_produk', 'Data Exp Produk'),
+        ('kelola_harga', 'Kelola Harga'),
+        ('kelola_stok_packing', 'Kelola Stok Packing'),
+        ('pesanan_dibatalkan', 'Pesanan Dibatalkan'),
+    )
+    
+    batch = models.UUIDField(default=uuid.uuid4, db_index=True, verbose_name="Batch")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="User")
+    channel = models.CharField(max_length=30, choices=CHANNEL_CHOICES, verbose_name="Kanal")
+    url = models.URLField(max_length=500, verbose_name="URL Webhook")
+    payload = models.JSONField(verbose_name="Payload")
+    # Activity log entry written when the message is sent or fails
+    action = models.CharField(max_length=50, verbose_name="Aksi")
+    description = models.CharField(max_length=255, verbose_name="Keterangan")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="Status")
+    attempts = models.IntegerField(default=0, verbose_name="Jumlah Percobaan")
+    response_status = models.IntegerField(null=True, blank=True, verbose_name="Status HTTP")
+    error = models.TextField(blank=True, default='', verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Set when a failed message is queued again: it is not sent before then
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Percobaan Berikutnya")
+    # The message already took a place in its channel's rate limit and is
+    # waiting for it (next_attempt_at)
+    slot_reserved = models.BooleanField(default=False)
+    
+    def __str__(self):
+        return f"{self.get_channel_display()} - {self.description} - {self.get_status_display()}"
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Webhook Delivery"
+        verbose_name_plural = "Webhook Deliveries"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='webhook_delivery_queue_idx'),
+        ]
+
+
+class WebhookRateLimit(models.Model):
+    """
+    Token bucket of one webhook channel, shared by all worker processes:
+    `tokens` messages could be sent at `updated_at`. Below zero, messages
+    have reserved the coming tokens and wait for them.
+    """
+    channel = models.CharField(max_length=30, choices=WebhookDelivery.CHANNEL_CHOICES, unique=True, verbose_name="Kanal")
+    tokens = models.FloatField(verbose_name="Token")
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.get_channel_display()} - {self.tokens:.1f}"
+
+
 class SystemSettings(models.Model):
     """
     Model for storing system-wide settings like timezone
@@ -140,6 +326,11 @@ class UploadHistory(models.Model):
     upload_date = models.DateTimeField(auto_now_add=True, verbose_name="Tanggal Upload")
     success_count = models.IntegerField(default=0, verbose_name="Jumlah Item Berhasil")
     error_count = models.IntegerField(default=0, verbose_name="Jumlah Item Gagal")
+    # SHA-256 of the uploaded file, lets an identical stock upload be skipped
+    file_digest = models.CharField(max_length=64, blank=True, default='', db_index=True, verbose_name="Digest File")
+    # Timing of the stock import that produced this upload
+    duration_seconds = models.FloatField(null=True, blank=True, verbose_name="Durasi (detik)")
+    rows_per_second = models.FloatField(null=True, blank=True, verbose_name="Baris per Detik")
     
     def __str__(self):
         return f"{self.filename} - {self.upload_date}"
@@ -158,6 +349,84 @@ class UploadHistory(models.Model):
         verbose_name_plural = "Upload Histories"
 
 
+class ImportJob(models.Model):
+    """
+    Queued stock upload processed in chunks by the run_import_worker command.
+    Jobs in 'command' mode are run by the import_stock command and are never
+    picked up by the worker.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Menunggu'),
+        ('running', 'Diproses'),
+        ('done', 'Selesai'),
+        ('failed', 'Gagal'),
+    )
+    MODE_CHOICES = (
+        ('import', 'Import'),
+        ('preview', 'Pratinjau'),
+        ('apply', 'Terapkan Pratinjau'),
+        ('command', 'Baris Perintah'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="User")
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='import', verbose_name="Mode")
+    filename = models.CharField(max_length=255, verbose_name="Nama File")
+    file_path = models.CharField(max_length=500, verbose_name="Path File")
+    file_size = models.IntegerField(default=0, verbose_name="Ukuran File (bytes)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="Status")
+    total_rows = models.IntegerField(null=True, blank=True, verbose_name="Total Baris")
+    rows_done = models.IntegerField(default=0, verbose_name="Baris Diproses")
+    file_digest = models.CharField(max_length=64, blank=True, default='', verbose_name="Digest File")
+    success_count = models.IntegerField(default=0, verbose_name="Jumlah Item Berhasil")
+    error_count = models.IntegerField(default=0, verbose_name="Jumlah Item Gagal")
+    created_count = models.IntegerField(default=0, verbose_name="Item Baru")
+    changed_count = models.IntegerField(default=0, verbose_name="Item Berubah")
+    unchanged_count = models.IntegerField(default=0, verbose_name="Item Tidak Berubah")
+    reject_file = models.CharField(max_length=500, blank=True, default='', verbose_name="File Baris Ditolak")
+    # Counts and sample rows of a preview, and the single-use token that
+    # applies it
+    preview = models.JSONField(null=True, blank=True, verbose_name="Pratinjau")
+    preview_token = models.CharField(max_length=64, blank=True, default='', verbose_name="Token Pratinjau")
+    message = models.TextField(blank=True, null=True, verbose_name="Pesan")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Rows already committed when the current worker picked the job up, so
+    # the ETA only uses this run's throughput
+    started_rows = models.IntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.filename} - {self.get_status_display()}"
+    
+    @property
+    def has_rejects(self):
+        return bool(self.reject_file) and os.path.exists(self.reject_file)
+    
+    @property
+    def progress_percent(self):
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return None
+        return min(100, int(self.rows_done * 100 / self.total_rows))
+    
+    @property
+    def eta_seconds(self):
+        """Estimated seconds left, based on this run's rows per second."""
+        if self.status != 'running' or not self.total_rows or not self.started_at or not self.heartbeat_at:
+            return None
+        elapsed = (self.heartbeat_at - self.started_at).total_seconds()
+        rows = self.rows_done - self.started_rows
+        if elapsed <= 0 or rows <= 0:
+            return None
+        return max(0, int((self.total_rows - self.rows_done) / (rows / elapsed)))
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+
 
 class CancelledOrder(models.Model):
     """
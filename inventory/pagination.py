@@ -0,0 +1,138 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
+# Rows per page of the item list pages
+KEYSET_PAGE_SIZE = 100
+
+# Query parameters holding the position of the next and previous page
+AFTER_PARAM = 'after'
+BEFORE_PARAM = 'before'
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset, with the query strings of the
+    neighbouring pages (other GET parameters such as query and sort are kept)
+    """
+
+    def __init__(self, items, has_next, has_previous, next_query, previous_query, first_query):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_query = next_query
+        self.previous_query = previous_query
+        self.first_query = first_query
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def keyset_paginate(request, queryset, order, page_size=KEYSET_PAGE_SIZE):
+    """
+    Seek pagination of `queryset` ordered by `order` (a model field or
+    annotation name, '-' for descending) with the primary key as tiebreaker.
+
+    Instead of an OFFSET, each page starts from the sort value and id of the
+    last row of the previous page, so any page costs the same as the first
+    one when (field, id) is indexed. NULL values sort last in both
+    directions.
+    """
+    descending = order.startswith('-')
+    name = order.lstrip('-')
+    if name in queryset.query.annotations:
+        # e.g. search_rank; annotations here are never NULL
+        field = queryset.query.annotations[name].output_field
+    else:
+        field = queryset.model._meta.get_field(name)
+
+    after = _decode_cursor(request.GET.get(AFTER_PARAM), field)
+    before = _decode_cursor(request.GET.get(BEFORE_PARAM), field) if after is None else None
+
+    if before is not None:
+        # Walk backwards from the cursor and flip the rows afterwards
+        rows = list(
+            queryset.filter(_seek(name, field.null, not descending, before, nulls_first=True))
+            .order_by(*_ordering(name, not descending, nulls_last=False))[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            queryset = queryset.filter(_seek(name, field.null, descending, after))
+        rows = list(queryset.order_by(*_ordering(name, descending))[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = after is not None
+
+    params = request.GET.copy()
+    params.pop(AFTER_PARAM, None)
+    params.pop(BEFORE_PARAM, None)
+    first_query = params.urlencode()
+    next_query = previous_query = None
+    if rows and has_next:
+        next_query = _with_param(first_query, AFTER_PARAM, _encode_cursor(rows[-1], name))
+    if rows and has_previous:
+        previous_query = _with_param(first_query, BEFORE_PARAM, _encode_cursor(rows[0], name))
+    return KeysetPage(rows, has_next, has_previous, next_query, previous_query, first_query)
+
+
+def _ordering(name, descending, nulls_last=True):
+    expression = F(name).desc if descending else F(name).asc
+    if nulls_last:
+        sort = expression(nulls_last=True)
+    else:
+        sort = expression(nulls_first=True)
+    return [sort, '-pk' if descending else 'pk']
+
+
+def _seek(name, nullable, descending, cursor, nulls_first=False):
+    """
+    Rows strictly after `cursor` (value, pk) in the given direction. NULLs
+    come after every value, or before them with nulls_first.
+    """
+    value, pk = cursor
+    op = 'lt' if descending else 'gt'
+    if value is None:
+        if nulls_first:
+            return Q(**{f'{name}__isnull': False}) | Q(**{f'{name}__isnull': True, f'pk__{op}': pk})
+        return Q(**{f'{name}__isnull': True, f'pk__{op}': pk})
+    condition = Q(**{f'{name}__{op}': value}) | Q(**{name: value, f'pk__{op}': pk})
+    if nullable and not nulls_first:
+        condition |= Q(**{f'{name}__isnull': True})
+    return condition
+
+
+def _encode_cursor(obj, name):
+    data = json.dumps([getattr(obj, name), obj.pk], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(token, field):
+    """
+    (value, pk) from a cursor parameter, or None if it is missing or invalid
+    """
+    if not token:
+        return None
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return (None if value is None else field.to_python(value)), int(pk)
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None
+
+
+def _with_param(query, key, value):
+    extra = urlencode({key: value})
+    return f'{query}&{extra}' if query else extra
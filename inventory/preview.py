@@ -0,0 +1,159 @@
+import glob
+import logging
+import os
+import pandas as pd
+from .models import Item
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Kinds of rows reported by an upload preview. A row whose stock and price
+# both changed is counted under both.
+PREVIEW_KINDS = ('new', 'stock', 'price', 'other', 'unchanged')
+
+# Sample rows kept per kind for the preview page
+PREVIEW_SAMPLE_SIZE = 200
+
+# Sample rows per page of the preview API
+PREVIEW_PAGE_SIZE = 20
+
+# Columns of the normalized rows written when a preview is applied
+WRITE_COLUMNS = ['Kode', 'name', 'category', 'current_stock', 'selling_price', 'fingerprint']
+
+# Current values stored with each diff row, compared again before applying
+OLD_COLUMNS = ['old_name', 'old_category', 'old_stock', 'old_price']
+
+
+def load_item_frame():
+    """
+    Current name/category/stock/price of every item as a DataFrame indexed
+    by code, loaded with a single query
+    """
+    items = pd.DataFrame.from_records(
+        Item.objects.values_list('code', 'id', 'name', 'category', 'current_stock', 'selling_price').iterator(chunk_size=10000),
+        columns=['code', 'id'] + OLD_COLUMNS,
+    )
+    items['old_price'] = items['old_price'].astype(float)
+    return items.set_index('code')
+
+
+class StockDiff:
+    """
+    Diff of validated upload rows against the current Item rows.
+
+    Rows are joined with the item table in one merge per chunk and
+    classified with column comparisons. New and changed rows are written to
+    one pickle per chunk under `diff_dir`, so applying the preview later
+    does not parse the upload again; counts and a few sample rows per kind
+    are kept for the preview page.
+    """
+
+    def __init__(self, diff_dir, sample_size=PREVIEW_SAMPLE_SIZE):
+        self.diff_dir = diff_dir
+        self.sample_size = sample_size
+        self.items = load_item_frame()
+        self.counts = dict.fromkeys(PREVIEW_KINDS, 0)
+        self.samples = {kind: [] for kind in PREVIEW_KINDS}
+        self.diff_rows = 0
+        self.chunk_count = 0
+        os.makedirs(diff_dir, exist_ok=True)
+
+    def add(self, frame):
+        """
+        Classify one chunk of validated rows (see StockImporter.validate_chunk)
+        """
+        merged = frame.join(self.items, on='Kode')
+        is_new = merged['id'].isna()
+        masks = {
+            'new': is_new,
+            'stock': ~is_new & (merged['current_stock'] != merged['old_stock']),
+            'price': ~is_new & (merged['selling_price'].round(2) != merged['old_price'].round(2)),
+            'other': ~is_new & ((merged['name'] != merged['old_name']) | (merged['category'] != merged['old_category'])),
+        }
+        changed = masks['stock'] | masks['price'] | masks['other']
+        masks['unchanged'] = ~is_new & ~changed
+
+        for kind, mask in masks.items():
+            self.counts[kind] += int(mask.sum())
+            room = self.sample_size - len(self.samples[kind])
+            if room > 0 and mask.any():
+                self.samples[kind].extend(_sample_rows(merged[mask].head(room)))
+
+        diff = merged[is_new | changed]
+        if not diff.empty:
+            self.chunk_count += 1
+            diff[WRITE_COLUMNS + OLD_COLUMNS].to_pickle(os.path.join(self.diff_dir, f'chunk_{self.chunk_count:05d}.pkl'))
+            self.diff_rows += len(diff)
+
+    def summary(self):
+        return {
+            'counts': dict(self.counts, changed=self.diff_rows - self.counts['new']),
+            'samples': self.samples,
+            'diff_rows': self.diff_rows,
+        }
+
+
+def iter_diff_chunks(diff_dir):
+    """
+    DataFrames of new and changed rows saved by StockDiff, in upload order
+    """
+    for path in sorted(glob.glob(os.path.join(diff_dir, 'chunk_*.pkl'))):
+        yield pd.read_pickle(path)
+
+
+def count_drifted_rows(diff_dir):
+    """
+    Number of previewed rows whose item changed since the preview: new
+    codes that now exist, or existing items with other current values
+    """
+    items = load_item_frame()
+    drifted = 0
+    for diff in iter_diff_chunks(diff_dir):
+        current = diff[['Kode']].join(items, on='Kode')
+        was_new = diff['old_stock'].isna()
+        now_exists = current['id'].notna()
+        differs = (
+            (current['old_name'] != diff['old_name'])
+            | (current['old_category'] != diff['old_category'])
+            | (current['old_stock'] != diff['old_stock'])
+            | (current['old_price'].round(2) != diff['old_price'].round(2))
+        )
+        drifted += int((was_new & now_exists).sum() + (~was_new & differs).sum())
+    return drifted
+
+
+def page_samples(summary, kind, page):
+    """
+    One page of preview sample rows of a kind
+    """
+    rows = summary['samples'].get(kind, [])
+    pages = max(1, -(-len(rows) // PREVIEW_PAGE_SIZE))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * PREVIEW_PAGE_SIZE
+    return {
+        'kind': kind,
+        'count': summary['counts'].get(kind, 0),
+        'page': page,
+        'pages': pages,
+        'rows': rows[start:start + PREVIEW_PAGE_SIZE],
+    }
+
+
+def _sample_rows(frame):
+    """
+    JSON-ready sample rows with the old and new values side by side
+    """
+    rows = []
+    for row_number, row in zip(frame.index, frame.itertuples(index=False)):
+        rows.append({
+            'row': int(row_number),
+            'code': row.Kode,
+            'name': row.name,
+            'category': row.category,
+            'stock': int(row.current_stock),
+            'price': float(row.selling_price),
+            'old_name': None if pd.isna(row.old_name) else row.old_name,
+            'old_stock': None if pd.isna(row.old_stock) else int(row.old_stock),
+            'old_price': None if pd.isna(row.old_price) else float(row.old_price),
+        })
+    return rows
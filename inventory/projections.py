@@ -0,0 +1,30 @@
+from django.db.models.query import ValuesListIterable
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+
+
+@lru_cache(maxsize=None)
+def row_type(fields):
+    """
+    Tuple class with one attribute per name in `fields` (which includes
+    'id'), plus `pk` like a model instance, so templates, the row cache and
+    the keyset cursor read it the same way
+    """
+    base = namedtuple('Row', fields)
+    return type('Row', (base,), {
+        '__slots__': (),
+        'pk': property(itemgetter(fields.index('id'))),
+    })
+
+
+class RowIterable(ValuesListIterable):
+    """
+    Iterable of StockQuerySet.rows(): yields a `row_type` tuple per row
+    """
+
+    def __iter__(self):
+        row_class = row_type(tuple(self.queryset._fields))
+        new = tuple.__new__
+        for row in super().__iter__():
+            yield new(row_class, row)
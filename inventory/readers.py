@@ -0,0 +1,361 @@
+from contextlib import contextmanager
+from openpyxl import load_workbook
+import pandas as pd
+import codecs
+import csv
+import logging
+import time
+import zipfile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows per DataFrame yielded by the streaming readers
+READ_BATCH_SIZE = 5000
+
+# Bytes looked at to detect the file format
+SNIFF_SIZE = 64 * 1024
+
+# Delimiters recognised in text uploads
+TEXT_DELIMITERS = ',;\t|'
+
+# Encodings tried, in order, for text uploads. CSV files saved by Excel on
+# Windows are cp1252.
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+def detect_format(file):
+    """
+    Detect an upload's format from its content, not its name.
+
+    Returns ('xlsx', None), ('parquet', None), ('csv', delimiter) or
+    (None, None) when the file is not one of the supported formats.
+    `file` is a path or a seekable binary file object.
+    """
+    head = _read_head(file)
+    if head.startswith(b'PK\x03\x04'):
+        # Other Office formats are ZIP files too
+        with _open_binary(file) as f:
+            try:
+                names = zipfile.ZipFile(f).namelist()
+            except zipfile.BadZipFile:
+                return None, None
+        return ('xlsx', None) if 'xl/workbook.xml' in names else (None, None)
+    if head.startswith(b'PAR1'):
+        return 'parquet', None
+    if not head or b'\x00' in head:
+        return None, None
+
+    try:
+        text = head.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        if e.start >= len(head) - 4:
+            # The sample ends in the middle of a character
+            text = head[:e.start].decode('utf-8-sig')
+        else:
+            # Only used to find the delimiter; CsvBatchReader checks the
+            # encoding of the whole file
+            text = head.decode('cp1252', errors='replace')
+    header = text.splitlines()[0] if text.splitlines() else ''
+    try:
+        delimiter = csv.Sniffer().sniff(header, delimiters=TEXT_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ','
+    return 'csv', delimiter
+
+
+def open_batch_reader(file, batch_size=READ_BATCH_SIZE, column_mapping=None):
+    """
+    Streaming reader for an upload in any supported format. All readers
+    expose `columns` and `estimated_rows`, yield DataFrames indexed by row
+    number and have `close()`.
+    """
+    file_format, delimiter = detect_format(file)
+    if file_format == 'xlsx':
+        return XlsxBatchReader(file, batch_size=batch_size, column_mapping=column_mapping)
+    if file_format == 'parquet':
+        return ParquetBatchReader(file, batch_size=batch_size, column_mapping=column_mapping)
+    if file_format == 'csv':
+        return CsvBatchReader(file, batch_size=batch_size, column_mapping=column_mapping, delimiter=delimiter)
+    raise ValueError('Format file tidak dikenali. Gunakan Excel (.xlsx), CSV, TSV atau Parquet')
+
+
+def detect_encoding(file):
+    """
+    First of TEXT_ENCODINGS the whole file decodes with, or None
+    """
+    for encoding in TEXT_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with _open_binary(file) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _read_head(file):
+    with _open_binary(file) as f:
+        return f.read(SNIFF_SIZE)
+
+
+@contextmanager
+def _open_binary(file):
+    """
+    Open a path, or rewind a file object and leave it open afterwards
+    """
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb') as f:
+            yield f
+    else:
+        file.seek(0)
+        try:
+            yield file
+        finally:
+            if not file.closed:
+                file.seek(0)
+
+
+class XlsxBatchReader:
+    """
+    Streaming reader for .xlsx uploads.
+
+    The workbook is opened in openpyxl read-only mode and rows are pulled
+    with iter_rows(values_only=True), so only one batch of rows is held in
+    memory at a time. Iterating the reader yields DataFrames of at most
+    `batch_size` rows with the header row as column names, indexed by
+    their row number in the sheet.
+    """
+
+    def __init__(self, file, batch_size=READ_BATCH_SIZE, column_mapping=None):
+        self.batch_size = batch_size
+        # openpyxl refuses paths without an Excel suffix; the format was
+        # already checked from the content, so hand it a file object
+        self._handle = None
+        if isinstance(file, str) or hasattr(file, '__fspath__'):
+            file = self._handle = open(file, 'rb')
+        self.workbook = load_workbook(file, read_only=True, data_only=True)
+        self.worksheet = self.workbook.active
+        # The declared <dimension> is only an estimate (used for progress);
+        # exported files often carry a wrong one, which would make
+        # read-only mode stop early
+        try:
+            declared_rows = self.worksheet.max_row
+        except Exception:
+            declared_rows = None
+        self.estimated_rows = declared_rows - 1 if declared_rows and declared_rows > 1 else None
+        self.worksheet.reset_dimensions()
+        self._rows = self.worksheet.iter_rows(values_only=True)
+
+        header = next(self._rows, None) or ()
+        column_mapping = column_mapping or {}
+        self.columns = []
+        for value in header:
+            name = str(value).strip() if value is not None else ''
+            self.columns.append(column_mapping.get(name, name))
+
+    def __iter__(self):
+        try:
+            width = len(self.columns)
+            batch = []
+            row_numbers = []
+            # The header is row 1
+            for row_number, row in enumerate(self._rows, start=2):
+                row = row[:width]
+                # Skip fully empty rows (formatting left below the data)
+                if not any(value is not None and value != '' for value in row):
+                    continue
+                row = [_normalize_cell(value) for value in row]
+                if len(row) < width:
+                    row.extend([None] * (width - len(row)))
+                batch.append(row)
+                row_numbers.append(row_number)
+                if len(batch) >= self.batch_size:
+                    yield pd.DataFrame.from_records(batch, columns=self.columns, index=row_numbers)
+                    batch = []
+                    row_numbers = []
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=self.columns, index=row_numbers)
+        finally:
+            self.close()
+
+    def close(self):
+        self.workbook.close()
+        if self._handle is not None:
+            self._handle.close()
+
+
+class CsvBatchReader:
+    """
+    Streaming reader for CSV/TSV uploads.
+
+    Uses pandas' chunked C parser, so only one batch of rows is in memory.
+    Every cell is read as text: codes keep their leading zeros and the
+    numeric columns are coerced by the validation step like XLSX cells.
+    Only empty cells are missing; text such as 'NA' or 'None' is kept as
+    it is, like in XLSX.
+    The file is read as UTF-8, or as cp1252 when it is not valid UTF-8;
+    characters are never replaced, so names are stored as they were typed.
+    """
+
+    def __init__(self, file, batch_size=READ_BATCH_SIZE, column_mapping=None, delimiter=','):
+        self.batch_size = batch_size
+        self.file = file
+        self.delimiter = delimiter
+        self.encoding = detect_encoding(file)
+        if self.encoding is None:
+            raise ValueError('Encoding file CSV tidak dikenali. Simpan file sebagai CSV UTF-8')
+        with _open_binary(file) as f:
+            header = pd.read_csv(f, nrows=0, **self._options()).columns
+
+        column_mapping = column_mapping or {}
+        self.columns = [column_mapping.get(str(name).strip(), str(name).strip()) for name in header]
+        self._estimated_rows = None
+
+    @property
+    def estimated_rows(self):
+        """
+        Rough total for progress reporting: one row per line, counted on
+        first use so the upload request only reads the header
+        """
+        if self._estimated_rows is None:
+            with _open_binary(self.file) as f:
+                lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1024 * 1024), b''))
+            self._estimated_rows = max(lines - 1, 0)
+        return self._estimated_rows or None
+
+    def _options(self):
+        return {
+            'sep': self.delimiter,
+            'dtype': str,
+            'keep_default_na': False,
+            'na_values': [''],
+            'encoding': self.encoding,
+        }
+
+    def __iter__(self):
+        with _open_binary(self.file) as f:
+            for df in pd.read_csv(f, chunksize=self.batch_size, **self._options()):
+                df.columns = self.columns
+                # The header is line 1
+                df.index = df.index + 2
+                yield df
+
+    def close(self):
+        # The file is only open while iterating
+        pass
+
+
+class ParquetBatchReader:
+    """
+    Columnar reader for Parquet uploads, yielding one DataFrame per batch
+    of record batches, using pyarrow.
+    """
+
+    def __init__(self, file, batch_size=READ_BATCH_SIZE, column_mapping=None):
+        # Imported here so processes that never read Parquet do not load it
+        import pyarrow.parquet as pq
+
+        self.batch_size = batch_size
+        self.parquet_file = pq.ParquetFile(file)
+        self.estimated_rows = self.parquet_file.metadata.num_rows or None
+        column_mapping = column_mapping or {}
+        self.columns = [
+            column_mapping.get(name.strip(), name.strip()) for name in self.parquet_file.schema_arrow.names
+        ]
+
+    def __iter__(self):
+        try:
+            # The header counts as row 1, like in the other formats
+            row_number = 2
+            for batch in self.parquet_file.iter_batches(batch_size=self.batch_size):
+                df = batch.to_pandas()
+                df.columns = self.columns
+                df.index = pd.RangeIndex(row_number, row_number + len(df))
+                row_number += len(df)
+                yield df
+        finally:
+            self.close()
+
+    def close(self):
+        self.parquet_file.close()
+
+
+def _normalize_cell(value):
+    """
+    Match pd.read_excel: whole-number floats become ints so codes such as
+    1234.0 are stored as '1234'
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ImportMetrics:
+    """
+    Wall time, throughput and peak memory for one import
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self.peak_rss_kb = None
+        _reset_peak_rss()
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def finish(self):
+        self.finished = time.monotonic()
+        self.peak_rss_kb = get_peak_rss_kb()
+        return self
+
+    @property
+    def seconds(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self):
+        peak_rss_mb = (self.peak_rss_kb or get_peak_rss_kb()) / 1024
+        return f'{self.rows} baris dalam {self.seconds:.1f} detik ({self.rows_per_second:.0f} baris/detik, memori puncak {peak_rss_mb:.0f} MB)'
+
+
+def _reset_peak_rss():
+    """
+    Reset the kernel's peak RSS counter so the next reading covers only this
+    import (Linux only, silently ignored elsewhere)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def get_peak_rss_kb():
+    """
+    Peak resident set size of this process in KB
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    # ru_maxrss is the peak over the whole process lifetime
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
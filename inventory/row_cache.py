@@ -0,0 +1,91 @@
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+import hashlib
+import logging
+import threading
+import time
+from .utils import user_role
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache alias holding the rendered rows
+ROW_CACHE_ALIAS = 'fragments'
+
+# Version of each row template, from its source, so a deploy that changes
+# the markup never serves rows rendered by the old template
+_template_versions = {}
+
+
+class RowCacheMetrics:
+    """
+    Hits, misses and render time of the row cache since the process started
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0
+
+    def record(self, hits, misses, seconds):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.seconds += seconds
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+metrics = RowCacheMetrics()
+
+
+def render_rows(request, template_name, items, vary=(), context=None):
+    """
+    HTML of one table row per item, rendered by `template_name` with `item`
+    and `context`.
+
+    Rows are cached per (item id, updated_at, template version, role of the
+    user, `vary`), so a page is mostly stitched from cached rows and any
+    write to an item (which bumps updated_at) renders its row again. `vary`
+    holds anything else the row depends on, such as today's date.
+    """
+    started = time.monotonic()
+    items = list(items)
+    template = get_template(template_name)
+    prefix = ':'.join(str(part) for part in [
+        'row', template_name, _template_version(template_name, template), user_role(request.user), *vary
+    ])
+    keys = [f'{prefix}:{item.pk}:{item.updated_at.timestamp()}' for item in items]
+
+    cache = caches[ROW_CACHE_ALIAS]
+    cached = cache.get_many(keys)
+    rendered = {}
+    rows = []
+    for key, item in zip(keys, items):
+        html = cached.get(key)
+        if html is None:
+            html = template.render({**(context or {}), 'item': item})
+            rendered[key] = html
+        rows.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered)
+
+    seconds = time.monotonic() - started
+    metrics.record(len(cached), len(rendered), seconds)
+    logger.info(
+        f"Row cache {template_name}: {len(cached)}/{len(items)} hits in {seconds * 1000:.1f} ms "
+        f"(process: {metrics.hit_rate:.0%} of {metrics.hits + metrics.misses} rows)"
+    )
+    return rows
+
+
+def _template_version(template_name, template):
+    if template_name not in _template_versions:
+        source = template.template.source.encode()
+        _template_versions[template_name] = hashlib.md5(source).hexdigest()[:8]
+    return _template_versions[template_name]
@@ -0,0 +1,161 @@
+from django.db import connections, OperationalError
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# SQLite FTS5 table over code/name/category, kept in sync with inventory_item
+# by triggers. On PostgreSQL the same search uses trigram GIN indexes on the
+# columns instead.
+FTS_TABLE = 'inventory_item_fts'
+
+# External-content FTS5 table. The trigram tokenizer matches any substring
+# of 3+ characters, like the icontains search it serves.
+SQLITE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        code, name, category,
+        content='inventory_item', content_rowid='id', tokenize='trigram'
+    )
+"""
+
+# The triggers see every write to inventory_item, including bulk_create,
+# bulk_update and raw UPDATE statements. SQLite drops them whenever a
+# migration rebuilds the table, so they are re-created after each migrate.
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+        CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON inventory_item BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, code, name, category)
+            VALUES (new.id, new.code, new.name, new.category);
+        END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+        CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON inventory_item BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, code, name, category)
+            VALUES ('delete', old.id, old.code, old.name, old.category);
+        END
+    """,
+    f'{FTS_TABLE}_update': f"""
+        CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF code, name, category ON inventory_item BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, code, name, category)
+            VALUES ('delete', old.id, old.code, old.name, old.category);
+            INSERT INTO {FTS_TABLE}(rowid, code, name, category)
+            VALUES (new.id, new.code, new.name, new.category);
+        END
+    """,
+}
+
+# Trigram GIN indexes on the expressions Django generates for icontains
+POSTGRES_INDEXES = {
+    'inventory_item_code_trgm': 'UPPER(code) gin_trgm_ops',
+    'inventory_item_name_trgm': 'UPPER(name) gin_trgm_ops',
+    'inventory_item_category_trgm': 'UPPER(category) gin_trgm_ops',
+}
+
+# Columns searched by default
+SEARCH_FIELDS = ('code', 'name', 'category')
+
+# The trigram tokenizer cannot match shorter queries
+FTS_MIN_LENGTH = 3
+
+# Whether FTS_TABLE exists, per database alias (checked once per process)
+_fts_available = {}
+
+
+def search_items(queryset, query, fields=SEARCH_FIELDS):
+    """
+    Items of `queryset` with `query` in any of `fields` (case-insensitive
+    substring, like the icontains search it replaces), annotated with
+    `search_rank`: 0 for an exact code, 1 for an exact name, 2 for a code
+    prefix, 3 for a name prefix and 4 for any other match.
+
+    On SQLite the match runs against the FTS5 trigram index; on PostgreSQL
+    the icontains filter is served by the pg_trgm GIN indexes.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    if _use_fts(queryset.db) and len(query) >= FTS_MIN_LENGTH:
+        match = f'{{{" ".join(fields)}}} : "{query.replace(chr(34), chr(34) * 2)}"'
+        queryset = queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    else:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        queryset = queryset.filter(condition)
+    return queryset.annotate(search_rank=search_rank(query, fields))
+
+
+def search_rank(query, fields=SEARCH_FIELDS):
+    """
+    Relevance of a matching item for `query`, lower is better
+    """
+    whens = []
+    for lookup, rank in [('iexact', 0), ('istartswith', 2)]:
+        if 'code' in fields:
+            whens.append(When(**{f'code__{lookup}': query}, then=Value(rank)))
+        if 'name' in fields:
+            whens.append(When(**{f'name__{lookup}': query}, then=Value(rank + 1)))
+    return Case(*whens, default=Value(4), output_field=IntegerField())
+
+
+def _use_fts(alias):
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return False
+    if alias not in _fts_available:
+        _fts_available[alias] = FTS_TABLE in connection.introspection.table_names()
+        if not _fts_available[alias]:
+            logger.warning(f"{FTS_TABLE} not found, item search falls back to LIKE")
+    return _fts_available[alias]
+
+
+def install_search_index(connection):
+    """
+    Create whatever part of the search index is missing. Rebuilds the FTS
+    table from inventory_item when a trigger had to be created, since writes
+    made without it were not indexed.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(SQLITE_TABLE_SQL)
+            except OperationalError as e:
+                # SQLite older than 3.34 has no trigram tokenizer; search
+                # then keeps using LIKE
+                logger.warning(f"Item search index not created: {str(e)}")
+                return
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            _fts_available[connection.alias] = True
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name, expression in POSTGRES_INDEXES.items():
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON inventory_item USING gin ({expression})')
+
+
+def remove_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+            _fts_available.pop(connection.alias, None)
+        elif connection.vendor == 'postgresql':
+            for name in POSTGRES_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """
+    post_migrate handler: puts back triggers dropped by table rebuilds
+    """
+    connection = connections[using]
+    if 'inventory_item' in connection.introspection.table_names():
+        install_search_index(connection)
@@ -1,3 +1,1065 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock, skipUnless
+import io
+import os
+import pandas as pd
+import shutil
+import tempfile
+from .benchmark import ensure_file, generate_exp_frame, generate_stock_frame, write_frame
+from .exports import EXPORT_COLUMNS
+from .import_jobs import (
+    JOB_STALE_SECONDS,
+    apply_preview,
+    claim_next_job,
+    find_identical_upload,
+    run_import_job,
+    run_preview_job,
+)
+from .importer import StockImporter
+from .models import ActivityLog, ImportJob, Item, UploadHistory, UserProfile, WebhookDelivery
+from .pagination import keyset_paginate
+from .readers import detect_format, open_batch_reader
+from .row_cache import ROW_CACHE_ALIAS, render_rows, metrics as row_cache_metrics
+from .search import FTS_TABLE, SEARCH_FIELDS, _use_fts, install_search_index, search_items
+from .typeahead import SYNC_WINDOW, TYPEAHEAD_FIELDS, TYPEAHEAD_LIMIT, TypeaheadIndex
+from .validation import REASON_COLUMN, ROW_COLUMN, RejectWriter, reject_csv_to_xlsx, validate_stock_frame
+from .views_upload_exp_produk import (
+    load_exp_produk_items,
+    parse_expiry_dates,
+    process_exp_produk_frame,
+    upload_exp_produk_file,
+)
+from .webhook_policy import (
+    BREAKER_FAILURE_THRESHOLD,
+    RETRY_MAX_DELAY,
+    CircuitBreaker,
+    TokenBucket,
+    retry_delay,
+)
+from .webhooks import (
+    DELIVERY_STALE_SECONDS,
+    batch_status,
+    claim_deliveries,
+    deliver,
+    enqueue_webhook,
+    message_size,
+    pack_messages,
+    release_deliveries,
+)
 
-# Create your tests here.
+
+def stock_frame(rows):
+    return pd.DataFrame(rows, columns=['Kode', 'Nama Barang', 'Kategori', 'Total Stok', 'Harga Jual'])
+
+
+class StockImporterTests(TestCase):
+    def test_creates_then_updates_keeping_manual_fields(self):
+        importer = StockImporter()
+        importer.import_frame(stock_frame([
+            ['D1', 'Kabel', 'Listrik', 10, 1000],
+            ['D2', 'Lampu', 'Listrik', 20, 2000],
+        ]))
+        self.assertEqual((importer.created_count, importer.changed_count), (2, 0))
+
+        # Fields edited by hand are not part of the upload
+        Item.objects.filter(code='D1').update(
+            minimum_stock=3,
+            latest_price=Decimal('900'),
+            expiry_date=date(2027, 1, 31),
+        )
+
+        importer = StockImporter(chunk_size=1)
+        success_count, error_count = importer.import_frame(stock_frame([
+            ['D1', 'Kabel Roll', 'Listrik', 7, 1500],
+            ['D2', 'Lampu', 'Listrik', 25, 2000],
+            ['D3', 'Saklar', 'Listrik', 1, 500],
+        ]))
+        self.assertEqual((importer.created_count, importer.changed_count), (1, 2))
+        self.assertEqual((success_count, error_count), (3, 0))
+
+        item = Item.objects.get(code='D1')
+        self.assertEqual((item.name, item.current_stock, item.selling_price), ('Kabel Roll', 7, Decimal('1500')))
+        self.assertEqual(item.minimum_stock, 3)
+        self.assertEqual(item.latest_price, Decimal('900'))
+        self.assertEqual(item.expiry_date, date(2027, 1, 31))
+        self.assertEqual(Item.objects.get(code='D3').minimum_stock, 0)
+
+
+class BenchmarkCatalogTests(TestCase):
+    def test_stock_catalog_is_valid_and_repeatable(self):
+        df = generate_stock_frame(500, seed=3)
+
+        clean, rejects = validate_stock_frame(df)
+        self.assertEqual(len(clean), 500)
+        self.assertTrue(rejects.empty)
+        self.assertTrue(df.equals(generate_stock_frame(500, seed=3)))
+        self.assertFalse(df.equals(generate_stock_frame(500, seed=4)))
+
+    def test_exp_sheet_matches_the_stock_catalog(self):
+        stock = generate_stock_frame(8)
+        exp = generate_exp_frame(8)
+
+        self.assertEqual(list(exp.columns), ['Kode Barang', 'Nama Barang', 'Total Stok', 'Tanggal Expired'])
+        self.assertEqual(exp['Kode Barang'].tolist(), ('EXP' + stock['Kode']).tolist())
+
+    def test_generated_file_is_written_once(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = ensure_file(data_dir, 'stock', 50, 'csv')
+            modified = os.path.getmtime(path)
+            self.assertEqual(ensure_file(data_dir, 'stock', 50, 'csv'), path)
+            self.assertEqual(os.path.getmtime(path), modified)
+
+            reader = open_batch_reader(path)
+            self.assertEqual(sum(len(df) for df in reader), 50)
+            reader.close()
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader')
+        UserProfile.objects.create(user=self.user, full_name='Uploader', role='manajer')
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.data_dir, 'stok.csv')
+        stock_frame(rows).to_csv(path, index=False)
+        return path
+
+    def test_claims_pending_and_stale_jobs_once(self):
+        stale = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS + 1)
+        alive = ImportJob.objects.create(user=self.user, filename='a.csv', file_path='a.csv', status='running', heartbeat_at=timezone.now())
+        dead = ImportJob.objects.create(user=self.user, filename='b.csv', file_path='b.csv', status='running', heartbeat_at=stale)
+        pending = ImportJob.objects.create(user=self.user, filename='c.csv', file_path='c.csv')
+
+        self.assertEqual(claim_next_job().pk, dead.pk)
+        self.assertEqual(claim_next_job().pk, pending.pk)
+        self.assertIsNone(claim_next_job())
+        alive.refresh_from_db()
+        self.assertGreater(alive.heartbeat_at, stale)
+
+    def test_resume_after_restart(self):
+        path = self.write_csv([
+            ['G1', 'Kabel', 'Listrik', 1, 1000],
+            ['G2', 'Lampu', 'Listrik', -1, 1000],
+            ['G3', 'Saklar', 'Listrik', 3, 1000],
+            ['G4', 'Steker', 'Listrik', 4, 1000],
+            ['G1', 'Kabel', 'Listrik', 5, 1000],
+        ])
+        # The earlier run committed the first chunk of two rows and had
+        # appended the rejects of the next one when its worker died
+        Item.objects.create(code='G1', name='Kabel', category='Listrik', current_stock=1, selling_price=Decimal('1000'))
+        reject_file = os.path.join(self.data_dir, 'ditolak.csv')
+        with open(reject_file, 'w') as f:
+            f.write('Baris,Kode,Alasan\n1,G2,Total Stok negatif\n4,G1,Kode duplikat\n')
+        job = ImportJob.objects.create(
+            user=self.user,
+            filename='stok.csv',
+            file_path=path,
+            status='running',
+            heartbeat_at=timezone.now() - timedelta(seconds=JOB_STALE_SECONDS + 1),
+            rows_done=2,
+            success_count=1,
+            error_count=1,
+            created_count=1,
+            reject_file=reject_file,
+        )
+
+        job = claim_next_job()
+        run_import_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.rows_done, job.created_count, job.error_count), (5, 3, 2))
+        # G1 again after the restart is still a duplicate
+        self.assertEqual(Item.objects.get(code='G1').current_stock, 1)
+        with open(reject_file, encoding='utf-8-sig') as f:
+            rejects = pd.read_csv(f)
+        self.assertEqual(rejects['Kode'].tolist(), ['G2', 'G1'])
+        self.assertEqual(rejects['Alasan'].tolist(), ['Total Stok negatif', 'Kode duplikat'])
+        self.assertFalse(os.path.exists(path))
+
+    def test_jobs_are_only_shown_to_their_uploader_and_admins(self):
+        reject_file = os.path.join(self.data_dir, 'ditolak.csv')
+        with open(reject_file, 'w') as f:
+            f.write('Baris,Kode,Alasan\n1,G2,Total Stok negatif\n')
+        job = ImportJob.objects.create(
+            user=self.user, filename='stok.csv', file_path='stok.csv', status='done',
+            preview={'counts': {}, 'samples': {}}, reject_file=reject_file,
+        )
+        other = User.objects.create_user('other')
+        UserProfile.objects.create(user=other, full_name='Other', role='manajer')
+        admin = User.objects.create_user('boss')
+        UserProfile.objects.create(user=admin, full_name='Boss', role='admin')
+        urls = [
+            reverse('inventory:import_job_status', args=[job.pk]),
+            reverse('inventory:import_job_preview', args=[job.pk]),
+            reverse('inventory:download_import_rejects', args=[job.pk]),
+        ]
+
+        for user, status in [(self.user, 200), (other, 404), (admin, 200)]:
+            self.client.force_login(user)
+            for url in urls:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status, f'{user.username} {url}')
+                if hasattr(response, 'close'):
+                    response.close()
+
+
+class IncrementalImportTests(TestCase):
+    def test_unchanged_rows_are_not_written(self):
+        df = stock_frame([
+            ['H1', 'Kabel', 'Listrik', 10, 1000.5],
+            ['H2', 'Lampu', 'Listrik', 20, 2000],
+        ])
+        StockImporter().import_frame(df)
+        written = Item.objects.get(code='H1').updated_at
+
+        importer = StockImporter()
+        importer.import_frame(df)
+        self.assertEqual((importer.created_count, importer.changed_count, importer.unchanged_count), (0, 0, 2))
+        self.assertEqual(Item.objects.get(code='H1').updated_at, written)
+
+        df.loc[1, 'Harga Jual'] = 2500
+        importer = StockImporter()
+        importer.import_frame(df)
+        self.assertEqual((importer.created_count, importer.changed_count, importer.unchanged_count), (0, 1, 1))
+
+    def test_items_saved_outside_the_upload_compare_with_it(self):
+        item = Item.objects.create(code='H3', name='Saklar', category='Listrik', current_stock=1, selling_price=Decimal('500'))
+        item.current_stock = 4
+        item.save(update_fields=['current_stock'])
+
+        importer = StockImporter()
+        importer.import_frame(stock_frame([['H3', 'Saklar', 'Listrik', 4, 500]]))
+        self.assertEqual(importer.unchanged_count, 1)
+
+    def test_identical_file_only_while_items_are_untouched(self):
+        StockImporter().import_frame(stock_frame([['H4', 'Kabel', 'Listrik', 1, 1000]]))
+        upload = UploadHistory.objects.create(filename='stok.csv', file_path='', success_count=1, file_digest='abc')
+
+        self.assertEqual(find_identical_upload('abc'), upload)
+        self.assertIsNone(find_identical_upload('def'))
+        self.assertIsNone(find_identical_upload(''))
+
+        Item.objects.filter(code='H4').update(current_stock=2, updated_at=timezone.now())
+        self.assertIsNone(find_identical_upload('abc'))
+
+
+class ValidateStockFrameTests(TestCase):
+    def test_invalid_rows_are_rejected_with_reasons(self):
+        df = stock_frame([
+            ['A1', 'Kabel', 'Listrik', 5, 1000],
+            ['', 'Tanpa Kode', 'Listrik', 1, 1000],
+            ['A2', 'Lampu', 'Listrik', 'banyak', 1000],
+            ['A3', 'Saklar', 'Listrik', -1, -5],
+            ['A4', 'Steker', 'Listrik', 1.5, 1000],
+        ])
+        clean, rejects = validate_stock_frame(df)
+
+        self.assertEqual(clean['Kode'].tolist(), ['A1'])
+        self.assertEqual(clean['current_stock'].tolist(), [5])
+        self.assertEqual(rejects[ROW_COLUMN].tolist(), [1, 2, 3, 4])
+        self.assertEqual(rejects[REASON_COLUMN].tolist(), [
+            'Kode kosong',
+            'Total Stok bukan angka',
+            'Total Stok negatif; Harga Jual negatif',
+            'Total Stok bukan bilangan bulat',
+        ])
+
+    def test_duplicate_codes_keep_first_valid_row(self):
+        df = stock_frame([
+            ['B1', '', 'Listrik', 1, 1000],
+            ['B1', 'Kabel', 'Listrik', 2, 1000],
+            ['B1', 'Kabel', 'Listrik', 3, 1000],
+        ])
+        clean, rejects = validate_stock_frame(df)
+
+        self.assertEqual(clean['current_stock'].tolist(), [2])
+        self.assertEqual(rejects[REASON_COLUMN].tolist(), ['Nama Barang kosong', 'Kode duplikat'])
+
+    def test_codes_seen_in_earlier_chunks_are_duplicates(self):
+        df = stock_frame([
+            ['C1', 'Kabel', 'Listrik', 1, 1000],
+            ['C2', 'Lampu', 'Listrik', 1, 1000],
+        ])
+        clean, rejects = validate_stock_frame(df, seen_codes={'C1'})
+
+        self.assertEqual(clean['Kode'].tolist(), ['C2'])
+        self.assertEqual(rejects[REASON_COLUMN].tolist(), ['Kode duplikat'])
+
+    def test_rejects_are_counted_and_written_across_chunks(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, 'ditolak.csv')
+            importer = StockImporter(chunk_size=2, reject_writer=RejectWriter(path))
+            success_count, error_count = importer.import_frame(stock_frame([
+                ['E1', 'Kabel', 'Listrik', 1, 1000],
+                ['E1', 'Kabel', 'Listrik', 2, 1000],
+                ['E2', 'Lampu', 'Listrik', 1, 'mahal'],
+            ]))
+
+            self.assertEqual((success_count, error_count), (1, 2))
+            self.assertEqual(importer.reject_reasons, {'Kode duplikat': 1, 'Harga Jual bukan angka': 1})
+            self.assertEqual(Item.objects.get(code='E1').current_stock, 1)
+            with open(path, encoding='utf-8-sig') as f:
+                rejects = pd.read_csv(f)
+            self.assertEqual(rejects[ROW_COLUMN].tolist(), [1, 2])
+            self.assertEqual(rejects[REASON_COLUMN].tolist(), ['Kode duplikat', 'Harga Jual bukan angka'])
+
+            workbook_path = os.path.join(data_dir, 'ditolak.xlsx')
+            with open(workbook_path, 'wb') as output:
+                reject_csv_to_xlsx(path, output)
+            self.assertEqual(pd.read_excel(workbook_path)['Kode'].tolist(), ['E1', 'E2'])
+
+
+class ExpProdukUploadTests(TestCase):
+    def test_expiry_dates_from_cells_and_text(self):
+        column = pd.Series([datetime(2027, 1, 31), '2027-02-28', ' 31/03/2027 ', 'besok', None])
+        parsed = parse_expiry_dates(column)
+
+        self.assertEqual(
+            [None if pd.isna(value) else value.date() for value in parsed],
+            [date(2027, 1, 31), date(2027, 2, 28), date(2027, 3, 31), None, None],
+        )
+
+    def test_batch_creates_updates_and_skips(self):
+        Item.objects.create(code='K1', name='Obat', category='obat', current_stock=1, selling_price=Decimal('5000'), expiry_date=date(2026, 1, 1))
+        Item.objects.create(code='K2', name='Kabel', category='Listrik', current_stock=1, selling_price=Decimal('1000'))
+        items = load_exp_produk_items()
+        df = pd.DataFrame([
+            ['K1', 'Obat Kutu', 7, '2027-01-31'],
+            ['K2', 'Kabel', 3, '2027-01-31'],
+            ['K3', 'Vitamin', 2, '31/12/2027'],
+            ['K3', 'Vitamin', 4, '31/12/2027'],
+            ['', 'Tanpa Kode', 1, None],
+            ['K4', 'Snack', 'habis', None],
+        ], columns=['Kode Barang', 'Nama Barang', 'Total Stok', 'Tanggal Expired'])
+
+        self.assertEqual(process_exp_produk_frame(df, items), (3, 3))
+
+        updated = Item.objects.get(code='K1')
+        self.assertEqual((updated.name, updated.current_stock, updated.expiry_date), ('Obat Kutu', 7, date(2027, 1, 31)))
+        self.assertEqual((updated.category, updated.selling_price), ('obat', Decimal('5000')))
+        # Codes of Kelola Stok Barang are left alone
+        self.assertIsNone(Item.objects.get(code='K2').expiry_date)
+        # The last row of a code wins
+        created = Item.objects.get(code='K3')
+        self.assertEqual((created.current_stock, created.expiry_date, created.category), (4, date(2027, 12, 31), 'Tidak Dikategorikan'))
+        self.assertFalse(Item.objects.filter(code='K4').exists())
+
+        # The next batch updates the item created by this one
+        df = pd.DataFrame([['K3', 'Vitamin', 9, '31/12/2027']], columns=df.columns)
+        self.assertEqual(process_exp_produk_frame(df, items), (1, 0))
+        self.assertEqual(Item.objects.get(code='K3').current_stock, 9)
+
+    def test_upload_view(self):
+        user = User.objects.create_user('gudang')
+        UserProfile.objects.create(user=user, full_name='Gudang', role='staff_gudang')
+        df = pd.DataFrame([['K5', 'Pasir', 3, datetime(2027, 5, 1)]], columns=['Kode', 'Nama', 'Stok', 'Exp Date'])
+        content = io.BytesIO()
+        df.to_excel(content, index=False)
+        request = RequestFactory().post('/', {'exp_produk_file': SimpleUploadedFile('exp.xlsx', content.getvalue())})
+        request.user = user
+        request._messages = CookieStorage(request)
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            upload_exp_produk_file(request)
+
+        item = Item.objects.get(code='K5')
+        self.assertEqual((item.current_stock, item.expiry_date), (3, date(2027, 5, 1)))
+        self.assertEqual(UploadHistory.objects.get().success_count, 1)
+
+
+class BatchReaderTests(TestCase):
+    rows = [
+        ['007', 'NA', 'None', 1, 1000],
+        ['N/A', 'Kabel', 'Listrik', 2, 1500],
+        ['L3', 'Lampu', None, 3, 2000],
+    ]
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def read(self, path, **kwargs):
+        reader = open_batch_reader(path, **kwargs)
+        frames = list(reader)
+        reader.close()
+        return reader, pd.concat(frames)
+
+    def assert_rows(self, df):
+        self.assertEqual(df.index.tolist(), [2, 3, 4])
+        self.assertEqual(df['Kode'].astype(str).tolist(), ['007', 'N/A', 'L3'])
+        self.assertEqual(df['Nama Barang'].tolist(), ['NA', 'Kabel', 'Lampu'])
+        self.assertEqual(df['Kategori'].iloc[0], 'None')
+        self.assertTrue(pd.isna(df['Kategori'].iloc[2]))
+        clean, rejects = validate_stock_frame(df)
+        self.assertEqual(len(clean), 2)
+        self.assertEqual(rejects[REASON_COLUMN].tolist(), ['Kategori kosong'])
+
+    def test_csv_keeps_na_like_text(self):
+        path = self.path('stok.csv')
+        stock_frame(self.rows).to_csv(path, index=False)
+
+        self.assertEqual(detect_format(path), ('csv', ','))
+        reader, df = self.read(path, batch_size=2)
+        self.assertEqual(reader.estimated_rows, 3)
+        self.assert_rows(df)
+
+    def test_xlsx_reads_the_same_rows(self):
+        path = self.path('stok.xlsx')
+        write_frame(stock_frame(self.rows), path)
+
+        self.assertEqual(detect_format(path), ('xlsx', None))
+        _, df = self.read(path, batch_size=2)
+        self.assert_rows(df)
+
+    def test_parquet_reads_the_same_rows(self):
+        path = self.path('stok.parquet')
+        stock_frame(self.rows).to_parquet(path, index=False)
+
+        self.assertEqual(detect_format(path), ('parquet', None))
+        reader, df = self.read(path, batch_size=2)
+        self.assertEqual(reader.estimated_rows, 3)
+        self.assert_rows(df)
+
+    def test_delimiters_and_encodings(self):
+        path = self.path('stok.txt')
+        with open(path, 'w', encoding='cp1252', newline='') as f:
+            f.write('Kode;Nama Barang;Kategori;Total Stok;Harga Jual\nC1;Café Crème;Makanan;1;1000\n')
+        self.assertEqual(detect_format(path), ('csv', ';'))
+        _, df = self.read(path)
+        self.assertEqual(df['Nama Barang'].tolist(), ['Café Crème'])
+
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write('Kode\tNama\tKategori\tTotal Stok\tHarga Jual\nC1\tKucing 🐱\tMainan\t1\t1000\n')
+        self.assertEqual(detect_format(path), ('csv', '\t'))
+        reader, df = self.read(path, column_mapping={'Nama': 'Nama Barang'})
+        self.assertEqual(reader.columns, ['Kode', 'Nama Barang', 'Kategori', 'Total Stok', 'Harga Jual'])
+        self.assertEqual(df['Nama Barang'].tolist(), ['Kucing 🐱'])
+
+    def test_unknown_formats_are_refused(self):
+        path = self.path('gambar.png')
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n\x00\x00')
+        self.assertEqual(detect_format(path), (None, None))
+        with self.assertRaises(ValueError):
+            open_batch_reader(path)
+
+        with open(path, 'wb') as f:
+            f.write(b'Kode,Nama\nC1,\x81\x8d\x8f\x90\x9d\n')
+        with self.assertRaisesMessage(ValueError, 'Encoding file CSV tidak dikenali'):
+            open_batch_reader(path)
+
+
+class PreviewTests(TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        for patcher in [
+            mock.patch('inventory.import_jobs.PREVIEWS_DIR', os.path.join(self.data_dir, 'previews')),
+            mock.patch('inventory.import_jobs.REJECTS_DIR', os.path.join(self.data_dir, 'rejects')),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        StockImporter().import_frame(stock_frame([
+            ['P1', 'Kabel', 'Listrik', 10, 1000],
+            ['P2', 'Lampu', 'Listrik', 20, 2000],
+        ]))
+        path = os.path.join(self.data_dir, 'stok.csv')
+        stock_frame([
+            ['P1', 'Kabel', 'Listrik', 15, 1000],
+            ['P2', 'Lampu', 'Listrik', 20, 2000],
+            ['P3', 'Saklar', 'Listrik', 5, 500],
+            ['P4', 'Steker', 'Listrik', -1, 500],
+        ]).to_csv(path, index=False)
+        self.job = ImportJob.objects.create(mode='preview', filename='stok.csv', file_path=path, status='running')
+
+    def test_preview_writes_nothing_until_applied(self):
+        run_preview_job(self.job)
+
+        self.assertEqual(self.job.status, 'done')
+        counts = self.job.preview['counts']
+        self.assertEqual(
+            {kind: counts[kind] for kind in ['new', 'changed', 'stock', 'price', 'unchanged', 'rejected']},
+            {'new': 1, 'changed': 1, 'stock': 1, 'price': 0, 'unchanged': 1, 'rejected': 1},
+        )
+        self.assertEqual(Item.objects.get(code='P1').current_stock, 10)
+        self.assertFalse(Item.objects.filter(code='P3').exists())
+
+        self.assertIsNone(apply_preview(self.job, self.job.preview_token))
+        job = claim_next_job()
+        self.assertEqual(job.mode, 'apply')
+        run_import_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.created_count, job.changed_count, job.unchanged_count), (1, 1, 1))
+        self.assertEqual(Item.objects.get(code='P1').current_stock, 15)
+        self.assertEqual(Item.objects.get(code='P3').current_stock, 5)
+
+    def test_items_changed_since_the_preview_are_not_overwritten(self):
+        run_preview_job(self.job)
+        item = Item.objects.get(code='P1')
+        item.current_stock = 11
+        item.save()
+
+        apply_preview(self.job, self.job.preview_token)
+        job = run_import_job(claim_next_job())
+
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('1 item berubah sejak pratinjau dibuat', job.message)
+        self.assertEqual(Item.objects.get(code='P1').current_stock, 11)
+
+
+class ApplyPreviewTests(TestCase):
+    def setUp(self):
+        self.job = ImportJob.objects.create(
+            mode='preview',
+            status='done',
+            filename='stok.csv',
+            file_path='stok.csv',
+            preview={'diff_rows': 3},
+            preview_token='token-pratinjau',
+            finished_at=timezone.now(),
+        )
+
+    def test_preview_is_applied_once(self):
+        stale = ImportJob.objects.get(pk=self.job.pk)
+        self.assertIsNone(apply_preview(self.job, 'token-pratinjau'))
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.mode, self.job.status, self.job.total_rows), ('apply', 'pending', 3))
+        self.assertEqual(self.job.preview_token, '')
+        # A second request with the same token, also one that read the job
+        # before the first was applied, is refused
+        self.assertEqual(apply_preview(self.job, 'token-pratinjau'), 'Pratinjau tidak tersedia atau sudah diterapkan')
+        self.assertEqual(apply_preview(stale, 'token-pratinjau'), 'Pratinjau sudah diterapkan')
+
+    def test_wrong_token_is_refused(self):
+        self.assertEqual(apply_preview(self.job, 'lain'), 'Token pratinjau tidak valid')
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.mode, 'preview')
+
+    def test_expired_preview_is_refused(self):
+        self.job.finished_at = timezone.now() - timedelta(days=2)
+        self.assertEqual(apply_preview(self.job, 'token-pratinjau'), 'Pratinjau sudah kedaluwarsa, silakan upload ulang')
+
+
+class KeysetPaginateTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        expiry = [date(2027, 3, 1), None, date(2027, 1, 1), None, date(2027, 2, 1), date(2027, 1, 1)]
+        for number, expiry_date in enumerate(expiry):
+            Item.objects.create(
+                code=f'F{number}',
+                name=f'Barang {number}',
+                category='Umum',
+                selling_price=Decimal('1000'),
+                expiry_date=expiry_date,
+            )
+
+    def walk(self, order):
+        """
+        Codes on every page going forward, then on every page going back
+        """
+        pages = []
+        page = keyset_paginate(self.factory.get('/'), Item.objects.all(), order, page_size=2)
+        pages.append(page)
+        while page.has_next:
+            page = keyset_paginate(self.factory.get(f'/?{page.next_query}'), Item.objects.all(), order, page_size=2)
+            pages.append(page)
+        forward = [[item.code for item in page] for page in pages]
+
+        backward = [[item.code for item in page]]
+        while page.has_previous:
+            page = keyset_paginate(self.factory.get(f'/?{page.previous_query}'), Item.objects.all(), order, page_size=2)
+            backward.append([item.code for item in page])
+        return forward, backward[::-1]
+
+    def expected(self, descending):
+        """
+        Codes per page: dated items by (expiry, id), then undated ones by id
+        """
+        items = list(Item.objects.all())
+        dated = sorted((item for item in items if item.expiry_date), key=lambda item: (item.expiry_date, item.pk))
+        undated = sorted((item for item in items if not item.expiry_date), key=lambda item: item.pk)
+        if descending:
+            dated.reverse()
+            undated.reverse()
+        codes = [item.code for item in dated + undated]
+        return [codes[start:start + 2] for start in range(0, len(codes), 2)]
+
+    def test_ascending_with_null_expiry(self):
+        forward, backward = self.walk('expiry_date')
+        self.assertEqual(forward, self.expected(descending=False))
+        self.assertEqual(backward, forward)
+
+    def test_descending_with_null_expiry(self):
+        forward, backward = self.walk('-expiry_date')
+        self.assertEqual(forward, self.expected(descending=True))
+        self.assertEqual(backward, forward)
+
+    def test_invalid_cursor_shows_first_page(self):
+        page = keyset_paginate(self.factory.get('/?after=rusak'), Item.objects.all(), 'expiry_date', page_size=2)
+        self.assertEqual([item.code for item in page], self.expected(descending=False)[0])
+        self.assertFalse(page.has_previous)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 index is only used on SQLite')
+class SearchIndexTests(TestCase):
+    def search(self, query, fields=SEARCH_FIELDS):
+        return [item.code for item in search_items(Item.objects.all(), query, fields).order_by('search_rank', 'code')]
+
+    def create(self, code, name, category='Umum'):
+        return Item.objects.create(code=code, name=name, category=category, selling_price=Decimal('1000'))
+
+    def test_index_follows_every_kind_of_write(self):
+        self.assertTrue(_use_fts(connection.alias))
+        self.create('M1', 'Obat Kutu Kucing')
+        Item.objects.bulk_create([
+            Item(code='M2', name='Vitamin Kucing', category='vitamin', selling_price=Decimal('1000')),
+            Item(code='KUC', name='Sisir', category='grooming', selling_price=Decimal('1000')),
+        ])
+        self.assertEqual(self.search('kucing'), ['M1', 'M2'])
+        self.assertEqual(self.search('kuc'), ['KUC', 'M1', 'M2'])
+
+        Item.objects.filter(code='M2').update(name='Vitamin Anjing')
+        self.assertEqual(self.search('kucing'), ['M1'])
+        Item.objects.filter(code='M1').delete()
+        self.assertEqual(self.search('kucing'), [])
+        self.assertEqual(self.search('anjing'), ['M2'])
+
+    def test_fields_rank_and_short_queries(self):
+        self.create('OBAT', 'Shampoo', 'grooming')
+        self.create('O2', 'Obat', 'obat')
+        self.create('O3', 'Obat Tetes')
+
+        self.assertEqual(self.search('obat'), ['OBAT', 'O2', 'O3'])
+        self.assertEqual(self.search('obat', fields=('code', 'name')), ['OBAT', 'O2', 'O3'])
+        self.assertEqual(self.search('groom', fields=('code', 'name')), [])
+        # Shorter than a trigram: LIKE
+        self.assertEqual(self.search('o3'), ['O3'])
+        self.assertEqual(self.search('"tetes'), [])
+
+    def test_reinstall_reindexes_writes_made_without_triggers(self):
+        self.create('N1', 'Pasir Kucing')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TABLE}_insert')
+        self.create('N2', 'Pasir Wangi')
+        self.assertEqual(self.search('pasir'), ['N1'])
+
+        install_search_index(connection)
+        self.assertEqual(self.search('pasir'), ['N1', 'N2'])
+
+
+class TypeaheadIndexTests(TestCase):
+    def setUp(self):
+        # The tests refresh the index themselves, without its thread
+        patcher = mock.patch.object(TypeaheadIndex, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for code, name in [
+            ('899001', 'Obat Kutu Kucing'),
+            ('899002', 'Kucing Pasir Wangi'),
+            ('OB-1', 'Sisir Kutu'),
+            ('C4', 'Crème Anjing'),
+        ]:
+            Item.objects.create(code=code, name=name, category='Umum', current_stock=1, selling_price=Decimal('1000'))
+        self.index = TypeaheadIndex()
+        self.index.rebuild()
+
+    def codes(self, query, limit=TYPEAHEAD_LIMIT):
+        return [row[1] for row in self.index.search(query, limit)]
+
+    def test_codes_then_name_prefixes_then_words(self):
+        self.assertEqual(self.codes('899'), ['899001', '899002'])
+        self.assertEqual(self.codes('ob'), ['OB-1', '899001'])
+        self.assertEqual(self.codes('kucing'), ['899002', '899001'])
+        self.assertEqual(self.codes('kut kuc'), ['899001'])
+        self.assertEqual(self.codes('creme'), ['C4'])
+        self.assertEqual(self.codes('kutu', limit=1), ['899001'])
+        self.assertEqual(self.codes('  '), [])
+        self.assertEqual(self.index.search('899001')[0], [Item.objects.get(code='899001').pk, '899001', 'Obat Kutu Kucing', 1, 1000.0])
+
+    def test_refresh_applies_writes_and_deletes(self):
+        item = Item.objects.get(code='OB-1')
+        Item.objects.filter(pk=item.pk).update(name='Gunting Kuku', updated_at=timezone.now() + timedelta(seconds=1))
+        Item.objects.create(code='N1', name='Kutu Spray', category='Umum', selling_price=Decimal('1000'))
+        self.index.refresh()
+
+        self.assertEqual(self.codes('gunting'), ['OB-1'])
+        self.assertEqual(self.codes('sisir'), [])
+        self.assertEqual(self.codes('kutu'), ['N1', '899001'])
+
+        Item.objects.filter(code='N1').delete()
+        self.index.refresh()
+        self.assertEqual(self.codes('kutu'), ['899001'])
+
+    def test_refresh_picks_up_late_commits(self):
+        # Stamped before the index last synced, committed after it
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(code='C4').update(
+                name='Crème Kucing',
+                updated_at=self.index.synced_at - timedelta(seconds=SYNC_WINDOW // 2),
+            )
+        self.index.refresh()
+
+        self.assertEqual(self.codes('creme kuc'), ['C4'])
+
+    def test_search_api_hides_prices_from_staff_gudang(self):
+        url = reverse('inventory:search_items_api')
+        for role, fields in [('admin', TYPEAHEAD_FIELDS), ('staff_gudang', ['id', 'code', 'name', 'stock'])]:
+            user = User.objects.create_user(role)
+            UserProfile.objects.create(user=user, full_name=role, role=role)
+            self.client.force_login(user)
+            with mock.patch('inventory.views_item_search.get_typeahead_index', return_value=self.index):
+                data = self.client.get(url, {'q': 'sisir'}).json()
+
+            self.assertEqual(data['fields'], fields)
+            self.assertEqual([len(row) for row in data['items']], [len(fields)])
+
+
+class RowCacheTests(TestCase):
+    template_name = 'inventory/includes/transfer_stok_row.html'
+
+    def setUp(self):
+        caches[ROW_CACHE_ALIAS].clear()
+        self.admin = User.objects.create_user('admin')
+        UserProfile.objects.create(user=self.admin, full_name='Admin', role='admin')
+        self.gudang = User.objects.create_user('gudang')
+        UserProfile.objects.create(user=self.gudang, full_name='Gudang', role='staff_gudang')
+        for number in range(3):
+            Item.objects.create(code=f'R{number}', name=f'Barang {number}', category='Umum', current_stock=number, selling_price=Decimal('1000'))
+
+    def render(self, user, vary=()):
+        request = RequestFactory().get('/')
+        request.user = user
+        hits, misses = row_cache_metrics.hits, row_cache_metrics.misses
+        rows = render_rows(request, self.template_name, Item.objects.order_by('code'), vary=vary)
+        return rows, row_cache_metrics.hits - hits, row_cache_metrics.misses - misses
+
+    def test_rows_are_reused_until_the_item_changes(self):
+        rows, hits, misses = self.render(self.admin)
+        self.assertEqual((hits, misses), (0, 3))
+        self.assertIn('R1', rows[1])
+
+        cached, hits, misses = self.render(self.admin)
+        self.assertEqual((hits, misses), (3, 0))
+        self.assertEqual(cached, rows)
+
+        item = Item.objects.get(code='R1')
+        item.name = 'Barang Baru'
+        item.save()
+        rows, hits, misses = self.render(self.admin)
+        self.assertEqual((hits, misses), (2, 1))
+        self.assertIn('Barang Baru', rows[1])
+
+    def test_rows_are_kept_apart_per_role_and_vary(self):
+        self.render(self.admin)
+        self.assertEqual(self.render(self.gudang)[2], 3)
+        self.assertEqual(self.render(self.admin, vary=[date(2027, 1, 1)])[2], 3)
+        self.assertEqual(self.render(self.admin, vary=[date(2027, 1, 1)])[1], 3)
+
+    def test_list_page_shows_writes(self):
+        self.client.force_login(self.admin)
+        url = reverse('inventory:transfer_stok')
+        self.assertContains(self.client.get(url), 'Barang 2')
+
+        Item.objects.filter(code='R2').update(name='Barang Diubah', updated_at=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(url)
+        self.assertContains(response, 'Barang Diubah')
+        self.assertNotContains(response, 'Barang 2')
+
+
+class ConditionalListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin')
+        UserProfile.objects.create(user=self.user, full_name='Admin', role='admin')
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(code='S1', name='Kabel', category='Listrik', selling_price=Decimal('1000'))
+        self.url = reverse('inventory:kelola_stok_barang')
+        # The CSRF secret is part of the validator; a browser has its cookie
+        # from the login page
+        self.client.get(self.url)
+
+    def test_unchanged_list_answers_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # Another query is another page
+        self.assertEqual(self.client.get(self.url, {'query': 'kab'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        api_url = reverse('inventory:item_table_api', args=['kelola_stok_barang'])
+        api_etag = self.client.get(api_url)['ETag']
+        self.assertEqual(self.client.get(api_url, HTTP_IF_NONE_MATCH=api_etag).status_code, 304)
+
+    def test_writes_and_deletes_change_the_validator(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.current_stock = 5
+            self.item.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(pk=self.item.pk).delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validator_is_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+        other = User.objects.create_user('admin2')
+        UserProfile.objects.create(user=other, full_name='Admin 2', role='admin')
+        self.client.force_login(other)
+
+        # Same CSRF cookie, other user
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        for code, name, stock in [('X1', 'Kabel', 5), ('X2', 'Lampu', 1), ('X3', 'Kabel Roll', 3)]:
+            Item.objects.create(code=code, name=name, category='Listrik', current_stock=stock, selling_price=Decimal('1500.50'), latest_price=Decimal('1400'))
+
+    def login(self, role):
+        user = User.objects.create_user(role)
+        UserProfile.objects.create(user=user, full_name=role, role=role)
+        self.client.force_login(user)
+
+    def export(self, table, **params):
+        response = self.client.get(reverse('inventory:export_items', args=[table]), params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        if params.get('format') == 'xlsx':
+            return pd.read_excel(io.BytesIO(content), dtype=str)
+        return pd.read_csv(io.BytesIO(content), dtype=str, encoding='utf-8-sig', keep_default_na=False)
+
+    def test_export_follows_the_list_query_and_sort(self):
+        self.login('admin')
+        df = self.export('kelola_stok_barang', query='kabel', sort='stock_asc')
+
+        self.assertEqual(df['Kode'].tolist(), ['X3', 'X1'])
+        self.assertEqual(list(df.columns), [header for header, _ in EXPORT_COLUMNS])
+        self.assertEqual(df['Harga Jual'].tolist(), ['1500.50', '1500.50'])
+
+        df = self.export('kelola_stok_barang', format='xlsx', sort='name_desc')
+        self.assertEqual(df['Kode'].tolist(), ['X2', 'X3', 'X1'])
+
+    def test_staff_gudang_exports_without_prices(self):
+        self.login('staff_gudang')
+        for table in ['transfer_stok', 'data_exp_produk']:
+            for file_format in ['csv', 'xlsx']:
+                df = self.export(table, format=file_format)
+                self.assertEqual(len(df), 3)
+                self.assertNotIn('Harga Jual', df.columns)
+                self.assertNotIn('Harga Terbaru', df.columns)
+
+        response = self.client.get(reverse('inventory:export_items', args=['kelola_harga']))
+        self.assertRedirects(response, reverse('inventory:dashboard'), fetch_redirect_response=False)
+
+    def test_backup_streams_csv_by_default(self):
+        self.login('admin')
+        with mock.patch('inventory.exports.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get(reverse('inventory:download_backup'))
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('.csv"', response['Content-Disposition'])
+        # Sent every two rows as they are read
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].decode('utf-8-sig').startswith('Kode,'))
+        df = pd.read_csv(io.BytesIO(b''.join(chunks)), dtype=str, encoding='utf-8-sig')
+        self.assertEqual(df['Kode'].tolist(), ['X1', 'X2', 'X3'])
+
+    def test_large_exports_are_not_offered_as_xlsx(self):
+        self.login('admin')
+        with mock.patch('inventory.exports.XLSX_MAX_ROWS', 2):
+            response = self.client.get(reverse('inventory:download_backup'), {'format': 'xlsx'})
+            self.assertRedirects(response, reverse('inventory:backup_history'), fetch_redirect_response=False)
+            response = self.client.get(reverse('inventory:export_items', args=['kelola_harga']), {'format': 'xlsx'})
+            self.assertRedirects(response, reverse('inventory:kelola_harga'), fetch_redirect_response=False)
+
+            df = self.export('kelola_harga', format='xlsx', query='kabel')
+            self.assertEqual(df['Kode'].tolist(), ['X1', 'X3'])
+
+
+class WebhookOutboxTests(TestCase):
+    url = 'https://hooks.example.com/catch/1'
+
+    def setUp(self):
+        self.user = User.objects.create_user('admin')
+        self.client_patch = mock.patch('inventory.webhooks.get_client')
+        self.post_json = self.client_patch.start().return_value.post_json
+        self.addCleanup(self.client_patch.stop)
+
+    def answer(self, status_code, text='ok'):
+        response = mock.Mock(status_code=status_code, text=text, headers={})
+        response.json.side_effect = ValueError
+        self.post_json.return_value = response
+
+    def enqueue(self, count=1):
+        return enqueue_webhook('kelola_stok', self.url, self.user, 'send_to_telegram', [
+            ({'text': f'Pesan {number}'}, f'Pesan {number}') for number in range(count)
+        ])
+
+    def test_messages_are_claimed_once(self):
+        batch = self.enqueue(3)
+        self.assertEqual(batch_status(batch)['pending'], 3)
+
+        claimed = claim_deliveries(2)
+        self.assertEqual([delivery.payload['text'] for delivery in claimed], ['Pesan 0', 'Pesan 1'])
+        self.assertEqual([delivery.attempts for delivery in claimed], [1, 1])
+        self.assertEqual(len(claim_deliveries(10)), 1)
+        self.assertEqual(claim_deliveries(10), [])
+
+        release_deliveries([claimed[0].pk])
+        self.assertEqual([delivery.pk for delivery in claim_deliveries(10)], [claimed[0].pk])
+
+    def test_messages_of_a_dead_worker_are_sent_again(self):
+        self.enqueue(2)
+        first, second = claim_deliveries(10)
+        WebhookDelivery.objects.filter(pk=first.pk).update(
+            claimed_at=timezone.now() - timedelta(seconds=DELIVERY_STALE_SECONDS + 1)
+        )
+
+        self.assertEqual([delivery.pk for delivery in claim_deliveries(10)], [first.pk])
+
+    def test_any_2xx_answer_is_sent(self):
+        batch = self.enqueue(2)
+        for status_code, delivery in zip([200, 204], claim_deliveries(10)):
+            self.answer(status_code, text='')
+            delivery = deliver(delivery)
+            self.assertEqual((delivery.status, delivery.response_status, delivery.error), ('sent', status_code, ''))
+
+        self.post_json.assert_called_with(self.url, {'text': 'Pesan 1'})
+        status = batch_status(batch)
+        self.assertEqual((status['sent'], status['failed'], status['done']), (2, 0, True))
+        self.assertEqual(ActivityLog.objects.filter(action='send_to_telegram', status='success').count(), 2)
+
+    def test_final_and_retryable_errors(self):
+        batch = self.enqueue(2)
+        final, retried = claim_deliveries(10)
+
+        self.answer(400, 'Bad Request')
+        final = deliver(final)
+        self.assertEqual((final.status, final.error), ('failed', '400 Bad Request'))
+
+        self.answer(502, 'Bad Gateway')
+        retried = deliver(retried)
+        self.assertEqual(retried.status, 'pending')
+        self.assertGreater(retried.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(claim_deliveries(10), [])
+        self.assertEqual(batch_status(batch)['errors'], ['Pesan 0: 400 Bad Request'])
+
+    def test_messages_are_only_queued_when_the_transaction_commits(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.enqueue()
+            raise ValueError
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+
+class PackMessagesTests(TestCase):
+    def test_blocks_are_kept_whole_within_the_limit(self):
+        blocks = [f'*Barang {number}*\nStok: {number}' for number in range(20)]
+        texts = pack_messages(blocks, header='Laporan\n', footer='\nSelesai', separator='\n\n', limit=100)
+
+        self.assertGreater(len(texts), 1)
+        for text in texts:
+            self.assertLessEqual(message_size(text), 100)
+            self.assertTrue(text.startswith('Laporan\n'))
+            self.assertTrue(text.endswith('\nSelesai'))
+        joined = '\n\n'.join(text[len('Laporan\n'):-len('\nSelesai')] for text in texts)
+        self.assertEqual(joined, '\n\n'.join(blocks))
+
+    def test_emoji_count_as_two_characters(self):
+        self.assertEqual(message_size('📦'), 2)
+        blocks = ['📦' * 10, '📦' * 10]
+        # 40 UTF-16 units do not fit in 30 although the text is 20 characters
+        self.assertEqual(pack_messages(blocks, limit=30), blocks)
+        self.assertEqual(pack_messages(blocks, limit=40), ['📦' * 20])
+
+    def test_long_block_is_split_without_breaking_emoji(self):
+        block = '📦' * 25
+        texts = pack_messages([block], limit=11)
+
+        self.assertEqual(''.join(texts), block)
+        for text in texts:
+            self.assertLessEqual(message_size(text), 11)
+
+    def test_header_must_fit(self):
+        with self.assertRaises(ValueError):
+            pack_messages(['x'], header='x' * 10, limit=10)
+
+
+class WebhookPolicyTests(TestCase):
+    def test_retry_delay_is_capped_and_honours_retry_after(self):
+        for attempts in range(1, 20):
+            self.assertLessEqual(retry_delay(attempts), RETRY_MAX_DELAY)
+        self.assertGreaterEqual(retry_delay(1, retry_after=30), 30)
+
+    def test_breaker_opens_and_lets_one_check_through(self):
+        breaker = CircuitBreaker('https://example.com/hook')
+        for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_in(), 0)
+
+        # Open time is over: only one check at a time
+        cache.delete(breaker.open_key)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.retry_in(), 0)
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_messages_wait_for_an_open_breaker_without_using_an_attempt(self):
+        url = 'https://example.com/hook'
+        user = User.objects.create_user('admin')
+        enqueue_webhook('kelola_stok', url, user, 'send_to_telegram', [({'text': 'Stok'}, 'Stok')])
+        breaker = CircuitBreaker(url)
+        for _ in range(BREAKER_FAILURE_THRESHOLD):
+            breaker.record_failure()
+
+        with mock.patch('inventory.webhooks.get_client') as get_client:
+            delivery = deliver(claim_deliveries(1)[0])
+        get_client.assert_not_called()
+        self.assertEqual((delivery.status, delivery.attempts), ('pending', 0))
+        self.assertGreater(delivery.next_attempt_at, timezone.now())
+
+    def test_token_bucket_allows_a_burst_then_queues(self):
+        bucket = TokenBucket('test', per_minute=60, burst=2)
+        now = timezone.now()
+        with mock.patch('inventory.webhook_policy.timezone.now', return_value=now):
+            self.assertEqual(bucket.reserve(), 0)
+            self.assertEqual(bucket.reserve(), 0)
+            self.assertAlmostEqual(bucket.reserve(), 1)
+            self.assertAlmostEqual(bucket.reserve(), 2)
+        with mock.patch('inventory.webhook_policy.timezone.now', return_value=now + timedelta(seconds=10)):
+            self.assertEqual(bucket.reserve(), 0)
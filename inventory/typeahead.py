@@ -0,0 +1,297 @@
+from django.db import connection
+from django.db.models import Count, Max
+from bisect import bisect_left, insort
+from datetime import timedelta
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from .models import Item
+from .conditional import list_changed_at
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Fields of each result row, in order
+TYPEAHEAD_FIELDS = ['id', 'code', 'name', 'stock', 'price']
+
+# Results returned when no limit is given, and the most a request may ask for
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+
+# Seconds between checks for changed items, done by a background thread
+REFRESH_INTERVAL = 2.0
+
+# Longest a write may take to commit. Rows are stamped (updated_at) before
+# their transaction commits, so each refresh also re-reads rows stamped up to
+# this many seconds before the last sync.
+SYNC_WINDOW = 60
+
+# Above this many changed items a full rebuild is cheaper than patching
+REBUILD_THRESHOLD = 2000
+
+# A query word matching more vocabulary words than this is treated as too
+# common to drive the search
+WORD_SCAN_LIMIT = 200
+
+# Item fields read into the index
+ROW_FIELDS = ['id', 'code', 'name', 'current_stock', 'selling_price', 'updated_at']
+
+
+def normalize(text):
+    """
+    Lowercase, accents removed, whitespace collapsed
+    """
+    text = str(text).lower()
+    if text.isascii():
+        return ' '.join(text.split())
+    text = unicodedata.normalize('NFKD', text)
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+class TypeaheadIndex:
+    """
+    Process-local prefix index over item codes and names.
+
+    Everything is kept in sorted lists searched with bisect: codes, full
+    names, the vocabulary of name words, and per word the items using it
+    in name order (as shared (name, id) keys). A query walks the items of
+    its rarest word only, checking the other words with a substring test
+    on the name.
+
+    The index is built on the first search. A background thread then
+    follows the database: every REFRESH_INTERVAL seconds one aggregate
+    query and the commit-time change stamp of the item lists tell whether
+    anything changed, and only items stamped since the last sync (less
+    SYNC_WINDOW, for writes that committed late) are re-read. Deletes show
+    up as a count mismatch and trigger a rebuild, done off to the side and
+    swapped in, so searches never wait for the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.thread = None
+        self.rows = {}
+        self.keys = {}
+        self.spaced = {}
+        self.codes = []
+        self.name_keys = []
+        self.words = []
+        self.postings = {}
+        self.synced_at = None
+        self.changed_stamp = None
+
+    def search(self, query, limit=TYPEAHEAD_LIMIT):
+        """
+        Up to `limit` rows: code matches first (exact, then prefix), then
+        items whose name starts with the query, then items where every
+        query word starts a word of the name, each group in name order
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        self.start()
+        with self.lock:
+            ids = []
+            seen = set()
+            for source in (self._code_matches(query), self._name_prefix_matches(query), self._word_matches(query)):
+                for item_id in source:
+                    if item_id not in seen:
+                        seen.add(item_id)
+                        ids.append(item_id)
+                        if len(ids) == limit:
+                            return [self.rows[i] for i in ids]
+            return [self.rows[i] for i in ids]
+
+    def start(self):
+        """
+        Build the index and start the refresh thread, once per process
+        """
+        if self.thread is not None:
+            return
+        with self.start_lock:
+            if self.thread is None:
+                self.rebuild()
+                self.thread = threading.Thread(target=self._refresh_loop, name='typeahead-refresh', daemon=True)
+                self.thread.start()
+
+    def refresh(self):
+        """
+        Apply the items changed since the last refresh, or rebuild
+        """
+        # Read first: a write committing after this moves it again, so it is
+        # picked up by the next refresh
+        stamp = list_changed_at(Item)
+        stats = Item.objects.aggregate(count=Count('id'), last_change=Max('updated_at'))
+        newer = self.synced_at is None or (stats['last_change'] is not None and stats['last_change'] > self.synced_at)
+        if stats['last_change'] is not None and (newer or stamp != self.changed_stamp):
+            if self.synced_at:
+                # A write may commit rows stamped before the last sync
+                changed = Item.objects.filter(updated_at__gte=self.synced_at - timedelta(seconds=SYNC_WINDOW))
+            else:
+                changed = Item.objects.all()
+            rows = list(changed.values_list(*ROW_FIELDS)[:REBUILD_THRESHOLD + 1])
+            if len(rows) > REBUILD_THRESHOLD:
+                return self.rebuild()
+            with self.lock:
+                for row in rows:
+                    if self._differs(row):
+                        self._put(row)
+                if self.synced_at is None or stats['last_change'] > self.synced_at:
+                    self.synced_at = stats['last_change']
+            self.changed_stamp = stamp
+        if stats['count'] != len(self.rows):
+            self.rebuild()
+
+    def rebuild(self):
+        started = time.monotonic()
+        fresh = TypeaheadIndex()
+        fresh.changed_stamp = list_changed_at(Item)
+        codes = []
+        for row in Item.objects.values_list(*ROW_FIELDS).order_by().iterator(chunk_size=10000):
+            fresh._store(row)
+            codes.append((normalize(row[1]), row[0]))
+            key = fresh.keys[row[0]]
+            for word in set(key[0].split()):
+                fresh.postings.setdefault(word, []).append(key)
+        codes.sort()
+        fresh.codes = codes
+        fresh.name_keys = sorted(fresh.keys.values())
+        for keys in fresh.postings.values():
+            keys.sort()
+        fresh.words = sorted(fresh.postings)
+
+        with self.lock:
+            for name in ('rows', 'keys', 'spaced', 'codes', 'name_keys', 'words', 'postings', 'synced_at', 'changed_stamp'):
+                setattr(self, name, getattr(fresh, name))
+        logger.info(f"Typeahead index built: {len(self.rows)} items in {time.monotonic() - started:.2f} s")
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(REFRESH_INTERVAL)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing typeahead index: {str(e)}")
+            finally:
+                # The thread has its own database connection
+                connection.close()
+
+    def _store(self, row):
+        item_id, code, name, stock, price, updated_at = row
+        normalized = normalize(name)
+        self.rows[item_id] = [item_id, code, name, stock, float(price)]
+        self.keys[item_id] = (normalized, item_id)
+        self.spaced[item_id] = ' ' + normalized
+        if self.synced_at is None or updated_at > self.synced_at:
+            self.synced_at = updated_at
+
+    def _differs(self, row):
+        """
+        Whether a re-read row is new or changed since it was indexed
+        """
+        item_id, code, name, stock, price, updated_at = row
+        return self.rows.get(item_id) != [item_id, code, name, stock, float(price)]
+
+    def _put(self, row):
+        """
+        Insert or replace one item, keeping every sorted list in order
+        """
+        item_id = row[0]
+        if item_id in self.rows:
+            _remove(self.codes, (normalize(self.rows[item_id][1]), item_id))
+            key = self.keys[item_id]
+            _remove(self.name_keys, key)
+            for word in set(key[0].split()):
+                _remove(self.postings[word], key)
+                if not self.postings[word]:
+                    del self.postings[word]
+                    _remove(self.words, word)
+        self._store(row)
+        key = self.keys[item_id]
+        insort(self.codes, (normalize(row[1]), item_id))
+        insort(self.name_keys, key)
+        for word in set(key[0].split()):
+            if word not in self.postings:
+                self.postings[word] = []
+                insort(self.words, word)
+            insort(self.postings[word], key)
+
+    def _code_matches(self, query):
+        position = bisect_left(self.codes, (query,))
+        while position < len(self.codes) and self.codes[position][0].startswith(query):
+            yield self.codes[position][1]
+            position += 1
+
+    def _name_prefix_matches(self, query):
+        position = bisect_left(self.name_keys, (query,))
+        while position < len(self.name_keys) and self.name_keys[position][0].startswith(query):
+            yield self.name_keys[position][1]
+            position += 1
+
+    def _word_matches(self, query):
+        terms = query.split()
+        plans = []
+        for term in terms:
+            words = self._words_with_prefix(term)
+            if not words:
+                return
+            plans.append(words)
+
+        # Walk the items of the rarest term; if every term is a very common
+        # prefix, matches are dense and the name order is walked directly
+        anchor = min(range(len(terms)), key=lambda i: (len(plans[i]) > WORD_SCAN_LIMIT, sum(len(self.postings[w]) for w in plans[i])))
+        words = plans[anchor]
+        if len(words) > WORD_SCAN_LIMIT:
+            keys = iter(self.name_keys)
+        elif len(words) == 1:
+            keys = iter(self.postings[words[0]])
+        else:
+            keys = heapq.merge(*(self.postings[word] for word in words))
+
+        # ' term' in ' name' is true when a word of the name starts with term
+        others = [' ' + term for i, term in enumerate(terms) if i != anchor or len(words) > WORD_SCAN_LIMIT]
+        spaced = self.spaced
+        if not others:
+            for key in keys:
+                yield key[1]
+        elif len(others) == 1:
+            # The common two-word case, without a generator per item
+            other = others[0]
+            for key in keys:
+                if other in spaced[key[1]]:
+                    yield key[1]
+        else:
+            for key in keys:
+                name = spaced[key[1]]
+                if all(term in name for term in others):
+                    yield key[1]
+
+    def _words_with_prefix(self, prefix):
+        """
+        Vocabulary words starting with `prefix`, at most WORD_SCAN_LIMIT + 1
+        """
+        words = []
+        position = bisect_left(self.words, prefix)
+        while position < len(self.words) and len(words) <= WORD_SCAN_LIMIT:
+            word = self.words[position]
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+            position += 1
+        return words
+
+
+def _remove(keys, key):
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+
+_index = TypeaheadIndex()
+
+
+def get_typeahead_index():
+    return _index
@@ -3,17 +3,22 @@ from . import views
 from .views_reset_data import reset_exp_data, reset_transfer_data
 from .views_reset_all_items import reset_all_items
 from .views_save_latest_price import save_latest_price, send_price_to_telegram
-from .views_upload_file import upload_file
+from .views_upload_file import (
+    upload_file, import_job_status, download_import_rejects, import_job_preview, commit_import_preview
+)
 from .views_update_min_stock import update_min_stock, delete_min_stock
 from .views_update_transfer_stock import update_transfer_stock, delete_transfer_stock, send_transfer_to_telegram
 from .views_update_expiry_date import save_expiry_date, send_exp_to_telegram
-from .views_send_to_telegram import send_to_telegram
+from .views_send_to_telegram import send_to_telegram, webhook_delivery_status
 from .views_timezone import timezone_settings
 from .views_packing import (
     kelola_stok_packing, update_packing_min_stock, delete_packing_min_stock,
     send_packing_to_telegram, reset_all_packing_items, create_packing_item,
     update_packing_item, delete_packing_item
 )
+from .views_item_search import search_items_api
+from .views_item_table import item_table_api
+from .views_export import export_items, backup_history, download_backup, download_file
 from django.views.generic import RedirectView
 
 app_name = 'inventory'
@@ -33,6 +38,16 @@ urlpatterns = [
     path('transfer-stok/', views.transfer_stok, name='transfer_stok'),
     path('data-exp-produk/', views.data_exp_produk, name='data_exp_produk'),
     path('upload/', upload_file, name='upload_file'),
+    path('api/import-jobs/<int:job_id>/', import_job_status, name='import_job_status'),
+    path('api/import-jobs/<int:job_id>/rejects/', download_import_rejects, name='download_import_rejects'),
+    path('api/import-jobs/<int:job_id>/preview/', import_job_preview, name='import_job_preview'),
+    path('api/import-jobs/<int:job_id>/commit/', commit_import_preview, name='commit_import_preview'),
+    path('api/items/search/', search_items_api, name='search_items_api'),
+    path('api/items/table/<str:table>/', item_table_api, name='item_table_api'),
+    path('export/<str:table>/', export_items, name='export_items'),
+    path('backup-history/', backup_history, name='backup_history'),
+    path('backup-history/download/', download_backup, name='download_backup'),
+    path('backup-history/files/<int:history_id>/', download_file, name='download_file'),
     path('change-password/', views.change_password, name='change_password'),
     path('webhook-settings/', views.webhook_settings, name='webhook_settings'),
     path('timezone-settings/', timezone_settings, name='timezone_settings'),
@@ -74,6 +89,7 @@ urlpatterns = [
     path('api/send-price-to-telegram/', send_price_to_telegram, name='send_price_to_telegram'),   
     # Dashboard send to telegram endpoint
     path('api/send-to-telegram/', send_to_telegram, name='send_to_telegram'),
+    path('api/webhook-deliveries/<uuid:batch>/', webhook_delivery_status, name='webhook_delivery_status'),
     
     # Packing item endpoints
     path('api/update-packing-min-stock/', update_packing_min_stock, name='update_packing_min_stock'),
@@ -37,6 +37,16 @@ def is_manajer(user):
     except:
         return False
 
+def user_role(user):
+    """
+    Role of the user's profile ('admin', 'staff_gudang' or 'manajer'), or ''
+    when the user has no profile
+    """
+    try:
+        return user.profile.role
+    except Exception:
+        return ''
+
 # Timezone helper functions
 def get_jakarta_time():
     """
@@ -0,0 +1,120 @@
+from openpyxl import Workbook
+import numpy as np
+import pandas as pd
+import csv
+import os
+from .models import Item
+
+# Largest value an IntegerField can hold on every supported database
+MAX_STOCK = 2 ** 31 - 1
+
+# Column added to the reject file with the reasons a row was rejected
+REASON_COLUMN = 'Alasan'
+
+# Column added to the reject file with the row number in the uploaded sheet
+ROW_COLUMN = 'Baris'
+
+
+def validate_stock_frame(df, seen_codes=None):
+    """
+    Validate one chunk of the stock upload, column by column.
+
+    Coerces 'Total Stok' and 'Harga Jual' to numbers and checks every rule
+    as a whole-column mask before anything is written. A code that appears
+    more than once is kept the first time and rejected after that, also
+    across chunks when `seen_codes` holds the codes already accepted.
+
+    Returns (clean, rejects): `clean` has the columns Kode, name, category,
+    current_stock and selling_price for the rows that can be stored,
+    `rejects` has the original rows plus their sheet row number and reason.
+    """
+    code_max = Item._meta.get_field('code').max_length
+    name_max = Item._meta.get_field('name').max_length
+    category_max = Item._meta.get_field('category').max_length
+    price_field = Item._meta.get_field('selling_price')
+    price_max = 10 ** (price_field.max_digits - price_field.decimal_places)
+
+    code = text_column(df['Kode'])
+    name = text_column(df['Nama Barang'])
+    category = text_column(df['Kategori'])
+    stock = pd.to_numeric(df['Total Stok'], errors='coerce')
+    price = pd.to_numeric(df['Harga Jual'], errors='coerce')
+
+    checks = [
+        (code == '', 'Kode kosong'),
+        (code.str.len() > code_max, f'Kode lebih dari {code_max} karakter'),
+        (name == '', 'Nama Barang kosong'),
+        (name.str.len() > name_max, f'Nama Barang lebih dari {name_max} karakter'),
+        (category == '', 'Kategori kosong'),
+        (category.str.len() > category_max, f'Kategori lebih dari {category_max} karakter'),
+        (stock.isna(), 'Total Stok bukan angka'),
+        (stock < 0, 'Total Stok negatif'),
+        (stock > MAX_STOCK, 'Total Stok terlalu besar'),
+        (stock.notna() & np.isfinite(stock) & (stock % 1 != 0), 'Total Stok bukan bilangan bulat'),
+        (price.isna(), 'Harga Jual bukan angka'),
+        (price < 0, 'Harga Jual negatif'),
+        (price >= price_max, 'Harga Jual terlalu besar'),
+    ]
+
+    reasons = pd.Series('', index=df.index, dtype=object)
+    for mask, message in checks:
+        reasons = reasons.mask(mask, reasons + message + '; ')
+
+    # Duplicates are only counted among rows that are otherwise valid, so a
+    # broken first row does not cause a good later one to be rejected
+    valid = reasons == ''
+    duplicate = valid & code.where(valid).duplicated(keep='first')
+    if seen_codes:
+        duplicate |= valid & np.array([value in seen_codes for value in code], dtype=bool)
+    reasons = reasons.mask(duplicate, 'Kode duplikat; ')
+
+    invalid = reasons != ''
+    clean = pd.DataFrame({
+        'Kode': code[~invalid],
+        'name': name[~invalid],
+        'category': category[~invalid],
+        'current_stock': stock[~invalid].astype('int64'),
+        'selling_price': price[~invalid].round(2),
+    })
+
+    rejects = df[invalid].copy()
+    rejects.insert(0, ROW_COLUMN, rejects.index)
+    rejects[REASON_COLUMN] = reasons[invalid].str.slice(stop=-2)
+    return clean, rejects
+
+
+def text_column(column):
+    """
+    Stripped text, with missing cells as empty strings
+    """
+    return column.astype(str).str.strip().where(column.notna(), '')
+
+
+class RejectWriter:
+    """
+    Appends rejected rows to a CSV file while the import runs, so the
+    rejects of a large upload are never held in memory together
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, rejects):
+        if rejects.empty:
+            return
+        new_file = not os.path.exists(self.path)
+        # The BOM lets Excel open the file as UTF-8
+        with open(self.path, 'a', encoding='utf-8-sig' if new_file else 'utf-8', newline='') as f:
+            rejects.to_csv(f, header=new_file, index=False)
+
+
+def reject_csv_to_xlsx(csv_path, output):
+    """
+    Convert a reject CSV to XLSX row by row with a write-only workbook
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Ditolak')
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            worksheet.append(row)
+    workbook.save(output)
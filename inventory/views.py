@@ -15,6 +15,12 @@ from .models import Item, WebhookSettings, ActivityLog, UserProfile, CancelledOr
 from .forms import LoginForm, WebhookSettingsForm, UserRegistrationForm, UserEditForm, UserProfileForm
 from .views_timezone import get_localized_time, format_datetime
 from .utils import is_admin, is_staff_gudang, is_manajer
+from .pagination import keyset_paginate
+from .item_lists import item_list, item_rows, item_table_url, view_queries, SCROLL_VIEW
+from .dashboard_stats import get_dashboard_stats
+from .row_cache import render_rows
+from .conditional import conditional_list
+from .webhooks import enqueue_packed
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,17 +30,13 @@ def dashboard(request):
     """
     View for dashboard
     """
-    # Get counts for dashboard stats
-    total_items = Item.objects.count()
-    low_stock_items = Item.objects.filter(current_stock__lt=10).count()
-    
-    # Get recent activity logs
-    recent_logs = ActivityLog.objects.all().order_by("-timestamp")[:5]
+    # Counts and totals come from the cache, invalidated by item writes
+    stats = get_dashboard_stats()
     
     context = {
-        "total_items": total_items,
-        "low_stock_items": low_stock_items,
-        "recent_logs": recent_logs
+        "stats": stats,
+        "total_items": stats["total_items"],
+        "low_stock_items": stats["below_minimum"],
     }
     
     return render(request, "inventory/dashboard.html", context)
@@ -57,6 +59,7 @@ def otomatisasi(request):
 
 @login_required
 @user_passes_test(lambda u: not is_staff_gudang(u), login_url="/dashboard/")
+@conditional_list(Item)
 def kelola_stok_barang(request):
     # Double-check permission inside the view
     if is_staff_gudang(request.user):
@@ -68,44 +71,28 @@ def kelola_stok_barang(request):
     View for managing stock items
     """
     query = request.GET.get("query", "")
-    sort = request.GET.get("sort", "")
-    filter_option = request.GET.get("filter", "")
-    
-    items = Item.objects.all()
-    
-    # Default sort by name ascending
-    items = items.order_by("name")
-    
-    # Search functionality
-    if query:
-        items = items.filter(name__icontains=query) | items.filter(code__icontains=query) | items.filter(category__icontains=query)
-    
-    # Filter functionality
-    if filter_option == "low_stock":
-        items = items.filter(current_stock__lt=10)
     
-    # Specific sorting functionality (overrides default)
-    if sort == "name_desc":
-        items = items.order_by("-name")
-    elif sort == "category":
-        items = items.order_by("category")
-    elif sort == "category_desc":
-        items = items.order_by("-category")
-    elif sort == "stock_asc":
-        items = items.order_by("current_stock")
-    elif sort == "stock_desc":
-        items = items.order_by("-current_stock")
-    # No need for sort == 'name' as it's the default
+    # Search, low stock filter and sort
+    items, order = item_list(request, "kelola_stok_barang")
     
     context = {
-        "items": items,
         "query": query,
+        "view_queries": view_queries(request),
     }
     
+    if request.GET.get("view") == SCROLL_VIEW:
+        # Rows are loaded by the virtual scroller from the table endpoint
+        context["scroll_url"] = item_table_url(request, "kelola_stok_barang")
+    else:
+        # One page at a time, seeking from the last row of the previous page
+        page = keyset_paginate(request, item_rows(items, "kelola_stok_barang", order), order)
+        context.update({"items": page, "page": page})
+    
     return render(request, "inventory/kelola_stok_barang.html", context)
 
 @login_required
 # @user_passes_test(lambda u: not is_staff_gudang(u)) # Removed staff gudang check
+@conditional_list(Item)
 def data_exp_produk(request):
     """
     View for managing expired products
@@ -114,47 +101,46 @@ def data_exp_produk(request):
     from django.utils import timezone
     
     query = request.GET.get("query", "")
-    sort = request.GET.get("sort", "")
-    
-    items = Item.objects.all()
-    
-    # Default sort by name ascending
-    items = items.order_by("name")
-    
-    # Search functionality
-    if query:
-        items = items.filter(name__icontains=query) | items.filter(code__icontains=query)
     
-    # Specific sorting functionality (overrides default)
-    if sort == "exp_asc":
-        items = items.order_by("expiry_date")
-    elif sort == "exp_desc":
-        items = items.order_by("-expiry_date")
-    elif sort == "name_desc":
-        items = items.order_by("-name")
-    elif sort == "stock_asc":
-        items = items.order_by("current_stock")
-    elif sort == "stock_desc":
-        items = items.order_by("-current_stock")
-    # No need for sort == 'name' as it's the default
+    # Search and sort
+    items, order = item_list(request, "data_exp_produk")
     
     # Calculate dates for expiry coloring
     today = timezone.now().date()
     six_months_future = today + timedelta(days=180)  # ~6 months
     twelve_months_future = today + timedelta(days=365)  # ~12 months
     
-    context = {
-        "items": items,
-        "query": query,
+    # Row colors depend on the date, so cached rows vary on it
+    dates = {
         "today": today,
         "six_months_future": six_months_future,
         "twelve_months_future": twelve_months_future,
     }
     
+    context = {
+        "query": query,
+        "view_queries": view_queries(request),
+        **dates,
+    }
+    
+    if request.GET.get("view") == SCROLL_VIEW:
+        # Rows are loaded by the virtual scroller from the table endpoint
+        context["scroll_url"] = item_table_url(request, "data_exp_produk")
+    else:
+        # One page at a time, seeking from the last row of the previous page
+        # (updated_at keys the cached rows)
+        page = keyset_paginate(request, item_rows(items, "data_exp_produk", order, extra=["updated_at"]), order)
+        context.update({
+            "items": page,
+            "page": page,
+            "rows": render_rows(request, "inventory/includes/data_exp_produk_row.html", page, vary=[today], context=dates),
+        })
+    
     return render(request, "inventory/data_exp_produk.html", context)
 
 @login_required
 @user_passes_test(lambda u: not is_staff_gudang(u), login_url="/dashboard/")
+@conditional_list(Item)
 def kelola_harga(request):
     # Double-check permission inside the view
     if is_staff_gudang(request.user):
@@ -166,35 +152,23 @@ def kelola_harga(request):
     View for managing prices
     """
     query = request.GET.get("query", "")
-    sort = request.GET.get("sort", "")
-    
-    items = Item.objects.all()
-    
-    # Default sort by name ascending
-    items = items.order_by("name")
     
-    # Search functionality
-    if query:
-        items = items.filter(name__icontains=query) | items.filter(code__icontains=query) | items.filter(category__icontains=query)
-    
-    # Specific sorting functionality (overrides default)
-    if sort == "name_desc":
-        items = items.order_by("-name")
-    elif sort == "category":
-        items = items.order_by("category")
-    elif sort == "category_desc":
-        items = items.order_by("-category")
-    elif sort == "price_asc":
-        items = items.order_by("selling_price")
-    elif sort == "price_desc":
-        items = items.order_by("-selling_price")
-    # No need for sort == 'name' as it's the default
+    # Search and sort
+    items, order = item_list(request, "kelola_harga")
     
     context = {
-        "items": items,
         "query": query,
+        "view_queries": view_queries(request),
     }
     
+    if request.GET.get("view") == SCROLL_VIEW:
+        # Rows are loaded by the virtual scroller from the table endpoint
+        context["scroll_url"] = item_table_url(request, "kelola_harga")
+    else:
+        # One page at a time, seeking from the last row of the previous page
+        page = keyset_paginate(request, item_rows(items, "kelola_harga", order), order)
+        context.update({"items": page, "page": page})
+    
     return render(request, "inventory/kelola_harga.html", context)
 
 @login_required
@@ -208,41 +182,33 @@ def kelola_stok_packing(request):
     return render(request, "inventory/kelola_stok_packing.html") # Keeping this for now, but might need removal/update
 
 @login_required
+@conditional_list(Item)
 def transfer_stok(request):
     try:
         logger.info("Accessing transfer_stok view")
         query = request.GET.get("query", "")
-        sort = request.GET.get("sort", "")
-        filter_option = request.GET.get("filter", "")
-        
-        items = Item.objects.all()
-        logger.info(f"Retrieved {items.count()} items from database")
-        
-        # Default sort by name ascending
-        items = items.order_by("name")
         
-        # Search functionality
-        if query:
-            items = items.filter(name__icontains=query) | items.filter(code__icontains=query) | items.filter(category__icontains=query)
-        
-        # Specific sorting functionality (overrides default)
-        if sort == "name_desc":
-            items = items.order_by("-name")
-        elif sort == "category":
-            items = items.order_by("category")
-        elif sort == "category_desc":
-            items = items.order_by("-category")
-        elif sort == "stock_asc":
-            items = items.order_by("current_stock")
-        elif sort == "stock_desc":
-            items = items.order_by("-current_stock")
-        # No need for sort == 'name' as it's the default
+        # Search, low stock filter and sort
+        items, order = item_list(request, "transfer_stok")
         
         context = {
-            "items": items,
             "query": query,
+            "view_queries": view_queries(request),
         }
         
+        if request.GET.get("view") == SCROLL_VIEW:
+            # Rows are loaded by the virtual scroller from the table endpoint
+            context["scroll_url"] = item_table_url(request, "transfer_stok")
+        else:
+            # One page at a time, seeking from the last row of the previous page
+            # (updated_at keys the cached rows)
+            page = keyset_paginate(request, item_rows(items, "transfer_stok", order, extra=["updated_at"]), order)
+            context.update({
+                "items": page,
+                "page": page,
+                "rows": render_rows(request, "inventory/includes/transfer_stok_row.html", page),
+            })
+        
         return render(request, "inventory/transfer_stok.html", context)
     except Exception as e:
         logger.error(f"Error in transfer_stok view: {str(e)}")
@@ -721,35 +687,16 @@ def send_cancelled_order_telegram(request, order_id):
                 f"Tanpa Konfirmasi - Kembalikan Ke Stok Kasir"
             )
             
-            # Send to webhook (assuming simple text payload is sufficient for most webhooks like Zapier/Make)
-            # For many simple webhooks, sending a dictionary with a 'text' key works.
-            webhook_payload = {"text": message_text} 
-            
-            import requests # Import requests library
-            response = requests.post(webhook_settings.webhook_pesanan_dibatalkan, json=webhook_payload)
-            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-            messages.success(request, f"Data pesanan dibatalkan ({order.order_number}) berhasil dikirim ke Telegram.")
-            # Log activity
-            ActivityLog.objects.create(
-                user=request.user,
-                action="send_cancelled_telegram",
-                status="success",
-                notes=f"Sent cancelled order {order.order_number} to Telegram webhook."
+            # Queue the message; the webhook worker sends it (a dictionary
+            # with a 'text' key works for simple webhooks like Zapier/Make)
+            enqueue_packed(
+                "pesanan_dibatalkan", webhook_settings.webhook_pesanan_dibatalkan, request.user, "send_cancelled_telegram",
+                [message_text], f"cancelled order {order.order_number}"
             )
+            messages.success(request, f"Data pesanan dibatalkan ({order.order_number}) masuk antrean pengiriman ke Telegram.")
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending cancelled order {order.id} to Telegram: {e}")
-            messages.error(request, f"Gagal mengirim data ke Telegram: {e}")
-            # Log error
-            ActivityLog.objects.create(
-                user=request.user,
-                action="send_cancelled_telegram_failed",
-                status="failed",
-                notes=f"Failed to send cancelled order {order.order_number} to Telegram. Error: {e}"
-            )
         except Exception as e:
-            logger.error(f"Unexpected error sending cancelled order {order.id} to Telegram: {e}")
+            logger.error(f"Unexpected error queueing cancelled order {order.id} for Telegram: {e}")
             logger.error(traceback.format_exc())
             messages.error(request, f"Terjadi kesalahan tidak terduga: {e}")
             # Log error
@@ -757,7 +704,7 @@ def send_cancelled_order_telegram(request, order_id):
                 user=request.user,
                 action="send_cancelled_telegram_failed",
                 status="failed",
-                notes=f"Failed to send cancelled order {order.order_number} to Telegram. Unexpected Error: {e}"
+                notes=f"Failed to queue cancelled order {order.order_number} for Telegram. Unexpected Error: {e}"
             )
             
         return redirect("inventory:pesanan_dibatalkan")
@@ -0,0 +1,98 @@
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib import messages
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+import logging
+import os
+from .models import Item, ActivityLog, UploadHistory
+from .exports import EXPORT_COLUMNS, PRICE_FIELDS, XLSX_MAX_ROWS, export_response, xlsx_too_large
+from .item_lists import ITEM_LISTS, item_list
+from .utils import is_staff_gudang
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+@login_required
+@require_GET
+def export_items(request, table):
+    """
+    Download an item list page with its current search, filter and sort, as
+    CSV (default) or XLSX (?format=xlsx). Prices are left out for roles that
+    cannot open Kelola Harga.
+    """
+    config = ITEM_LISTS.get(table)
+    if config is None:
+        raise Http404('Tabel tidak ditemukan')
+    if not config['staff_gudang'] and is_staff_gudang(request.user):
+        messages.error(request, "Anda tidak memiliki izin untuk mengakses halaman ini")
+        return redirect("inventory:dashboard")
+
+    columns = EXPORT_COLUMNS
+    if not ITEM_LISTS['kelola_harga']['staff_gudang'] and is_staff_gudang(request.user):
+        columns = [column for column in EXPORT_COLUMNS if column[1] not in PRICE_FIELDS]
+
+    items, order = item_list(request, table)
+    file_format = request.GET.get('format', 'csv')
+    if file_format == 'xlsx' and xlsx_too_large(items):
+        messages.error(request, f'Data lebih dari {XLSX_MAX_ROWS} baris, gunakan Export CSV')
+        return redirect(f'inventory:{table}')
+    logger.info(f"User {request.user.username} exporting {table} as {file_format}")
+    ActivityLog.objects.create(
+        user=request.user,
+        action='export_items',
+        status='success',
+        notes=f'Export {table} ({file_format}), query: {request.GET.urlencode() or "-"}'
+    )
+    return export_response(items.order_by(order, 'pk'), file_format, f'{table}_{_timestamp()}', columns)
+
+@login_required
+@user_passes_test(lambda u: not is_staff_gudang(u))
+def backup_history(request):
+    """
+    View for the uploaded files and the stock backup download
+    """
+    context = {
+        "upload_history": UploadHistory.objects.select_related('user')[:100],
+    }
+    return render(request, "inventory/backup_history.html", context)
+
+@login_required
+@user_passes_test(lambda u: not is_staff_gudang(u))
+@require_GET
+def download_backup(request):
+    """
+    Download all items as they are now, as CSV (default) or, up to
+    XLSX_MAX_ROWS items, as XLSX (?format=xlsx)
+    """
+    file_format = request.GET.get('format', 'csv')
+    items = Item.objects.order_by('code')
+    if file_format == 'xlsx' and xlsx_too_large(items):
+        messages.error(request, f'Data lebih dari {XLSX_MAX_ROWS} baris, gunakan backup CSV')
+        return redirect('inventory:backup_history')
+    logger.info(f"User {request.user.username} downloading backup as {file_format}")
+    ActivityLog.objects.create(
+        user=request.user,
+        action='download_backup',
+        status='success',
+        notes=f'Download backup stok ({file_format})'
+    )
+    return export_response(items, file_format, f'backup_stok_{_timestamp()}')
+
+@login_required
+@user_passes_test(lambda u: not is_staff_gudang(u))
+def download_file(request, history_id):
+    """
+    Download a file as it was uploaded
+    """
+    history = get_object_or_404(UploadHistory, pk=history_id)
+    if not history.file_path or not os.path.isfile(history.file_path):
+        # Uploaded files are removed after import and on restart
+        messages.error(request, f'File {history.filename} sudah tidak tersedia di server')
+        return redirect('inventory:backup_history')
+    return FileResponse(open(history.file_path, 'rb'), as_attachment=True, filename=history.filename)
+
+
+def _timestamp():
+    return timezone.localtime().strftime('%Y%m%d_%H%M')
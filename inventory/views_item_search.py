@@ -0,0 +1,40 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+import logging
+import traceback
+from .item_lists import ITEM_LISTS
+from .typeahead import get_typeahead_index, TYPEAHEAD_FIELDS, TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT
+from .utils import is_staff_gudang
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+@login_required
+@require_GET
+def search_items_api(request):
+    """
+    Typeahead search over item codes and names for search boxes and barcode
+    scanners. Returns up to `limit` rows as arrays in the order of `fields`;
+    'price' is left out for roles that cannot open Kelola Harga.
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', TYPEAHEAD_LIMIT)), 1), TYPEAHEAD_MAX_LIMIT)
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+
+    try:
+        items = get_typeahead_index().search(query, limit)
+    except Exception as e:
+        logger.error(f"Error in search_items_api view: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JsonResponse({'status': 'error', 'message': f'Terjadi kesalahan: {str(e)}'}, status=500)
+
+    fields = TYPEAHEAD_FIELDS
+    if not ITEM_LISTS['kelola_harga']['staff_gudang'] and is_staff_gudang(request.user):
+        keep = [position for position, field in enumerate(fields) if field != 'price']
+        fields = [fields[position] for position in keep]
+        items = [[row[position] for position in keep] for row in items]
+
+    return JsonResponse({'status': 'success', 'fields': fields, 'items': items})
@@ -0,0 +1,64 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+from decimal import Decimal
+import logging
+import traceback
+from .conditional import conditional_list
+from .item_lists import ITEM_LISTS, item_list, item_rows
+from .models import Item
+from .pagination import keyset_paginate
+from .utils import is_staff_gudang
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows per response; the scroller follows `next` until the list is complete
+TABLE_CHUNK_SIZE = 2000
+
+
+@login_required
+@require_GET
+@gzip_page
+@conditional_list(Item)
+def item_table_api(request, table):
+    """
+    Rows of an item list page in columnar form: one array per field under
+    `columns`, in the page's search/filter/sort order, `TABLE_CHUNK_SIZE`
+    rows at a time. `next` is the query string of the following chunk, or
+    null after the last one.
+    """
+    config = ITEM_LISTS.get(table)
+    if config is None:
+        return JsonResponse({'status': 'error', 'message': 'Tabel tidak ditemukan'}, status=404)
+    if not config['staff_gudang'] and is_staff_gudang(request.user):
+        return JsonResponse({'status': 'error', 'message': 'Anda tidak memiliki izin untuk mengakses halaman ini'}, status=403)
+
+    try:
+        items, order = item_list(request, table)
+        fields = config['fields']
+        page = keyset_paginate(request, item_rows(items, table, order), order, page_size=TABLE_CHUNK_SIZE)
+
+        # Row tuples start with the row fields, in order
+        values = list(zip(*page)) or [()] * len(fields)
+        columns = {field: [_json_value(value) for value in column] for field, column in zip(fields, values)}
+    except Exception as e:
+        logger.error(f"Error in item_table_api view: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JsonResponse({'status': 'error', 'message': f'Terjadi kesalahan: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'fields': fields,
+        'columns': columns,
+        'count': len(page),
+        'next': page.next_query,
+    })
+
+
+def _json_value(value):
+    # Prices without cents as plain integers, which is most of them
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
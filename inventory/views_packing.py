@@ -4,17 +4,24 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
 import json
-import requests
 import logging
 import traceback
 from .models import PackingItem, WebhookSettings, ActivityLog
 from .utils import is_admin, is_staff_gudang
 from .views_timezone import get_localized_time, format_datetime
+from .row_cache import render_rows
+from .webhooks import enqueue_packed, queued_response_data
+from .conditional import conditional_list
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Fields shown by the rows of Kelola Stok Packing (updated_at keys the
+# cached rows)
+PACKING_ROW_FIELDS = ['id', 'code', 'name', 'category', 'current_stock', 'minimum_stock', 'updated_at']
+
 @login_required
+@conditional_list(PackingItem)
 def kelola_stok_packing(request):
     """
     View for Kelola Stok Packing page - displays packing items with their stock
@@ -62,9 +69,10 @@ def kelola_stok_packing(request):
     
     # Filtering functionality
     if filter_option == "low_stock":
-        # Ensure filtering works with potentially already filtered/sorted querysets
-        # Note: This filter might be slow on large datasets as it evaluates in Python
-        items = [item for item in items if item.minimum_stock is not None and item.current_stock < item.minimum_stock]
+        # Compared in the database, served by packing_below_min_idx
+        items = items.below_minimum()
+    
+    items = items.rows(*PACKING_ROW_FIELDS)
     
     # Explicitly set staff_gudang status in context
     is_admin_user = is_admin(request.user)
@@ -74,6 +82,7 @@ def kelola_stok_packing(request):
     
     context = {
         "items": items,
+        "rows": render_rows(request, "inventory/includes/kelola_stok_packing_row.html", items, context={"is_admin": is_admin_user}),
         "query": query,
         "is_admin": is_admin_user,
         "is_staff_gudang": is_staff_gudang_user,
@@ -179,9 +188,15 @@ def send_packing_to_telegram(request):
     
     if request.method == "POST":
         try:
-            # Read the plain text message directly from the request body
+            # The page sends {"text": ...} as JSON; a plain text body is
+            # still accepted as the message itself
             message_text = request.body.decode("utf-8")
-            logger.info(f"Received plain text message for Telegram: \n{message_text}")
+            if request.content_type == "application/json":
+                try:
+                    message_text = json.loads(message_text).get("text", "")
+                except (json.JSONDecodeError, AttributeError):
+                    return JsonResponse({"status": "error", "message": "Format JSON tidak valid"})
+            logger.info(f"Received message for Telegram: \n{message_text}")
 
             if not message_text:
                 return JsonResponse({"status": "error", "message": "Pesan kosong diterima"})
@@ -197,38 +212,14 @@ def send_packing_to_telegram(request):
                 logger.error("Webhook URL for Kelola Stok Packing not configured")
                 return JsonResponse({"status": "error", "message": "URL webhook Telegram untuk Kelola Stok Packing belum diatur"})
             
-            # Send the received plain text message to the webhook as JSON with a 'text' field
-            response = requests.post(
-                webhook_url,
-                json={"text": message_text}, # Send as JSON with 'text' field
-                headers={"Content-Type": "application/json"}, # Set content type to JSON
-                timeout=10 # Add a timeout
+            # Queue the message as JSON with a 'text' field, split into
+            # several when it is too long; the webhook worker sends them
+            header, lines, footer = _split_packing_message(message_text)
+            batch, count = enqueue_packed(
+                "kelola_stok_packing", webhook_url, request.user, "send_packing_to_telegram", lines,
+                "packing notification text", header=header, footer=footer
             )
-            
-            # Check response status code, but don't assume JSON response from webhook
-            if response.status_code == 200:
-                logger.info(f"Successfully sent packing notification to webhook for user {request.user.username}. Webhook response status: {response.status_code}")
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action="send_packing_to_telegram",
-                    status="success",
-                    notes=f"Sent packing notification text to Telegram webhook."
-                )
-                # Return JSON success to frontend, regardless of webhook response body
-                return JsonResponse({"status": "success", "message": "Notifikasi berhasil dikirim ke Telegram"})
-            else:
-                # Log error with webhook response text (which might not be JSON)
-                logger.error(f"Failed to send packing notification to webhook. Status: {response.status_code}, Response: {response.text}")
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action="send_packing_to_telegram",
-                    status="failed",
-                    notes=f"Failed to send packing notification to Telegram webhook: {response.status_code} - {response.text}"
-                )
-                # Return JSON error to frontend
-                return JsonResponse({"status": "error", "message": f"Gagal mengirim notifikasi: {response.status_code} - {response.text}"})
+            return JsonResponse(queued_response_data(batch, count))
             
         except Exception as e:
             logger.error(f"Error in send_packing_to_telegram view: {str(e)}")
@@ -446,3 +437,15 @@ def delete_packing_item(request):
     
     return JsonResponse({"status": "error", "message": "Invalid request method"})
 
+
+def _split_packing_message(text):
+    """
+    Split a packing request ("header\n\nitem lines\n\nfooter") into its
+    header, item lines and footer, so every message repeats the header and
+    footer. Text without that layout is all item lines.
+    """
+    first = text.find("\n\n")
+    last = text.rfind("\n\n")
+    if first == -1 or first == last:
+        return "", text.splitlines(keepends=True), ""
+    return text[:first + 2], text[first + 2:last + 1].splitlines(keepends=True), text[last + 1:]
@@ -4,9 +4,9 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
-import requests
 import traceback
 from .models import Item, ActivityLog, WebhookSettings
+from .webhooks import enqueue_packed, queued_response_data
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -105,11 +105,11 @@ def send_price_to_telegram(request):
             # Get items
             items = Item.objects.filter(id__in=item_ids)
             
-            # Prepare message
-            message = f"💰 Daftar Harga Produk:\n\n"
+            # Prepare one block per item
+            blocks = []
             
             for item in items:
-                message += f"*{item.name}*\n"
+                message = f"*{item.name}*\n"
                 message += f"Kode: {item.code}\n"
                 message += f"Kategori: {item.category}\n"
                 
@@ -122,35 +122,16 @@ def send_price_to_telegram(request):
                     logger.info(f"Using selling_price for item {item.id}: {item.selling_price}")
                 
                 message += "\n"
+                blocks.append(message)
             
-            # Send to webhook
-            logger.info(f"Sending to webhook: {webhook_url}")
-            response = requests.post(
-                webhook_url,
-                json={'text': message, 'parse_mode': 'Markdown'},
-                headers={'Content-Type': 'application/json'}
+            # Queue the blocks packed into messages under Telegram's size
+            # limit; the webhook worker sends them
+            batch, count = enqueue_packed(
+                'kelola_harga', webhook_url, request.user, 'send_price_to_telegram', blocks,
+                f'price notification for {len(blocks)} items', header="💰 Daftar Harga Produk:\n\n",
+                parse_mode='Markdown'
             )
-            
-            if response.status_code == 200:
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='send_price_to_telegram',
-                    status='success',
-                    notes=f'Sent price notification for {len(items)} items to Telegram'
-                )
-                
-                return JsonResponse({'status': 'success', 'message': 'Notification sent to Telegram'})
-            else:
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='send_price_to_telegram',
-                    status='failed',
-                    notes=f'Failed to send price notification to Telegram: {response.text}'
-                )
-                
-                return JsonResponse({'status': 'error', 'message': f'Failed to send notification: {response.text}'})
+            return JsonResponse(queued_response_data(batch, count))
             
         except Exception as e:
             logger.error(f"Error in send_price_to_telegram view: {str(e)}")
@@ -1,11 +1,12 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET
 import json
 import logging
-import requests
 import traceback
-from .models import Item, WebhookSettings, ActivityLog
+from .models import Item, WebhookSettings
+from .webhooks import enqueue_packed, queued_response_data, batch_status
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -51,15 +52,12 @@ def send_to_telegram(request):
             logger.warning(f"No items found with IDs: {item_ids}")
             return JsonResponse({'status': 'error', 'message': 'No items found'}, status=404)
         
-        # Send to Telegram
-        success_count = 0
-        error_count = 0
-        error_messages = []
-        
+        # One block per item, packed into as few messages as possible; the
+        # webhook worker sends them
+        blocks = []
         for item in items:
             # Format message
-            message = f"📦 Stok Barang:\n"
-            message += f"Kode: {item.code}\n"
+            message = f"Kode: {item.code}\n"
             message += f"Nama: {item.name}\n"
             message += f"Kategori: {item.category}\n"
             message += f"Stok: {item.current_stock}\n"
@@ -72,72 +70,13 @@ def send_to_telegram(request):
                 price_str = f"{item.selling_price:,.0f}".replace(",", ".")
                 message += f"Harga: Rp {price_str}\n"
             
-            # Send to webhook
-            try:
-                response = requests.post(
-                    webhook_url,
-                    json={'text': message},
-                    headers={'Content-Type': 'application/json'},
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    success_count += 1
-                    logger.info(f"Successfully sent item {item.id} to Telegram")
-                    
-                    # Log activity
-                    ActivityLog.objects.create(
-                        user=request.user,
-                        action='send_to_telegram',
-                        status='success',
-                        notes=f'Sent item {item.name} (ID: {item.id}) to Telegram'
-                    )
-                else:
-                    error_count += 1
-                    error_message = f"Failed to send item {item.id} to Telegram: {response.status_code} {response.text}"
-                    error_messages.append(error_message)
-                    logger.error(error_message)
-                    
-                    # Log activity
-                    ActivityLog.objects.create(
-                        user=request.user,
-                        action='send_to_telegram',
-                        status='error',
-                        notes=f'Failed to send item {item.name} (ID: {item.id}) to Telegram: {response.status_code}'
-                    )
-            except Exception as e:
-                error_count += 1
-                error_message = f"Error sending item {item.id} to Telegram: {str(e)}"
-                error_messages.append(error_message)
-                logger.error(error_message)
-                logger.error(traceback.format_exc())
-                
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='send_to_telegram',
-                    status='error',
-                    notes=f'Error sending item {item.name} (ID: {item.id}) to Telegram: {str(e)}'
-                )
+            blocks.append(message)
         
-        # Return response
-        if success_count > 0 and error_count == 0:
-            return JsonResponse({
-                'status': 'success',
-                'message': f'Successfully sent {success_count} item(s) to Telegram'
-            })
-        elif success_count > 0 and error_count > 0:
-            return JsonResponse({
-                'status': 'partial',
-                'message': f'Sent {success_count} item(s) to Telegram, but failed to send {error_count} item(s)',
-                'errors': error_messages
-            })
-        else:
-            return JsonResponse({
-                'status': 'error',
-                'message': f'Failed to send all {error_count} item(s) to Telegram',
-                'errors': error_messages
-            }, status=500)
+        batch, count = enqueue_packed(
+            'kelola_stok', webhook_url, request.user, 'send_to_telegram', blocks,
+            f'{len(blocks)} items', header="📦 Stok Barang:\n", separator="\n"
+        )
+        return JsonResponse(queued_response_data(batch, count))
     
     except Exception as e:
         logger.error(f"Unexpected error in send_to_telegram view: {str(e)}")
@@ -146,3 +85,14 @@ def send_to_telegram(request):
             'status': 'error',
             'message': f'Unexpected error: {str(e)}'
         }, status=500)
+
+@login_required
+@require_GET
+def webhook_delivery_status(request, batch):
+    """
+    API endpoint polled by the pages for the messages of one send action
+    """
+    delivery = batch_status(batch)
+    if delivery is None:
+        return JsonResponse({'status': 'error', 'message': 'Pengiriman tidak ditemukan'}, status=404)
+    return JsonResponse({'status': 'success', 'delivery': delivery})
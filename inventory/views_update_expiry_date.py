@@ -5,9 +5,9 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
 import traceback
-import requests
 from datetime import datetime
 from .models import Item, ActivityLog, WebhookSettings
+from .webhooks import enqueue_packed, queued_response_data
 from .views_timezone import get_localized_time, format_datetime
 
 # Configure logging
@@ -106,15 +106,12 @@ def send_exp_to_telegram(request):
             # Get items
             items = Item.objects.filter(id__in=item_ids)
             
-            # Send to Telegram
-            success_count = 0
-            error_count = 0
-            error_messages = []
-            
+            # One block per item, packed into as few messages as possible;
+            # the webhook worker sends them
+            blocks = []
             for item in items:
                 # Format message with localized time
-                message = f"📦 Produk Expired:\n"
-                message += f"Nama: {item.name}\n"
+                message = f"Nama: {item.name}\n"
                 
                 if item.expiry_date:
                     # Format the expiry date using the system timezone
@@ -124,84 +121,19 @@ def send_exp_to_telegram(request):
                     message += f"Exp: Tidak diatur\n"
                     
                 message += f"Stok: {item.current_stock}\n"
-                
-                # Send to webhook
-                try:
-                    # Format payload according to Zapier/Telegram requirements
-                    payload = {
-                        'text': message,
-                        'chat_id': '@your_channel',  # This might be needed for Telegram API
-                        'parse_mode': 'Markdown'
-                    }
-                    
-                    # Log the outgoing payload for debugging
-                    logger.info(f"Sending payload to webhook: {webhook_url}")
-                    logger.info(f"Payload content: {payload}")
-                    
-                    response = requests.post(
-                        webhook_url,
-                        json=payload,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=10
-                    )
-                    
-                    if response.status_code == 200:
-                        success_count += 1
-                        logger.info(f"Successfully sent item {item.id} expiry notification to Telegram")
-                        
-                        # Log activity
-                        ActivityLog.objects.create(
-                            user=request.user,
-                            action='send_exp_to_telegram',
-                            status='success',
-                            notes=f'Sent expiry notification for {item.name} (ID: {item.id}) to Telegram'
-                        )
-                    else:
-                        error_count += 1
-                        error_message = f"Failed to send item {item.id} to Telegram: {response.status_code} {response.text}"
-                        error_messages.append(error_message)
-                        logger.error(error_message)
-                        
-                        # Log activity
-                        ActivityLog.objects.create(
-                            user=request.user,
-                            action='send_exp_to_telegram',
-                            status='error',
-                            notes=f'Failed to send expiry notification for {item.name} (ID: {item.id}) to Telegram: {response.status_code}'
-                        )
-                except Exception as e:
-                    error_count += 1
-                    error_message = f"Error sending item {item.id} to Telegram: {str(e)}"
-                    error_messages.append(error_message)
-                    logger.error(error_message)
-                    logger.error(traceback.format_exc())
-                    
-                    # Log activity
-                    ActivityLog.objects.create(
-                        user=request.user,
-                        action='send_exp_to_telegram',
-                        status='error',
-                        notes=f'Error sending expiry notification for {item.name} (ID: {item.id}) to Telegram: {str(e)}'
-                    )
+                blocks.append(message)
             
-            # Return response
-            if success_count > 0 and error_count == 0:
-                return JsonResponse({
-                    'status': 'success',
-                    'message': f'Successfully sent {success_count} item(s) to Telegram'
-                })
-            elif success_count > 0 and error_count > 0:
-                return JsonResponse({
-                    'status': 'partial',
-                    'message': f'Sent {success_count} item(s) to Telegram, but failed to send {error_count} item(s)',
-                    'errors': error_messages
-                })
-            else:
-                return JsonResponse({
-                    'status': 'error',
-                    'message': f'Failed to send all {error_count} item(s) to Telegram',
-                    'errors': error_messages
-                }, status=500)
+            if not blocks:
+                return JsonResponse({'status': 'error', 'message': 'No items found'})
+            
+            # Format payload according to Zapier/Telegram requirements
+            batch, count = enqueue_packed(
+                'data_exp_produk', webhook_url, request.user, 'send_exp_to_telegram', blocks,
+                f'expiry notification for {len(blocks)} items', header="📦 Produk Expired:\n", separator="\n",
+                chat_id='@your_channel',  # This might be needed for Telegram API
+                parse_mode='Markdown'
+            )
+            return JsonResponse(queued_response_data(batch, count))
             
         except Exception as e:
             logger.error(f"Error in send_exp_to_telegram view: {str(e)}")
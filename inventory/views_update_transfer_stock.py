@@ -6,6 +6,7 @@ import json
 import logging
 import traceback
 from .models import Item, ActivityLog
+from .webhooks import enqueue_packed, queued_response_data
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -157,18 +158,21 @@ def send_transfer_to_telegram(request):
             from datetime import datetime
             current_time = datetime.now().strftime("%H:%M - %d/%m/%Y")
             
-            # Format message in plain text (not JSON)
-            message = f"Transfer Stok: {current_time}\n"
-            message += f"Asal: {asal}\n"
-            message += f"Tujuan: {tujuan}\n\n"
+            # Format message in plain text (not JSON); the header and footer
+            # are repeated in every message when the items need several
+            header = f"Transfer Stok: {current_time}\n"
+            header += f"Asal: {asal}\n"
+            header += f"Tujuan: {tujuan}\n\n"
             
             # Add items
-            for item in items:
-                if item.transfer_stock:
-                    message += f"- {item.name}: {item.transfer_stock} Pcs\n"
+            blocks = [
+                f"- {item.name}: {item.transfer_stock} Pcs\n"
+                for item in items
+                if item.transfer_stock
+            ]
             
             # Add footer note
-            message += "\nTanpa konfirmasi - Cek Harga Dasar"
+            footer = "\nTanpa konfirmasi - Cek Harga Dasar"
             
             # Get webhook settings
             from .models import WebhookSettings
@@ -179,56 +183,13 @@ def send_transfer_to_telegram(request):
                 logger.error("Webhook URL for transfer stok not configured")
                 return JsonResponse({'status': 'error', 'message': 'Webhook URL not configured'})
             
-            # Send to webhook as plain text
-            import requests
-            try:
-                # Send as JSON with text field, not as plain text
-                response = requests.post(
-                    webhook_url,
-                    json={'text': message},
-                    headers={'Content-Type': 'application/json'},
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Successfully sent transfer notification to webhook")
-                    
-                    # Log activity
-                    ActivityLog.objects.create(
-                        user=request.user,
-                        action='send_transfer_to_telegram',
-                        status='success',
-                        notes=f'Sent transfer notification for {len(items)} items to Telegram'
-                    )
-                    
-                    return JsonResponse({'status': 'success', 'message': 'Notification sent to Telegram'})
-                else:
-                    error_message = f"Failed to send transfer notification: {response.status_code} {response.text}"
-                    logger.error(error_message)
-                    
-                    # Log activity
-                    ActivityLog.objects.create(
-                        user=request.user,
-                        action='send_transfer_to_telegram',
-                        status='error',
-                        notes=f'Failed to send transfer notification: {response.status_code}'
-                    )
-                    
-                    return JsonResponse({'status': 'error', 'message': error_message})
-            except Exception as e:
-                error_message = f"Error sending transfer notification: {str(e)}"
-                logger.error(error_message)
-                logger.error(traceback.format_exc())
-                
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='send_transfer_to_telegram',
-                    status='error',
-                    notes=f'Error sending transfer notification: {str(e)}'
-                )
-                
-                return JsonResponse({'status': 'error', 'message': error_message})
+            # Queue the messages (sent as JSON with a text field); the
+            # webhook worker sends them
+            batch, count = enqueue_packed(
+                'transfer_stok', webhook_url, request.user, 'send_transfer_to_telegram', blocks,
+                f'transfer notification for {len(items)} items', header=header, footer=footer
+            )
+            return JsonResponse(queued_response_data(batch, count))
             
         except Exception as e:
             logger.error(f"Error in send_transfer_to_telegram view: {str(e)}")
@@ -2,13 +2,18 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 import os
 import pandas as pd
 import logging
 import traceback
-from datetime import datetime
+from datetime import date, datetime
 from .models import Item, ActivityLog, UploadHistory
+from .readers import XlsxBatchReader, ImportMetrics
+from .importer import bulk_update_rows, IMPORT_BATCH_SIZE
+from .fingerprints import stock_fingerprints
+from .validation import text_column, MAX_STOCK
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -41,9 +46,6 @@ def upload_exp_produk_file(request):
                 for chunk in exp_produk_file.chunks():
                     destination.write(chunk)
             
-            # Read Excel file
-            df = pd.read_excel(file_path)
-            
             # Map common column name variations to expected names
             column_mapping = {
                 'Kode': 'Kode Barang',
@@ -61,14 +63,15 @@ def upload_exp_produk_file(request):
                 'Tgl Expired': 'Tanggal Expired'
             }
             
-            # Rename columns based on mapping
-            df = df.rename(columns=lambda x: column_mapping.get(x, x))
+            # Stream the Excel file in batches, renaming columns based on mapping
+            reader = XlsxBatchReader(file_path, column_mapping=column_mapping)
             
             # Check required columns
             required_columns = ['Kode Barang', 'Nama Barang', 'Total Stok']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = [col for col in required_columns if col not in reader.columns]
             
             if missing_columns:
+                reader.close()
                 messages.error(request, f'Kolom yang diperlukan tidak ditemukan: {", ".join(missing_columns)}')
                 return redirect('inventory:upload_file')
             
@@ -76,80 +79,23 @@ def upload_exp_produk_file(request):
             success_count = 0
             error_count = 0
             
-            for _, row in df.iterrows():
-                try:
-                    # Extract data
-                    code = str(row['Kode Barang']).strip()
-                    name = str(row['Nama Barang']).strip()
-                    stock = int(row['Total Stok'])
-                    
-                    # Handle expiry date
-                    expiry_date = None
-                    if 'Tanggal Expired' in df.columns and pd.notna(row['Tanggal Expired']):
-                        if isinstance(row['Tanggal Expired'], str):
-                            try:
-                                expiry_date = datetime.strptime(row['Tanggal Expired'], '%Y-%m-%d').date()
-                            except ValueError:
-                                try:
-                                    expiry_date = datetime.strptime(row['Tanggal Expired'], '%d/%m/%Y').date()
-                                except ValueError:
-                                    # If date parsing fails, log and continue
-                                    logger.warning(f"Could not parse date: {row['Tanggal Expired']} for item {code}")
-                        else:
-                            # Pandas might have already parsed it as datetime
-                            expiry_date = row['Tanggal Expired'].date() if hasattr(row['Tanggal Expired'], 'date') else row['Tanggal Expired']
-                    
-                    # Check if item exists
-                    try:
-                        # First try to find by code with expiry date
-                        item = Item.objects.get(code=code, expiry_date__isnull=False)
-                        
-                        # Update existing item
-                        item.name = name
-                        item.current_stock = stock
-                        item.expiry_date = expiry_date
-                        item.save()
-                        
-                    except Item.DoesNotExist:
-                        # Item doesn't exist with expiry date, check if it exists without expiry date
-                        try:
-                            # If item exists without expiry date, create a new one with expiry date
-                            # This ensures we don't modify the original item used in Kelola Stok Barang
-                            existing_item = Item.objects.get(code=code, expiry_date__isnull=True)
-                            
-                            # Create new item with same code but with expiry date
-                            Item.objects.create(
-                                code=code,
-                                name=name,
-                                category=existing_item.category,  # Use category from existing item
-                                current_stock=stock,
-                                selling_price=existing_item.selling_price,  # Use price from existing item
-                                expiry_date=expiry_date
-                            )
-                            
-                        except Item.DoesNotExist:
-                            # Item doesn't exist at all, create new
-                            Item.objects.create(
-                                code=code,
-                                name=name,
-                                category="Tidak Dikategorikan",  # Default category
-                                current_stock=stock,
-                                selling_price=0,  # Default price
-                                expiry_date=expiry_date
-                            )
-                    
-                    success_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing row for item {code if 'code' in locals() else 'unknown'}: {str(e)}")
-                    error_count += 1
+            metrics = ImportMetrics()
+            # One query for every code, instead of up to three per row
+            items = load_exp_produk_items()
+            for df in reader:
+                batch_success, batch_errors = process_exp_produk_frame(df, items)
+                success_count += batch_success
+                error_count += batch_errors
+                metrics.add_rows(len(df))
+            metrics.finish()
+            logger.info(f"Upload {exp_produk_file.name}: {metrics.summary()}")
             
             # Log activity
             ActivityLog.objects.create(
                 user=request.user,
                 action='upload_exp_produk_file',
                 status='success',
-                notes=f'Uploaded exp produk file: {exp_produk_file.name} ({success_count} items processed, {error_count} errors)'
+                notes=f'Uploaded exp produk file: {exp_produk_file.name} ({success_count} items processed, {error_count} errors). {metrics.summary()}'
             )
             
             # Create upload history
@@ -179,3 +125,134 @@ def upload_exp_produk_file(request):
             messages.error(request, f'Terjadi kesalahan: {str(e)}')
     
     return redirect('inventory:upload_file')
+
+
+# Formats accepted for 'Tanggal Expired' text cells, tried in order
+EXPIRY_DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+
+# Fields written for items that already have an expiry date
+EXP_UPDATE_FIELDS = ['name', 'current_stock', 'expiry_date', 'import_fingerprint', 'updated_at']
+
+
+def load_exp_produk_items():
+    """
+    Map of item code -> (id, has expiry date, category, selling price)
+    for every item, loaded with a single query
+    """
+    return {
+        code: (pk, expiry_date is not None, category, selling_price)
+        for code, pk, expiry_date, category, selling_price in Item.objects.values_list(
+            'code', 'id', 'expiry_date', 'category', 'selling_price'
+        ).iterator(chunk_size=10000)
+    }
+
+
+def parse_expiry_dates(column):
+    """
+    Parse a whole 'Tanggal Expired' column in one pass.
+
+    Date cells come from the reader as datetimes, text cells are tried
+    against EXPIRY_DATE_FORMATS. Returns a datetime Series with NaT for
+    empty or unparseable cells.
+    """
+    is_date = column.map(lambda value: isinstance(value, (date, datetime)))
+    is_text = column.map(lambda value: isinstance(value, str))
+    parsed = pd.to_datetime(column.where(is_date), errors='coerce')
+    text = column.astype(object).where(is_text).str.strip()
+    for date_format in EXPIRY_DATE_FORMATS:
+        parsed = parsed.fillna(pd.to_datetime(text, format=date_format, errors='coerce'))
+    return parsed
+
+
+def process_exp_produk_frame(df, items):
+    """
+    Apply one batch of the Data Exp Produk upload with bulk writes.
+
+    Items that already have an expiry date get the new name, stock and
+    expiry date; unknown codes are created with a default category and
+    price. A code that already exists without an expiry date is counted as
+    an error: it belongs to Kelola Stok Barang and item codes are unique.
+
+    Args:
+        df (DataFrame): One batch from the reader, with mapped column names
+        items (dict): Result of load_exp_produk_items(), updated in place
+
+    Returns:
+        tuple: (success_count, error_count)
+    """
+    code = text_column(df['Kode Barang'])
+    name = text_column(df['Nama Barang'])
+    stock = pd.to_numeric(df['Total Stok'], errors='coerce')
+    if 'Tanggal Expired' in df.columns:
+        expiry = parse_expiry_dates(df['Tanggal Expired'])
+        unparsed = df['Tanggal Expired'].notna() & expiry.isna()
+        if unparsed.any():
+            logger.warning(f"Could not parse {int(unparsed.sum())} expiry dates, e.g. {df['Tanggal Expired'][unparsed].iloc[0]}")
+    else:
+        expiry = pd.Series(pd.NaT, index=df.index)
+
+    # Rows that cannot be stored would fail the whole batch's transaction
+    invalid = (
+        (code == '')
+        | (code.str.len() > Item._meta.get_field('code').max_length)
+        | stock.isna()
+        | (stock.abs() > MAX_STOCK)
+    )
+    frame = pd.DataFrame({
+        'code': code,
+        'name': name,
+        'current_stock': stock,
+        'expiry_date': expiry,
+    })[~invalid]
+    # Rows were applied one after the other before, so the last row wins
+    frame = frame.drop_duplicates(subset='code', keep='last').copy()
+    frame['current_stock'] = frame['current_stock'].astype('int64')
+
+    known = [items.get(value) for value in frame['code']]
+    has_item = pd.Series([entry is not None for entry in known], index=frame.index)
+    has_expiry = pd.Series([entry is not None and entry[1] for entry in known], index=frame.index)
+    blocked = has_item & ~has_expiry
+    if blocked.any():
+        logger.warning(f"{int(blocked.sum())} codes already exist without an expiry date, skipped")
+
+    frame['category'] = [entry[2] if entry else 'Tidak Dikategorikan' for entry in known]
+    frame['selling_price'] = [float(entry[3]) if entry else 0.0 for entry in known]
+    frame['fingerprint'] = stock_fingerprints(frame)
+    now = timezone.now()
+
+    to_update = [
+        (items[row.code][0], row.name, int(row.current_stock), _to_date(row.expiry_date), int(row.fingerprint), now)
+        for row in frame[has_expiry].itertuples(index=False)
+    ]
+    to_create = [
+        Item(
+            code=row.code,
+            name=row.name,
+            category=row.category,
+            current_stock=int(row.current_stock),
+            selling_price=0,
+            expiry_date=_to_date(row.expiry_date),
+            import_fingerprint=int(row.fingerprint),
+        )
+        for row in frame[~has_item].itertuples(index=False)
+    ]
+
+    with transaction.atomic():
+        if to_update:
+            bulk_update_rows(to_update, EXP_UPDATE_FIELDS)
+        if to_create:
+            Item.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+
+    # Later batches see this batch's writes like the old per-row lookups did
+    for row in frame[has_expiry].itertuples(index=False):
+        pk, _, category, selling_price = items[row.code]
+        items[row.code] = (pk, not pd.isna(row.expiry_date), category, selling_price)
+    for item in to_create:
+        items[item.code] = (item.pk, item.expiry_date is not None, item.category, item.selling_price)
+
+    error_count = int(invalid.sum()) + int(blocked.sum())
+    return len(df) - error_count, error_count
+
+
+def _to_date(value):
+    return None if pd.isna(value) else value.date()
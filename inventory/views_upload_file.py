@@ -1,13 +1,21 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db import transaction
+from django.http import JsonResponse, FileResponse, Http404
+from django.urls import reverse
 import pandas as pd
+import json
 import logging
+import tempfile
 import traceback
-from .models import Item, ActivityLog
+from .models import ActivityLog, ImportJob
 from .forms import ExcelUploadForm
+from .importer import StockImporter, STOCK_COLUMNS
+from .readers import detect_format, open_batch_reader
+from .import_jobs import enqueue_import, apply_preview
+from .preview import PREVIEW_KINDS, page_samples
+from .utils import is_admin
+from .validation import reject_csv_to_xlsx
 from .views_timezone import get_localized_time, format_datetime
 
 # Configure logging
@@ -24,36 +32,40 @@ def upload_file(request):
         if form.is_valid():
             excel_file = request.FILES['excel_file']
             
-            # Check file extension
-            if not excel_file.name.endswith('.xlsx'):
-                messages.error(request, 'Format file tidak valid. Harap upload file Excel (.xlsx)')
+            # Check the file format from its content, not its name
+            file_format, _ = detect_format(excel_file)
+            if file_format is None:
+                messages.error(request, 'Format file tidak valid. Harap upload file Excel (.xlsx), CSV, TSV atau Parquet')
                 return redirect('inventory:upload_file')
             
             try:
-                # Read Excel file
-                df = pd.read_excel(excel_file)
+                # Only the header is read here; the rows are imported by the
+                # run_import_worker command so large files do not block the request
+                reader = open_batch_reader(excel_file)
+                reader.close()
                 
                 # Validate required columns
-                required_columns = ['Kode', 'Nama Barang', 'Kategori', 'Harga Jual', 'Total Stok']
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                missing_columns = [col for col in STOCK_COLUMNS if col not in reader.columns]
                 
                 if missing_columns:
                     messages.error(request, f'Kolom yang diperlukan tidak ditemukan: {", ".join(missing_columns)}')
                     return redirect('inventory:upload_file')
                 
-                # Process data and distribute to models
-                success_count, error_count = process_excel_data(df, request.user)
+                # Store the file and queue it for the import worker; a
+                # preview only parses, validates and diffs it
+                mode = 'preview' if form.cleaned_data.get('preview') else 'import'
+                job = enqueue_import(excel_file, request.user, mode=mode)
+                logger.info(f"Queued {mode} job {job.pk} for {excel_file.name}")
                 
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='upload_file',
-                    status='success',
-                    notes=f'File {excel_file.name} berhasil diupload. {success_count} item berhasil, {error_count} item gagal'
-                )
+                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                    return JsonResponse({
+                        'status': 'success',
+                        'job_id': job.pk,
+                        'status_url': reverse('inventory:import_job_status', args=[job.pk])
+                    })
                 
-                messages.success(request, f'File berhasil diupload. {success_count} item berhasil diperbarui, {error_count} item gagal')
-                return redirect('inventory:upload_file')
+                messages.info(request, f'File {excel_file.name} sedang diproses. Progres dapat dilihat di bawah.')
+                return redirect(f"{reverse('inventory:upload_file')}?job={job.pk}")
                 
             except Exception as e:
                 logger.error(f"Error in upload_file view: {str(e)}")
@@ -72,77 +84,164 @@ def upload_file(request):
     else:
         form = ExcelUploadForm()
     
-    return render(request, 'inventory/upload_file.html', {'form': form})
+    # Show the requested job, or the user's latest unfinished one
+    job_id = request.GET.get('job')
+    if job_id and job_id.isdigit():
+        job = _visible_jobs(request.user).filter(pk=job_id).first()
+    else:
+        job = ImportJob.objects.filter(user=request.user, status__in=['pending', 'running']).first()
+    
+    return render(request, 'inventory/upload_file.html', {'form': form, 'job': job})
 
-def process_excel_data(df, user):
+@login_required
+@user_passes_test(lambda u: not u.profile.is_staff_gudang)
+def import_job_status(request, job_id):
+    """
+    API endpoint polled by the upload page for import job progress
+    """
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id)
+    
+    return JsonResponse({
+        'status': 'success',
+        'job': {
+            'id': job.pk,
+            'mode': job.mode,
+            'filename': job.filename,
+            'state': job.status,
+            'state_display': job.get_status_display(),
+            'total_rows': job.total_rows,
+            'rows_done': job.rows_done,
+            'success_count': job.success_count,
+            'error_count': job.error_count,
+            'created_count': job.created_count,
+            'changed_count': job.changed_count,
+            'unchanged_count': job.unchanged_count,
+            'progress_percent': job.progress_percent,
+            'eta_seconds': job.eta_seconds,
+            'message': job.message or '',
+            'rejects_url': reverse('inventory:download_import_rejects', args=[job.pk]) if job.has_rejects else None,
+            'preview_counts': job.preview['counts'] if job.mode == 'preview' and job.preview else None,
+            # Only the uploader gets the token that applies the preview
+            'preview_token': job.preview_token if job.user_id == request.user.pk else '',
+        }
+    })
+
+@login_required
+@user_passes_test(lambda u: not u.profile.is_staff_gudang)
+def import_job_preview(request, job_id):
+    """
+    API endpoint for one page of preview sample rows of a kind
+    (new, stock, price, other or unchanged)
+    """
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id)
+    if not job.preview:
+        return JsonResponse({'status': 'error', 'message': 'Pratinjau belum tersedia'}, status=404)
+    
+    kind = request.GET.get('kind', 'new')
+    if kind not in PREVIEW_KINDS:
+        return JsonResponse({'status': 'error', 'message': f'Jenis pratinjau tidak valid: {kind}'}, status=400)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    
+    return JsonResponse({
+        'status': 'success',
+        'counts': job.preview['counts'],
+        **page_samples(job.preview, kind, page),
+    })
+
+@login_required
+@user_passes_test(lambda u: not u.profile.is_staff_gudang)
+def commit_import_preview(request, job_id):
+    """
+    API endpoint that applies exactly the previewed diff of a job, using the
+    token returned with the preview
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Method not allowed'}, status=405)
+    
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id)
+    try:
+        token = json.loads(request.body or '{}').get('token')
+    except ValueError:
+        token = None
+    
+    error = apply_preview(job, token)
+    if error:
+        return JsonResponse({'status': 'error', 'message': error}, status=400)
+    
+    logger.info(f"User {request.user.username} applied preview job {job.pk}")
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Perubahan sedang diterapkan',
+        'status_url': reverse('inventory:import_job_status', args=[job.pk])
+    })
+
+@login_required
+@user_passes_test(lambda u: not u.profile.is_staff_gudang)
+def download_import_rejects(request, job_id):
+    """
+    Download the rows rejected by an import job with the reason for each
+    row, as CSV (default) or XLSX (?format=xlsx)
+    """
+    job = get_object_or_404(_visible_jobs(request.user), pk=job_id)
+    if not job.has_rejects:
+        raise Http404('Tidak ada baris yang ditolak')
+    
+    base_name = f"ditolak_{job.filename.rsplit('.', 1)[0]}"
+    if request.GET.get('format') == 'xlsx':
+        # Deleted automatically when the response closes it
+        output = tempfile.TemporaryFile()
+        reject_csv_to_xlsx(job.reject_file, output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{base_name}.xlsx')
+    
+    return FileResponse(open(job.reject_file, 'rb'), as_attachment=True, filename=f'{base_name}.csv')
+
+def process_excel_data(df, user, metrics=None):
     """
     Process Excel data and distribute to multiple models
     
+    Rows are written in bulk by StockImporter: existing codes are loaded
+    once, rows are split into creates and updates, rows whose fingerprint
+    did not change are skipped, and each chunk is committed in its own
+    transaction. Manual fields (minimum_stock,
+    expiry_date, latest_price) are preserved on existing items.
+    
     Args:
-        df (DataFrame): Pandas DataFrame containing Excel data
+        df (DataFrame): Pandas DataFrame containing Excel data, or an
+            iterable of DataFrames such as a reader from open_batch_reader()
         user (User): User who uploaded the file
+        metrics (ImportMetrics): Optional metrics updated per batch
         
     Returns:
         tuple: (success_count, error_count)
     """
-    success_count = 0
-    error_count = 0
+    importer = StockImporter(user=user)
+    batches = [df] if isinstance(df, pd.DataFrame) else df
+    importer.import_batches(batches, metrics=metrics)
     
-    # Process each row
-    for index, row in df.iterrows():
-        try:
-            with transaction.atomic():
-                # Check if item exists
-                try:
-                    item = Item.objects.get(code=row['Kode'])
-                    created = False
-                    
-                    # Update only fields from Excel, preserve manual fields
-                    item.name = row['Nama Barang']
-                    item.category = row['Kategori']
-                    item.current_stock = row['Total Stok']
-                    item.selling_price = row['Harga Jual']
-                    # Do NOT update: minimum_stock, expiry_date, latest_price
-                    item.save()
-                    
-                except Item.DoesNotExist:
-                    # Create new item if it doesn't exist
-                    item = Item.objects.create(
-                        code=row['Kode'],
-                        name=row['Nama Barang'],
-                        category=row['Kategori'],
-                        current_stock=row['Total Stok'],
-                        selling_price=row['Harga Jual'],
-                        # Initialize manual fields with defaults
-                        minimum_stock=0,
-                        latest_price=None,
-                        expiry_date=None
-                    )
-                    created = True
-                
-                # Log activity
-                action = 'create_item' if created else 'update_item'
-                ActivityLog.objects.create(
-                    user=user,
-                    action=action,
-                    status='success',
-                    notes=f'{"Membuat" if created else "Memperbarui"} item {item.code} - {item.name}'
-                )
-                
-                success_count += 1
-                
-        except Exception as e:
-            logger.error(f"Error processing row {index}: {str(e)}")
-            logger.error(traceback.format_exc())
-            
-            # Log activity
-            ActivityLog.objects.create(
-                user=user,
-                action='process_excel_row',
-                status='failed',
-                notes=f'Gagal memproses baris {index}: {str(e)}'
-            )
-            
-            error_count += 1
+    logger.info(
+        f"Stock import finished: {importer.created_count} created, "
+        f"{importer.changed_count} changed, {importer.unchanged_count} unchanged, "
+        f"{importer.error_count} failed"
+    )
+    
+    # One summary entry instead of one log row per imported item
+    ActivityLog.objects.create(
+        user=user,
+        action='import_items',
+        status='success' if importer.error_count == 0 else 'failed',
+        notes=f'Membuat {importer.created_count} item, memperbarui {importer.changed_count} item, {importer.unchanged_count} item tidak berubah, {importer.error_count} baris gagal'
+    )
     
-    return success_count, error_count
+    return importer.success_count, importer.error_count
+
+def _visible_jobs(user):
+    """
+    Import jobs `user` may follow: their own, or every job for admins
+    """
+    if is_admin(user):
+        return ImportJob.objects.all()
+    return ImportJob.objects.filter(user=user)
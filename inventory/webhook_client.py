@@ -0,0 +1,101 @@
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urlunsplit
+import logging
+import requests
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a connection to the webhook host, and for its answer
+WEBHOOK_CONNECT_TIMEOUT = 5
+WEBHOOK_READ_TIMEOUT = 10
+
+# Open connections kept per host. The webhook worker sends up to
+# --concurrency messages at a time; above this, extra connections are
+# opened and closed per message.
+WEBHOOK_POOL_SIZE = 10
+
+
+class WebhookClient:
+    """
+    HTTP client used for every webhook call. One requests session keeps the
+    connections to each host open, so after the first message a send costs
+    one round trip instead of DNS, TCP and TLS setup every time.
+
+    `transport` is the requests adapter that sends the requests (by default
+    a pooled HTTPAdapter); LocalTransport points the client at a local
+    stand-in server.
+    """
+
+    def __init__(self, transport=None, connect_timeout=WEBHOOK_CONNECT_TIMEOUT, read_timeout=WEBHOOK_READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.mount(transport or HTTPAdapter(pool_connections=WEBHOOK_POOL_SIZE, pool_maxsize=WEBHOOK_POOL_SIZE))
+
+    def mount(self, transport):
+        """
+        Send all http and https requests through `transport`
+        """
+        self.transport = transport
+        for prefix in ('http://', 'https://'):
+            self.session.mount(prefix, transport)
+
+    def post_json(self, url, payload):
+        """
+        POST `payload` as JSON, raising requests' exceptions on connection
+        errors and timeouts
+        """
+        return self.session.post(url, json=payload, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class LocalTransport(HTTPAdapter):
+    """
+    Transport sending every request to `base_url` (e.g.
+    http://127.0.0.1:8765) instead of its own host, keeping the path and
+    query, so senders can be run against a local stand-in server
+    """
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = urlsplit(base_url)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = urlunsplit((self.base_url.scheme, self.base_url.netloc, url.path, url.query, url.fragment))
+        return super().send(request, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The process-wide webhook client, created on first use. With the
+    WEBHOOK_LOCAL_URL setting, requests go to that server instead.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                local_url = getattr(settings, 'WEBHOOK_LOCAL_URL', None)
+                if local_url:
+                    logger.info(f"Sending webhooks to local server {local_url}")
+                _client = WebhookClient(LocalTransport(local_url) if local_url else None)
+    return _client
+
+
+def set_transport(transport):
+    """
+    Replace the transport of the process-wide client and return the previous
+    one, e.g. to send to a stand-in server in a test
+    """
+    client = get_client()
+    previous = client.transport
+    client.mount(transport)
+    return previous
@@ -0,0 +1,168 @@
+from django.core.cache import cache
+from django.utils import timezone
+from email.utils import parsedate_to_datetime
+import hashlib
+import logging
+import random
+import time
+from .models import WebhookRateLimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Attempts per message before it is marked failed
+DELIVERY_MAX_ATTEMPTS = 5
+
+# Wait before the n-th retry: a random time up to
+# RETRY_BASE_DELAY * 2 ** (n - 1) seconds, at most RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 300
+
+# A message still waiting for a URL that stays down is failed after this
+# long
+DELIVERY_MAX_AGE = 24 * 60 * 60
+
+# Consecutive failures after which a URL is considered down, and seconds
+# before one message is sent again to check whether it is back
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_OPEN_SECONDS = 60
+
+# Failures further apart than this do not count as in a row
+BREAKER_FAILURE_WINDOW = 10 * 60
+
+# Longest a breaker check may take; a check that did not finish by then
+# (its worker died) no longer blocks the next one
+BREAKER_PROBE_SECONDS = 30
+
+# Messages per minute sent to each channel, and how many may go at once
+# after a quiet period. Telegram allows a bot about 20 messages per minute
+# in a group.
+RATE_LIMIT_PER_MINUTE = 20
+RATE_LIMIT_BURST = 5
+
+# HTTP answers that may succeed when sent again; other errors are final
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def retry_delay(attempts, retry_after=None):
+    """
+    Seconds to wait before sending again a message that failed `attempts`
+    times: exponential backoff with full jitter, so messages failed together
+    do not come back together, but never less than the webhook asked for in
+    `retry_after`
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def retry_after(response):
+    """
+    Seconds a 429 (or 503) answer asks to wait, from Telegram's
+    parameters.retry_after or the Retry-After header, or None
+    """
+    try:
+        seconds = response.json()['parameters']['retry_after']
+        return max(0, float(seconds))
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    header = response.headers.get('Retry-After')
+    if not header:
+        return None
+    try:
+        return max(0, float(header))
+    except ValueError:
+        pass
+    try:
+        return max(0, parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Failure state of one webhook URL, kept in the shared cache so that all
+    web and worker processes see it.
+
+    Closed: messages are sent. After BREAKER_FAILURE_THRESHOLD failures in a
+    row it opens: messages are not sent for BREAKER_OPEN_SECONDS. Then one
+    message at a time is let through as a check; a success closes the
+    breaker and a failure opens it again.
+    """
+
+    def __init__(self, url):
+        key = hashlib.md5(url.encode()).hexdigest()
+        self.failures_key = f'webhook-breaker-failures:{key}'
+        self.open_key = f'webhook-breaker-open:{key}'
+        self.probe_key = f'webhook-breaker-probe:{key}'
+
+    def allow(self):
+        """
+        Whether a message may be sent now
+        """
+        if cache.get(self.open_key) is not None:
+            return False
+        if cache.get(self.failures_key, 0) < BREAKER_FAILURE_THRESHOLD:
+            return True
+        # Open time is over: only the process that adds the key sends a check
+        return cache.add(self.probe_key, True, BREAKER_PROBE_SECONDS)
+
+    def retry_in(self):
+        """
+        Seconds until messages may be sent again (0 when they may now)
+        """
+        opened_until = cache.get(self.open_key)
+        if opened_until is None:
+            return 0
+        return max(0, opened_until - time.time())
+
+    def record_success(self):
+        cache.delete_many([self.failures_key, self.open_key, self.probe_key])
+
+    def record_failure(self):
+        # Not atomic across processes: a lost count only opens the breaker
+        # one failure later
+        failures = cache.get(self.failures_key, 0) + 1
+        cache.set(self.failures_key, failures, BREAKER_FAILURE_WINDOW)
+        if failures >= BREAKER_FAILURE_THRESHOLD:
+            opened_until = time.time() + BREAKER_OPEN_SECONDS
+            cache.set(self.open_key, opened_until, BREAKER_OPEN_SECONDS)
+            cache.delete(self.probe_key)
+            logger.warning(f"Webhook URL down after {failures} failures, pausing for {BREAKER_OPEN_SECONDS}s")
+
+
+class TokenBucket:
+    """
+    Rate limit of one webhook channel, kept in a WebhookRateLimit row so it
+    holds across all worker processes. Tokens come back at
+    RATE_LIMIT_PER_MINUTE, up to RATE_LIMIT_BURST.
+    """
+
+    def __init__(self, channel, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST):
+        self.channel = channel
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    def reserve(self):
+        """
+        Take a token and return the seconds to wait before using it: 0 when
+        one is free, else the time the tokens reserved before it come in.
+        Messages thus queue in order instead of being refused.
+        """
+        while True:
+            now = timezone.now()
+            bucket, _ = WebhookRateLimit.objects.get_or_create(
+                channel=self.channel,
+                defaults={'tokens': self.burst, 'updated_at': now},
+            )
+            elapsed = max(0, (now - bucket.updated_at).total_seconds())
+            tokens = min(self.burst, bucket.tokens + elapsed * self.rate) - 1
+            # Compare-and-set on the values we read, so two processes never
+            # take the same token; on a conflict read again
+            if WebhookRateLimit.objects.filter(pk=bucket.pk, updated_at=bucket.updated_at).update(
+                tokens=tokens,
+                updated_at=now,
+            ):
+                return max(0, -tokens / self.rate)
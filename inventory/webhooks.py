@@ -0,0 +1,324 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import requests
+import uuid
+from .models import WebhookDelivery, ActivityLog
+from .webhook_client import get_client
+from .webhook_policy import (
+    CircuitBreaker, TokenBucket, DELIVERY_MAX_AGE, DELIVERY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_STATUSES,
+    retry_after, retry_delay,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A message still 'sending' after this long belongs to a dead worker and is
+# sent again
+DELIVERY_STALE_SECONDS = 120
+
+
+def enqueue_webhook(channel, url, user, action, messages):
+    """
+    Queue `messages`, a list of (payload, description) pairs, for the
+    webhook `url` and return their batch id.
+
+    Runs in the caller's transaction when there is one, so messages about
+    data written in the same transaction are only sent if it commits.
+    """
+    batch = uuid.uuid4()
+    with transaction.atomic():
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(
+                batch=batch,
+                user=user,
+                channel=channel,
+                url=url,
+                payload=payload,
+                action=action,
+                description=description[:255],
+            )
+            for payload, description in messages
+        ])
+    logger.info(f"Queued {len(messages)} {channel} webhook message(s) in batch {batch}")
+    return batch
+
+
+def enqueue_packed(channel, url, user, action, blocks, description, header='', footer='', separator='', **fields):
+    """
+    Queue `blocks` of text packed into as few Telegram messages as possible
+    (see pack_messages). `fields` are added to each payload next to 'text'.
+    Returns the batch id and the number of messages.
+    """
+    texts = pack_messages(blocks, header=header, footer=footer, separator=separator)
+    messages = []
+    for number, text in enumerate(texts, start=1):
+        part = f' ({number}/{len(texts)})' if len(texts) > 1 else ''
+        messages.append((dict(fields, text=text), f'{description}{part}'))
+    return enqueue_webhook(channel, url, user, action, messages), len(messages)
+
+
+def pack_messages(blocks, header='', footer='', separator='', limit=None):
+    """
+    Join `blocks` (one per item) into texts of at most `limit` characters
+    (TELEGRAM_MESSAGE_LIMIT by default), each starting with `header` and
+    ending with `footer`.
+
+    Blocks are kept whole, so an item is never split over two messages and
+    Markdown inside it stays balanced. Only a block too long for a message by
+    itself is split, on line ends where possible.
+    """
+    limit = limit or settings.TELEGRAM_MESSAGE_LIMIT
+    room = limit - message_size(header) - message_size(footer)
+    if room <= 0:
+        raise ValueError(f'Header and footer do not fit in a message of {limit} characters')
+
+    packed = []
+    parts, used = [], 0
+    for block in blocks:
+        for piece in _split_block(block, room):
+            size = message_size(piece)
+            if parts and used + message_size(separator) + size > room:
+                packed.append(parts)
+                parts, used = [], 0
+            if parts:
+                used += message_size(separator)
+            parts.append(piece)
+            used += size
+    if parts or not packed:
+        packed.append(parts)
+
+    texts = [header + separator.join(parts) + footer for parts in packed]
+    return [text for text in texts if text]
+
+
+def message_size(text):
+    """
+    Length of `text` as Telegram counts it, in UTF-16 code units: emoji and
+    other characters outside the BMP count twice
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _split_block(block, room):
+    """
+    `block` as pieces of at most `room`, cut after a newline where possible
+    """
+    if message_size(block) <= room:
+        return [block]
+
+    pieces, piece = [], ''
+    for line in block.splitlines(keepends=True):
+        while message_size(line) > room:
+            # A single line longer than a message: cut it by characters
+            if piece:
+                pieces.append(piece)
+                piece = ''
+            cut = max(1, _fit(line, room))
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if message_size(piece + line) > room:
+            pieces.append(piece)
+            piece = ''
+        piece += line
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+
+def _fit(text, room):
+    """
+    Number of leading characters of `text` that fit in `room`
+    """
+    used = 0
+    for index, char in enumerate(text):
+        used += message_size(char)
+        if used > room:
+            return index
+    return len(text)
+
+
+def queued_response_data(batch, count):
+    """
+    JSON answer of a sender once its messages are queued
+    """
+    return {
+        'status': 'success',
+        'message': f'{count} pesan masuk antrean pengiriman ke Telegram',
+        'batch': str(batch),
+        'status_url': reverse('inventory:webhook_delivery_status', args=[batch]),
+    }
+
+
+def batch_status(batch):
+    """
+    Message counts of a batch by status, or None for an unknown batch
+    """
+    counts = dict(
+        WebhookDelivery.objects.filter(batch=batch)
+        .values_list('status')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    total = sum(counts.values())
+    if not total:
+        return None
+    errors = list(
+        WebhookDelivery.objects.filter(batch=batch, status='failed')
+        .values_list('description', 'error')[:5]
+    )
+    return {
+        'batch': str(batch),
+        'total': total,
+        'pending': counts.get('pending', 0),
+        'sending': counts.get('sending', 0),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'done': counts.get('pending', 0) + counts.get('sending', 0) == 0,
+        'errors': [f'{description}: {error}' for description, error in errors],
+    }
+
+
+def claim_deliveries(limit):
+    """
+    Atomically take up to `limit` of the oldest queued messages that are due,
+    including messages left 'sending' by a dead worker
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=DELIVERY_STALE_SECONDS)
+    due = Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    candidates = WebhookDelivery.objects.filter(
+        Q(status='pending') & due | Q(status='sending', claimed_at__lt=stale_before)
+    ).order_by('created_at').values_list('pk', 'status', 'claimed_at')
+
+    claimed = []
+    for pk, status, claimed_at in candidates[:limit]:
+        # Compare-and-set on the values we read, so two workers never claim
+        # the same message
+        if WebhookDelivery.objects.filter(pk=pk, status=status, claimed_at=claimed_at).update(
+            status='sending',
+            claimed_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return list(WebhookDelivery.objects.filter(pk__in=claimed).order_by('created_at'))
+
+
+def release_deliveries(pks):
+    """
+    Put claimed messages that were not sent back in the queue, e.g. when the
+    worker is shutting down
+    """
+    WebhookDelivery.objects.filter(pk__in=pks, status='sending').update(status='pending', claimed_at=None)
+
+
+def deliver(delivery):
+    """
+    Post one claimed message and record the outcome: sent, queued again
+    after a backoff when the failure may pass, or failed.
+
+    A message waits, without using up an attempt, while the URL's circuit
+    breaker is open and for its place in the channel's rate limit. The
+    breaker is checked first, so messages for a URL that is down do not
+    use up the channel's tokens.
+    """
+    breaker = CircuitBreaker(delivery.url)
+    if breaker.retry_in():
+        return _wait_for_breaker(delivery, breaker)
+
+    if not delivery.slot_reserved:
+        wait = TokenBucket(delivery.channel).reserve()
+        # Kept until the message is posted, so it never takes a second one
+        delivery.slot_reserved = True
+        if wait > 0:
+            # Not an attempt: undo the count added by the claim
+            delivery.attempts -= 1
+            return _postpone(delivery, wait, 'rate limit')
+
+    if not breaker.allow():
+        # Another message is checking whether the URL is back
+        return _wait_for_breaker(delivery, breaker)
+    delivery.slot_reserved = False
+
+    response = None
+    try:
+        response = get_client().post_json(delivery.url, delivery.payload)
+        delivery.response_status = response.status_code
+        sent = 200 <= response.status_code < 300
+        retryable = response.status_code in RETRY_STATUSES
+        delivery.error = '' if sent else f'{response.status_code} {response.text[:500]}'
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        sent = False
+        retryable = True
+        delivery.error = str(e)
+    except requests.exceptions.RequestException as e:
+        # Invalid URL and the like: sending again will not help
+        sent = False
+        retryable = False
+        delivery.error = str(e)
+
+    # Any answer but a server error means the URL is up
+    if response is not None and response.status_code < 500 and response.status_code != 408:
+        breaker.record_success()
+    elif retryable:
+        breaker.record_failure()
+
+    if not sent and retryable and delivery.attempts < DELIVERY_MAX_ATTEMPTS and not _expired(delivery):
+        wait = retry_after(response) if response is not None and response.status_code in (429, 503) else None
+        return _postpone(delivery, retry_delay(delivery.attempts, wait), delivery.error)
+    return _finish(delivery, sent)
+
+
+def _wait_for_breaker(delivery, breaker):
+    delivery.attempts -= 1
+    if not delivery.error:
+        delivery.error = 'URL webhook sedang tidak dapat dihubungi'
+    return _postpone(delivery, breaker.retry_in() or RETRY_BASE_DELAY, 'webhook URL down')
+
+
+def _postpone(delivery, seconds, reason):
+    """
+    Queue a claimed message again to be sent in `seconds`, or fail it once
+    it has waited DELIVERY_MAX_AGE
+    """
+    if _expired(delivery):
+        return _finish(delivery, False)
+
+    delivery.status = 'pending'
+    delivery.claimed_at = None
+    delivery.next_attempt_at = timezone.now() + timedelta(seconds=seconds)
+    delivery.save(update_fields=['status', 'claimed_at', 'next_attempt_at', 'attempts', 'slot_reserved', 'response_status', 'error'])
+    logger.warning(f"Webhook delivery {delivery.pk} ({delivery.description}) postponed {seconds:.0f}s: {reason}")
+    return delivery
+
+
+def _expired(delivery):
+    return timezone.now() - delivery.created_at > timedelta(seconds=DELIVERY_MAX_AGE)
+
+
+def _finish(delivery, sent):
+    """
+    Record the final outcome of a message
+    """
+    delivery.status = 'sent' if sent else 'failed'
+    delivery.sent_at = timezone.now() if sent else None
+    delivery.next_attempt_at = None
+    delivery.save(update_fields=['status', 'response_status', 'error', 'sent_at', 'next_attempt_at', 'slot_reserved'])
+
+    if sent:
+        logger.info(f"Sent webhook delivery {delivery.pk} ({delivery.description})")
+        notes = f'Sent {delivery.description} to Telegram'
+    else:
+        logger.error(f"Failed to send webhook delivery {delivery.pk} ({delivery.description}) after {delivery.attempts} attempt(s): {delivery.error}")
+        notes = f'Failed to send {delivery.description} to Telegram: {delivery.error}'
+    ActivityLog.objects.create(
+        user_id=delivery.user_id,
+        action=delivery.action,
+        status='success' if sent else 'failed',
+        notes=notes
+    )
+    return delivery
@@ -96,3 +96,74 @@ document.addEventListener('DOMContentLoaded', function() {
         checkLowStock();
     }
 });
+
+// Follow queued Telegram messages (the status_url of a send response) and
+// show the outcome in a toast once the webhook worker has sent them
+const DELIVERY_POLL_INTERVAL = 2000;
+const DELIVERY_POLL_LIMIT = 5 * 60 * 1000;
+
+function watchDelivery(data) {
+    if (!data || !data.status_url) {
+        return;
+    }
+    const started = Date.now();
+    const poll = () => {
+        fetch(data.status_url, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(result => {
+                if (result.status !== 'success') {
+                    return;
+                }
+                const delivery = result.delivery;
+                if (!delivery.done) {
+                    if (Date.now() - started < DELIVERY_POLL_LIMIT) {
+                        setTimeout(poll, DELIVERY_POLL_INTERVAL);
+                    } else {
+                        showDeliveryToast(`${delivery.pending + delivery.sending} pesan masih dalam antrean pengiriman`, 'warning');
+                    }
+                    return;
+                }
+                if (delivery.failed) {
+                    showDeliveryToast(`${delivery.failed} dari ${delivery.total} pesan gagal dikirim ke Telegram`, 'danger', delivery.errors);
+                } else {
+                    showDeliveryToast(`${delivery.sent} pesan terkirim ke Telegram`, 'success');
+                }
+            })
+            .catch(error => console.error('Error checking Telegram delivery:', error));
+    };
+    setTimeout(poll, DELIVERY_POLL_INTERVAL);
+}
+
+function showDeliveryToast(text, color, details) {
+    let container = document.getElementById('deliveryToasts');
+    if (!container) {
+        container = document.createElement('div');
+        container.id = 'deliveryToasts';
+        container.className = 'toast-container position-fixed bottom-0 end-0 p-3';
+        container.style.zIndex = 1100;
+        document.body.appendChild(container);
+    }
+    const toast = document.createElement('div');
+    toast.className = `toast align-items-center border-0 bg-${color} ${color === 'warning' ? 'text-dark' : 'text-white'}`;
+    toast.setAttribute('role', 'alert');
+    const body = document.createElement('div');
+    body.className = 'toast-body';
+    body.textContent = text;
+    (details || []).forEach(detail => {
+        const line = document.createElement('div');
+        line.className = 'small';
+        line.textContent = detail;
+        body.appendChild(line);
+    });
+    const wrapper = document.createElement('div');
+    wrapper.className = 'd-flex';
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close btn-close-white me-2 m-auto';
+    close.setAttribute('data-bs-dismiss', 'toast');
+    wrapper.append(body, close);
+    toast.appendChild(wrapper);
+    container.appendChild(toast);
+    toast.addEventListener('hidden.bs.toast', () => toast.remove());
+    new bootstrap.Toast(toast, { delay: 8000 }).show();
+}
@@ -0,0 +1,305 @@
+// Virtual scroller for the item tables
+//
+// Rows are loaded from the columnar item table endpoint and only the rows in
+// view (plus a margin) exist in the DOM. Row markup comes from a renderRow
+// function of the page, so the page's delegated click handlers keep working.
+//
+// Rows the user touched (checked, edited, saved) are kept rather than
+// re-rendered from the loaded data: out of view they move to a hidden tbody,
+// where "checked" lookups such as the bulk Telegram buttons still find them.
+
+class VirtualTable {
+    constructor(options) {
+        this.tbody = options.tbody;
+        this.table = this.tbody.closest('table');
+        this.scroller = options.scroller;
+        this.url = options.url;
+        this.renderRow = options.renderRow;
+        this.onRowsRendered = options.onRowsRendered || function() {};
+        this.status = options.status || null;
+        this.emptyText = options.emptyText || 'Tidak ada data barang';
+        this.rowHeight = options.rowHeight || 48;
+        this.overscan = options.overscan || 10;
+
+        this.fields = [];
+        this.columns = {};
+        this.length = 0;
+        this.index = [];           // positions of the rows shown, in order
+        this.filter = null;
+        this.deleted = new Set();  // ids removed by the page (e.g. delete item)
+        this.mounted = new Map();  // id -> tr in the visible window
+        this.kept = new Map();     // id -> tr kept out of view
+        this.loading = true;
+        this.measured = false;
+        this.frame = null;
+
+        this.columnCount = this.table.querySelectorAll('thead th').length;
+        this.stash = document.createElement('tbody');
+        this.stash.className = 'd-none virtual-stash';
+        this.table.appendChild(this.stash);
+
+        this.scroller.classList.add('virtual-scroll');
+        this.scroller.addEventListener('scroll', () => this.schedule());
+        window.addEventListener('resize', () => this.schedule());
+
+        // Remember rows the user interacted with
+        const touch = (e) => {
+            const tr = e.target.closest('tr[data-virtual-id]');
+            if (tr) {
+                tr.dataset.virtualTouched = '1';
+            }
+        };
+        this.tbody.addEventListener('input', touch);
+        this.tbody.addEventListener('click', (e) => {
+            if (e.target.closest('button')) {
+                touch(e);
+            }
+        });
+
+        // Select All must reach every row, not just the rendered ones, so
+        // mount them all (hidden) before the page's own handler runs
+        document.addEventListener('change', (e) => {
+            if (e.target && e.target.id === 'selectAll' && e.target.checked) {
+                this.mountAll();
+            }
+        }, true);
+
+        // Rows removed by the page (deleted items) must not come back. The
+        // scroller's own DOM changes are dropped with takeRecords().
+        this.observer = new MutationObserver((records) => this.onRemoved(records));
+        this.observer.observe(this.tbody, { childList: true });
+        this.observer.observe(this.stash, { childList: true });
+
+        this.showMessage(VirtualTable.LOADING);
+        this.load(this.url);
+    }
+
+    static LOADING = '<span class="spinner-border spinner-border-sm me-2" role="status"></span> Memuat data...';
+
+    static escape(value) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        return String(value)
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#39;');
+    }
+
+    load(url) {
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status !== 'success') {
+                    throw new Error(data.message || 'Gagal memuat data');
+                }
+                this.append(data);
+                if (data.next) {
+                    this.load(url.split('?')[0] + '?' + data.next);
+                } else {
+                    this.loading = false;
+                    this.refresh();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading table rows:', error);
+                this.loading = false;
+                this.showMessage(`<span class="text-danger">${VirtualTable.escape(error.message)}</span>`);
+            });
+    }
+
+    append(data) {
+        if (!this.fields.length) {
+            this.fields = data.fields;
+            this.fields.forEach(field => { this.columns[field] = []; });
+        }
+        this.fields.forEach(field => {
+            const values = data.columns[field];
+            for (let i = 0; i < values.length; i++) {
+                this.columns[field].push(values[i]);
+            }
+        });
+        this.length += data.count;
+        this.refresh();
+    }
+
+    row(position) {
+        const row = {};
+        this.fields.forEach(field => { row[field] = this.columns[field][position]; });
+        return row;
+    }
+
+    // Show only the rows for which predicate(row) is true, or all with null
+    setFilter(predicate) {
+        this.filter = predicate;
+        this.refresh();
+    }
+
+    refresh() {
+        const ids = this.columns.id || [];
+        this.index = [];
+        for (let i = 0; i < this.length; i++) {
+            if (this.deleted.has(String(ids[i]))) {
+                continue;
+            }
+            if (this.filter && !this.filter(this.row(i))) {
+                continue;
+            }
+            this.index.push(i);
+        }
+        this.updateStatus();
+        this.render();
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = window.requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+
+    render() {
+        if (!this.index.length) {
+            this.mounted.forEach((tr, id) => this.release(id, tr));
+            this.mounted.clear();
+            this.showMessage(this.loading ? VirtualTable.LOADING : VirtualTable.escape(this.emptyText));
+            return;
+        }
+
+        // Offset of the first row inside the scrolled content
+        const scrollTop = this.scroller.scrollTop;
+        const bodyTop = this.tbody.getBoundingClientRect().top - this.scroller.getBoundingClientRect().top + scrollTop;
+        const height = this.scroller.clientHeight || window.innerHeight;
+        const total = this.index.length;
+        let first = Math.floor((scrollTop - bodyTop) / this.rowHeight) - this.overscan;
+        let last = Math.ceil((scrollTop - bodyTop + height) / this.rowHeight) + this.overscan;
+        first = Math.max(0, Math.min(first, total - 1));
+        last = Math.max(first + 1, Math.min(last, total));
+
+        const ids = this.columns.id;
+        const rows = [];
+        const next = new Map();
+        for (let n = first; n < last; n++) {
+            const position = this.index[n];
+            const id = String(ids[position]);
+            let tr = this.mounted.get(id) || this.kept.get(id);
+            if (!tr) {
+                tr = this.build(position);
+            }
+            this.kept.delete(id);
+            next.set(id, tr);
+            rows.push(tr);
+        }
+
+        this.mounted.forEach((tr, id) => {
+            if (!next.has(id)) {
+                this.release(id, tr);
+            }
+        });
+        // Striped tables color rows by position, so keep the parity of the
+        // first rendered row stable with an extra empty spacer
+        const spacers = first % 2 === 0 ? [this.spacer(0)] : [];
+        spacers.push(this.spacer(first * this.rowHeight));
+        this.tbody.replaceChildren(...spacers, ...rows, this.spacer((total - last) * this.rowHeight));
+        this.observer.takeRecords();
+
+        const fresh = rows.filter(tr => !tr.dataset.virtualRendered);
+        fresh.forEach(tr => { tr.dataset.virtualRendered = '1'; });
+        this.mounted = next;
+        if (fresh.length) {
+            this.onRowsRendered(fresh);
+        }
+
+        // Measure the real row height once and lay out again with it
+        if (!this.measured && rows.length) {
+            this.measured = true;
+            const measured = rows[0].getBoundingClientRect().height;
+            if (measured > 0 && Math.abs(measured - this.rowHeight) > 1) {
+                this.rowHeight = measured;
+                this.render();
+            }
+        }
+    }
+
+    build(position) {
+        const template = document.createElement('template');
+        template.innerHTML = this.renderRow(this.row(position)).trim();
+        const tr = template.content.firstElementChild;
+        tr.dataset.virtualId = this.columns.id[position];
+        return tr;
+    }
+
+    // Keep a row leaving the window if the user touched it
+    release(id, tr) {
+        if (tr.dataset.virtualTouched || tr.querySelector('.item-checkbox:checked')) {
+            this.kept.set(id, tr);
+            this.stash.appendChild(tr);
+        }
+    }
+
+    mountAll() {
+        const ids = this.columns.id || [];
+        const rows = [];
+        this.index.forEach(position => {
+            const id = String(ids[position]);
+            if (!this.mounted.has(id) && !this.kept.has(id)) {
+                const tr = this.build(position);
+                tr.dataset.virtualRendered = '1';
+                tr.dataset.virtualTouched = '1';
+                this.kept.set(id, tr);
+                rows.push(tr);
+            }
+        });
+        this.stash.append(...rows);
+        this.observer.takeRecords();
+        if (rows.length) {
+            this.onRowsRendered(rows);
+        }
+    }
+
+    onRemoved(records) {
+        let changed = false;
+        records.forEach(record => {
+            record.removedNodes.forEach(node => {
+                if (node.dataset && node.dataset.virtualId && !node.isConnected) {
+                    const id = node.dataset.virtualId;
+                    this.deleted.add(id);
+                    this.mounted.delete(id);
+                    this.kept.delete(id);
+                    changed = true;
+                }
+            });
+        });
+        if (changed) {
+            this.refresh();
+        }
+    }
+
+    spacer(height) {
+        const tr = document.createElement('tr');
+        tr.className = 'virtual-spacer';
+        tr.setAttribute('aria-hidden', 'true');
+        const td = document.createElement('td');
+        td.colSpan = this.columnCount;
+        td.style.height = height + 'px';
+        tr.appendChild(td);
+        return tr;
+    }
+
+    showMessage(html) {
+        this.tbody.innerHTML = `<tr><td colspan="${this.columnCount}" class="text-center py-4">${html}</td></tr>`;
+        this.observer.takeRecords();
+    }
+
+    updateStatus() {
+        if (!this.status) {
+            return;
+        }
+        const count = this.index.length.toLocaleString('id-ID');
+        this.status.textContent = this.loading ? `Memuat... ${count} barang` : `${count} barang`;
+    }
+}
@@ -106,6 +106,36 @@ if DATABASE_URL:
     DATABASES['default'] = dj_database_url.config(default=DATABASE_URL, conn_max_age=600)
 
 
+# Cache shared by the web and import worker processes, so a write in one
+# invalidates cached values for all of them. The table is created by migrate.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'inventory_cache',
+    },
+    # Rendered table rows. Keys include the row's updated_at, so stale rows
+    # are never served and a per-process memory cache is enough.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory-fragments',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+}
+
+
+# Longest text sent in one Telegram message. Senders pack their items into
+# as few messages under this size as possible.
+TELEGRAM_MESSAGE_LIMIT = int(os.environ.get('TELEGRAM_MESSAGE_LIMIT', 4096))
+
+
+# Send all webhook calls to this server instead (e.g. a local stand-in
+# server while testing)
+WEBHOOK_LOCAL_URL = os.environ.get('WEBHOOK_LOCAL_URL')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 